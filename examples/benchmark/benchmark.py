@@ -0,0 +1,88 @@
+import io
+import pinky
+import random
+import sys
+import time
+
+def create_path_data(command_count):
+    parts = ['M %f,%f' % (random.uniform(0.0, 1000.0),
+                          random.uniform(0.0, 1000.0))]
+    for i in range(command_count):
+        if random.random() < 0.5:
+            parts.append('l %f,%f' % (random.uniform(-10.0, 10.0),
+                                      random.uniform(-10.0, 10.0)))
+        else:
+            parts.append('c %f,%f %f,%f %f,%f' %
+                         tuple(random.uniform(-10.0, 10.0) for j in range(6)))
+    parts.append('z')
+    return ' '.join(parts)
+
+def create_document_data(path_count, command_count):
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg">']
+    for i in range(path_count):
+        parts.append('<path id="path%i" transform="translate(%f,%f)" '
+                     'style="fill:#808080;stroke:none" d="%s"/>' %
+                     (i, random.uniform(0.0, 1000.0),
+                      random.uniform(0.0, 1000.0),
+                      create_path_data(command_count)))
+    parts.append('</svg>')
+    return '\n'.join(parts).encode('utf-8')
+
+def benchmark(name, func, size, unit):
+    start = time.time()
+    func()
+    duration = time.time() - start
+    sys.stdout.write('%-32s %10.3f s %14.0f %s/s\n' %
+                     (name, duration, size / duration, unit))
+
+def benchmark_serialization(path_count=1000, command_count=100):
+    data = create_document_data(path_count, command_count)
+    sys.stdout.write('document: %i paths, %i commands each, %i bytes\n' %
+                     (path_count, command_count, len(data)))
+    document = [None]
+    def parse():
+        document[0] = pinky.Document(io.BytesIO(data))
+    benchmark('parse document', parse, len(data), 'bytes')
+    paths = [e.shape for e in document[0].root.children]
+    def format_paths_with_str():
+        for path in paths:
+            str(path)
+    benchmark('format paths with str', format_paths_with_str,
+              path_count * command_count, 'commands')
+    writer = pinky.Writer(precision=3)
+    def format_paths():
+        for path in paths:
+            writer.format_path(path)
+    benchmark('format paths with writer', format_paths,
+              path_count * command_count, 'commands')
+    output = [None]
+    def format_document():
+        output[0] = writer.format_document(document[0])
+    benchmark('format document', format_document, len(data), 'bytes')
+    sys.stdout.write('output: %i bytes (%.0f%% of input)\n' %
+                     (len(output[0]), 100.0 * len(output[0]) / len(data)))
+
+def benchmark_parallel_parsing(path_count=1000, command_count=100,
+                               thread_counts=(1, 2, 4, 8)):
+    data = create_document_data(path_count, command_count)
+    sys.stdout.write('document: %i paths, %i commands each, %i bytes\n' %
+                     (path_count, command_count, len(data)))
+    writer = pinky.Writer(precision=6)
+    serial_output = writer.format_document(pinky.Document(io.BytesIO(data)))
+    benchmark('parse document serially',
+              lambda: pinky.Document(io.BytesIO(data)), len(data), 'bytes')
+    for thread_count in thread_counts:
+        document = [None]
+        def parse():
+            document[0] = pinky.Document(io.BytesIO(data), thread_count)
+        benchmark('parse document on %i threads' % thread_count, parse,
+                  len(data), 'bytes')
+        assert writer.format_document(document[0]) == serial_output
+
+def main():
+    random.seed(0)
+    benchmark_serialization()
+    benchmark_parallel_parsing()
+
+if __name__ == '__main__':
+    main()
@@ -5,44 +5,12 @@ import pyglet
 from pyglet.gl import *
 import sys
 
-def draw_line(x1, y1, x2, y2, stroke):
-    if stroke is not None:
-        glColor3ub(*stroke)
-        glBegin(GL_LINES)
-        glVertex2f(x1, y1)
-        glVertex2f(x2, y2)
-        glEnd()
-
-def draw_polygon(vertices, fill, stroke):
-    if fill is not None:
-        glColor3ub(*fill)
-        glBegin(GL_POLYGON)
-        for x, y in vertices:
-            glVertex2f(x, y)
-        glEnd()
-    if stroke is not None:
-        glColor3ub(*stroke)
-        glBegin(GL_LINE_LOOP)
-        for x, y in vertices:
-            glVertex2f(x, y)
-        glEnd()
-
-def draw_circle(x, y, radius, fill, stroke, vertex_count=32):
-    vertices = []
-    for i in xrange(vertex_count):
-        angle = 2.0 * math.pi * float(i) / float(vertex_count)
-        vertex = (x + radius * math.cos(angle),
-                  y + radius * math.sin(angle))
-        vertices.append(vertex)
-    draw_polygon(vertices, fill, stroke)
-
-def draw_rect(x, y, width, height, fill, stroke):
-    vertices = []
-    vertices.append((x, y))
-    vertices.append((x + width, y))
-    vertices.append((x + width, y + height))
-    vertices.append((x, y + height))
-    draw_polygon(vertices, fill, stroke)
+def draw_polygon(vertices, fill):
+    glColor3ub(*fill)
+    glBegin(GL_POLYGON)
+    for x, y in vertices:
+        glVertex2f(x, y)
+    glEnd()
 
 class GameEngine(object):
     def __init__(self, document, width, height):
@@ -51,6 +19,7 @@ class GameEngine(object):
         self.height = height
         self.shapes = []
         self.load_shapes(self.document.root, pinky.Matrix())
+        self.init_strokes()
         self.init_camera()
         page_color_str = self.document.root.attributes.get('pagecolor', 'none')
         page_color = pinky.Color.parse(page_color_str)
@@ -67,6 +36,18 @@ class GameEngine(object):
         scale_y = float(self.height) / bounding_box.height
         self.camera_scale = 0.8 * min(scale_x, scale_y)
 
+    def init_strokes(self):
+        strokes = pinky.StrokeBuffer.from_document(self.document)
+        colors = []
+        for element, first_vertex, vertex_count, _, _ in strokes.ranges:
+            attributes = dict(element.attributes)
+            attributes.update(pinky.parse_style(attributes.pop('style', '')))
+            stroke = pinky.Color.parse(attributes.get('stroke', 'none'))
+            colors.extend(tuple(stroke) * vertex_count)
+        self.stroke_vertex_list = pyglet.graphics.vertex_list_indexed(
+            len(strokes.vertices) // 2, list(strokes.indices),
+            ('v2f', list(strokes.vertices)), ('c3B', colors))
+
     def load_shapes(self, element, matrix):
         attributes = dict(element.attributes)
         attributes.update(pinky.parse_style(attributes.pop('style', '')))
@@ -80,12 +61,9 @@ class GameEngine(object):
             self.load_shapes(child, matrix)
 
     def add_shape(self, shape, matrix, fill, stroke):
-        if isinstance(shape, pinky.Path):
-            for basic_shape in shape.basic_shapes:
-                self.add_shape(basic_shape, matrix, fill, stroke)
-        else:
-            shape_entry = shape.transform(matrix), fill, stroke
-            self.shapes.append(shape_entry)
+        level_of_detail = pinky.LevelOfDetail(shape.transform(matrix))
+        shape_entry = level_of_detail, fill, stroke
+        self.shapes.append(shape_entry)
 
     def on_draw(self):
         glClearColor(*self.clear_color)
@@ -94,16 +72,14 @@ class GameEngine(object):
         glTranslatef(self.width // 2, self.height // 2, 0)
         glScalef(self.camera_scale, self.camera_scale, self.camera_scale)
         glTranslatef(-self.camera_x, -self.camera_y, 0)
-        for shape, fill, stroke in self.shapes:
-            if isinstance(shape, pinky.Line):
-                draw_line(shape.x1, shape.y1, shape.x2, shape.y2, stroke)
-            elif isinstance(shape, pinky.Polygon):
-                draw_polygon(shape.points, fill, stroke)
-            elif isinstance(shape, pinky.Circle):
-                draw_circle(shape.cx, shape.cy, shape.r, fill, stroke)
-            elif isinstance(shape, pinky.Rect):
-                draw_rect(shape.x, shape.y, shape.width, shape.height, fill,
-                          stroke)
+        for level_of_detail, fill, stroke in self.shapes:
+            if fill is None:
+                continue
+            level = level_of_detail.select(self.camera_scale)
+            for vertices, closed in level:
+                if closed:
+                    draw_polygon(vertices, fill)
+        self.stroke_vertex_list.draw(GL_TRIANGLES)
         glPopMatrix()
 
 class MyWindow(pyglet.window.Window):
@@ -28,9 +28,35 @@ getting in your way.
 See: U{http://github.com/elemel/pinky}
 """
 
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
 from itertools import chain
+import hashlib
+import heapq
+import io
+import json
 import math
+import os
 import re
+import struct
+import sys
+import xml.dom.minidom
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+try:
+    basestring
+except NameError:
+    basestring = str
 
 SVG_NAMESPACE = 'http://www.w3.org/2000/svg'
 SODIPODI_NAMESPACE = 'http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd'
@@ -41,17 +67,48 @@ def parse_style(arg):
     pairs = (l.split(':') for l in lines if l)
     return dict((k.strip(), v.strip()) for k, v in pairs)
 
-def parse_shape(element):
+_length_pattern = re.compile(
+    r'\s*([-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[Ee][-+]?[0-9]+)?)')
+
+def parse_length(arg):
+    """Parse an SVG length, ignoring its unit."""
+    match = _length_pattern.match(arg)
+    if match is None:
+        raise ValueError('invalid length: ' + arg)
+    return float(match.group(1))
+
+def parse_stroke_style(attributes):
+    """Get the stroke parameters from the attributes of an element, as
+    keyword arguments for L{StrokeBuffer.add}, or None if the element is not
+    stroked.
+
+    Properties in the style attribute override presentation attributes.
+    """
+    style = dict((k, v) for k, v in attributes.items()
+                 if k.startswith('stroke'))
+    style.update(parse_style(attributes.get('style', '')))
+    if style.get('stroke', 'none') == 'none':
+        return None
+    width = parse_length(style.get('stroke-width', '1'))
+    if width <= 0.0:
+        return None
+    return dict(width=width, join=style.get('stroke-linejoin', 'miter'),
+                cap=style.get('stroke-linecap', 'butt'),
+                miter_limit=float(style.get('stroke-miterlimit', '4')))
+
+def parse_shape(element, cache=None):
     if element.namespaceURI == SVG_NAMESPACE:
         if element.localName == 'circle':
             return parse_circle_shape(element)
+        elif element.localName == 'ellipse':
+            return parse_ellipse_shape(element)
         elif element.localName == 'rect':
             return parse_rect_shape(element)
         elif element.localName == 'path':
             if element.getAttributeNS(SODIPODI_NAMESPACE, 'type') == 'arc':
                 return parse_arc_shape(element)
             else:
-                return parse_path_shape(element)
+                return parse_path_shape(element, cache)
     return None
 
 def parse_arc_shape(element):
@@ -59,7 +116,9 @@ def parse_arc_shape(element):
     cy = float(element.getAttributeNS(SODIPODI_NAMESPACE, 'cy') or '0')
     rx = float(element.getAttributeNS(SODIPODI_NAMESPACE, 'rx'))
     ry = float(element.getAttributeNS(SODIPODI_NAMESPACE, 'ry'))
-    return Circle(cx, cy, (rx + ry) / 2.0)
+    if rx == ry:
+        return Circle(cx, cy, rx)
+    return Ellipse(cx, cy, rx, ry)
 
 def parse_circle_shape(element):
     cx = float(element.getAttribute('cx') or '0')
@@ -67,21 +126,35 @@ def parse_circle_shape(element):
     r = float(element.getAttribute('r'))
     return Circle(cx, cy, r)
 
-def parse_path_shape(element):
+def parse_ellipse_shape(element):
+    cx = float(element.getAttribute('cx') or '0')
+    cy = float(element.getAttribute('cy') or '0')
+    rx = float(element.getAttribute('rx'))
+    ry = float(element.getAttribute('ry'))
+    return Ellipse(cx, cy, rx, ry)
+
+def parse_path_shape(element, cache=None):
     d = element.getAttribute('d')
+    if cache is not None:
+        return cache.get_path(d)
     return Path.from_string(d)
 
-# TODO: Return a Rect instance, not a Polygon instance.
 def parse_rect_shape(element):
+    """Parse a rect element.
+
+    See: U{http://www.w3.org/TR/SVG/shapes.html#RectElement}
+    """
     x = float(element.getAttribute('x') or '0')
     y = float(element.getAttribute('y') or '0')
     width = float(element.getAttribute('width'))
     height = float(element.getAttribute('height'))
-    rx = float(element.getAttribute('rx') or '0')
-    ry = float(element.getAttribute('ry') or '0')
-    points = [(x, y), (x + width, y),
-              (x + width, y + height), (x, y + height)]
-    return Polygon(points)
+    rx = element.getAttribute('rx')
+    ry = element.getAttribute('ry')
+    rx = float(rx or ry or '0')
+    ry = float(ry or rx)
+    rx = min(abs(rx), 0.5 * width)
+    ry = min(abs(ry), 0.5 * height)
+    return Rect(x, y, width, height, rx, ry)
 
 class Color(object):
     """An RGB color with integer components in the [0, 255] range."""
@@ -289,12 +362,41 @@ class Color(object):
         return self.red_as_float, self.green_as_float, self.blue_as_float
 
 class Matrix(object):
-    """A transformation matrix."""
+    """A transformation matrix.
+
+    Matrices are classified by type when created, so that multiplication
+    and point transformation can take shortcuts for the common cases.
+    Matrices should be treated as immutable.
+    """
+
+    IDENTITY = 0
+    """The type of identity matrices."""
+
+    TRANSLATE = 1
+    """The type of pure translation matrices."""
+
+    SCALE = 2
+    """The type of matrices that scale and translate."""
+
+    GENERAL = 3
+    """The type of all other matrices."""
+
+    __slots__ = 'abcdef', 'type'
 
     def __init__(self, a=1.0, b=0.0, c=0.0, d=1.0, e=0.0, f=0.0):
         """Initialize a matrix from the given components."""
         assert all(isinstance(x, float) for x in (a, b, c, d, e, f))
         self.abcdef = a, b, c, d, e, f
+        if b == 0.0 and c == 0.0:
+            if a == 1.0 and d == 1.0:
+                if e == 0.0 and f == 0.0:
+                    self.type = Matrix.IDENTITY
+                else:
+                    self.type = Matrix.TRANSLATE
+            else:
+                self.type = Matrix.SCALE
+        else:
+            self.type = Matrix.GENERAL
 
     @classmethod
     def from_string(cls, arg):
@@ -302,7 +404,7 @@ class Matrix(object):
         for part in arg.replace(',', ' ').split(')')[:-1]:
             name, args = part.strip().split('(')
             name = name.rstrip()
-            args = map(float, args.split())
+            args = [float(a) for a in args.split()]
             if name == 'matrix':
                 matrix *= cls(*args)
             elif name == 'translate':
@@ -330,8 +432,17 @@ class Matrix(object):
     def __mul__(self, other):
         """Multiply with another matrix."""
         if isinstance(other, Matrix):
+            if other.type == Matrix.IDENTITY:
+                return self
+            if self.type == Matrix.IDENTITY:
+                return other
             a1, b1, c1, d1, e1, f1 = self.abcdef
             a2, b2, c2, d2, e2, f2 = other.abcdef
+            if self.type == Matrix.TRANSLATE:
+                return Matrix(a2, b2, c2, d2, e2 + e1, f2 + f1)
+            if self.type == Matrix.SCALE and other.type != Matrix.GENERAL:
+                return Matrix(a1 * a2, 0.0, 0.0, d1 * d2, a1 * e2 + e1,
+                              d1 * f2 + f1)
             a3 = a1 * a2 + c1 * b2
             b3 = b1 * a2 + d1 * b2
             c3 = a1 * c2 + c1 * d2
@@ -342,11 +453,88 @@ class Matrix(object):
         else:
             return NotImplemented
 
+    @property
+    def determinant(self):
+        """The determinant of the matrix."""
+        a, b, c, d, e, f = self.abcdef
+        return a * d - b * c
+
+    @property
+    def scale_factor(self):
+        """The geometric mean of the scale factors of the matrix."""
+        return math.sqrt(abs(self.determinant))
+
+    def inverse(self):
+        """Get the inverse of the matrix.
+
+        Raises a ValueError if the matrix is singular.
+        """
+        a, b, c, d, e, f = self.abcdef
+        if self.type == Matrix.IDENTITY:
+            return self
+        if self.type == Matrix.TRANSLATE:
+            return Matrix(1.0, 0.0, 0.0, 1.0, -e, -f)
+        if self.type == Matrix.SCALE:
+            if not a or not d:
+                raise ValueError('singular matrix')
+            return Matrix(1.0 / a, 0.0, 0.0, 1.0 / d, -e / a, -f / d)
+        determinant = a * d - b * c
+        if not determinant:
+            raise ValueError('singular matrix')
+        return Matrix(d / determinant, -b / determinant, -c / determinant,
+                      a / determinant, (c * f - d * e) / determinant,
+                      (b * e - a * f) / determinant)
+
+    def decompose(self):
+        """Decompose the matrix into a translation, a rotation, a horizontal
+        skew, and a scale, applied in reverse order.
+
+        Returns a tuple of tx, ty, angle, sx, sy, and skew angle, with the
+        angles in degrees. A reflection is represented by a negative sy.
+
+        See: L{create_from_decomposition}
+        """
+        a, b, c, d, e, f = self.abcdef
+        sx = math.hypot(a, b)
+        angle_rad = math.atan2(b, a) if sx else 0.0
+        cos_angle = math.cos(angle_rad)
+        sin_angle = math.sin(angle_rad)
+        # Rotate the second column back to find the skew and vertical scale.
+        skew_c = cos_angle * c + sin_angle * d
+        sy = -sin_angle * c + cos_angle * d
+        skew_rad = math.atan(skew_c / sy) if sy else 0.0
+        return (e, f, angle_rad * 180.0 / math.pi, sx, sy,
+                skew_rad * 180.0 / math.pi)
+
     def transform_point(self, x, y):
         """Get a transformed copy of a point."""
         a, b, c, d, e, f = self.abcdef
+        if self.type == Matrix.IDENTITY:
+            return x, y
+        if self.type == Matrix.TRANSLATE:
+            return x + e, y + f
+        if self.type == Matrix.SCALE:
+            return a * x + e, d * y + f
         return a * x + c * y + e, b * x + d * y + f
 
+    def transform_points(self, points):
+        """Get a list of transformed copies of points."""
+        a, b, c, d, e, f = self.abcdef
+        if self.type == Matrix.IDENTITY:
+            return list(points)
+        if self.type == Matrix.TRANSLATE:
+            return [(x + e, y + f) for x, y in points]
+        if self.type == Matrix.SCALE:
+            return [(a * x + e, d * y + f) for x, y in points]
+        return [(a * x + c * y + e, b * x + d * y + f) for x, y in points]
+
+    def compose_all(self, matrices):
+        """Get a list of the products of the matrix with each of the given
+        matrices."""
+        if self.type == Matrix.IDENTITY:
+            return list(matrices)
+        return [self * m for m in matrices]
+
     def transform_shape(self, shape):
         """Get a transformed copy of a shape."""
         return shape.transform(self)
@@ -366,12 +554,14 @@ class Matrix(object):
     @classmethod
     def create_rotate(cls, angle, cx=None, cy=None):
         """Create a rotation matrix."""
-        if cx is not None and cy is not None:
-            return (cls.create_translate(cx, cy) * cls.create_rotate(angle) *
-                    cls.create_translate(-cx, -cy))
         angle_rad = angle * math.pi / 180.0
         cos_angle = math.cos(angle_rad)
         sin_angle = math.sin(angle_rad)
+        if cx is not None and cy is not None:
+            # Rotate around the center point.
+            e = cx - cos_angle * cx + sin_angle * cy
+            f = cy - sin_angle * cx - cos_angle * cy
+            return cls(cos_angle, sin_angle, -sin_angle, cos_angle, e, f)
         return cls(cos_angle, sin_angle, -sin_angle, cos_angle, 0.0, 0.0)
 
     @classmethod
@@ -386,6 +576,22 @@ class Matrix(object):
         angle_rad = angle * math.pi / 180.0
         return cls(1.0, math.tan(angle_rad), 0.0, 1.0, 0.0, 0.0)
 
+    @classmethod
+    def create_from_decomposition(cls, tx=0.0, ty=0.0, angle=0.0, sx=1.0,
+                                  sy=1.0, skew=0.0):
+        """Create a matrix from a translation, a rotation, a horizontal skew,
+        and a scale, applied in reverse order.
+
+        See: L{decompose}
+        """
+        angle_rad = angle * math.pi / 180.0
+        cos_angle = math.cos(angle_rad)
+        sin_angle = math.sin(angle_rad)
+        tan_skew = math.tan(skew * math.pi / 180.0)
+        return cls(cos_angle * sx, sin_angle * sx,
+                   (cos_angle * tan_skew - sin_angle) * sy,
+                   (sin_angle * tan_skew + cos_angle) * sy, tx, ty)
+
     @classmethod
     def create_flip_x(cls):
         """Create a horizontal flip matrix."""
@@ -423,11 +629,36 @@ class Shape(object):
         """Get a transformed copy of the shape."""
         raise NotImplementedError()
 
+    def flatten(self, tolerance):
+        """Get a list of basic shapes that approximate the shape within the
+        given tolerance.
+
+        The basic shapes are lines, polylines, and polygons.
+        """
+        raise NotImplementedError()
+
     def get_bounding_box(self, matrix):
         """Get the bounding box of the shape after applying the given
         transformation matrix."""
         return self.transform(matrix).bounding_box
 
+    def union(self, other, tolerance=0.1):
+        """Get the union of the shape and another shape as a path.
+
+        Curves are flattened within the given tolerance. The path has one
+        counter-clockwise subpath for each outer boundary, and one clockwise
+        subpath for each hole.
+        """
+        return _boolean(self, other, tolerance, lambda a, b: a or b)
+
+    def intersection(self, other, tolerance=0.1):
+        """Get the intersection of the shape and another shape as a path."""
+        return _boolean(self, other, tolerance, lambda a, b: a and b)
+
+    def difference(self, other, tolerance=0.1):
+        """Get the difference of the shape and another shape as a path."""
+        return _boolean(self, other, tolerance, lambda a, b: a and not b)
+
 class BoundingBox(Shape):
     """An axis-aligned rectangle for representing shape boundaries.
 
@@ -446,6 +677,8 @@ class BoundingBox(Shape):
         """Is the bounding box non-empty?"""
         return self.min_x <= self.max_x and self.min_y <= self.max_y
 
+    __bool__ = __nonzero__
+
     def __repr__(self):
         return ('BoundingBox(min_x=%r, min_y=%r, max_x=%r, max_y=%r)' %
                 (self.min_x, self.min_y, self.max_x, self.max_y))
@@ -465,7 +698,7 @@ class BoundingBox(Shape):
             if matrix is None:
                 x, y = shape
             else:
-                x, y = matrix.transform_point(shape)
+                x, y = matrix.transform_point(*shape)
             self.min_x = min(self.min_x, x)
             self.min_y = min(self.min_y, y)
             self.max_x = max(self.max_x, x)
@@ -490,6 +723,18 @@ class BoundingBox(Shape):
         """The bounding box itself."""
         return self
 
+    def get_bounding_box(self, matrix):
+        """Get the bounding box of the box after applying the given matrix,
+        from its center and half extents."""
+        if not self:
+            return BoundingBox()
+        a, b, c, d = matrix.abcdef[:4]
+        hw, hh = 0.5 * self.width, 0.5 * self.height
+        cx, cy = matrix.transform_point(self.min_x + hw, self.min_y + hh)
+        hx = abs(a) * hw + abs(c) * hh
+        hy = abs(b) * hw + abs(d) * hh
+        return BoundingBox(cx - hx, cy - hy, cx + hx, cy + hy)
+
     @property
     def width(self):
         """The width of the bounding box."""
@@ -541,6 +786,9 @@ class Line(Shape):
         x2, y2 = matrix.transform_point(self.x2, self.y2)
         return Line(x1, y1, x2, y2)
 
+    def flatten(self, tolerance):
+        return [self]
+
     @property
     def p1(self):
         """The first point."""
@@ -551,6 +799,11 @@ class Line(Shape):
         """The second point."""
         return self.x2, self.y2
 
+    @property
+    def perimeter(self):
+        """The length of the line."""
+        return math.hypot(self.x2 - self.x1, self.y2 - self.y1)
+
     @property
     def area(self):
         """The area of a line is always zero."""
@@ -571,6 +824,11 @@ class Line(Shape):
         max_y = max(self.y1, self.y2)
         return BoundingBox(min_x, min_y, max_x, max_y)
 
+    def get_bounding_box(self, matrix):
+        x1, y1 = matrix.transform_point(self.x1, self.y1)
+        x2, y2 = matrix.transform_point(self.x2, self.y2)
+        return BoundingBox(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
     @property
     def path(self):
         commands = [Moveto(self.x1, self.y1), Lineto(self.x2, self.y2)]
@@ -586,7 +844,23 @@ class Polyline(Shape):
         return 'Polyline(%r)' % self.points
 
     def transform(self, matrix):
-        return Polyline(matrix.transform_point(x, y) for x, y in self.points)
+        return Polyline(matrix.transform_points(self.points))
+
+    def flatten(self, tolerance):
+        return [self]
+
+    def simplify(self, tolerance):
+        """Get a copy of the polyline with vertices removed, keeping it
+        within the given tolerance of the original.
+
+        See: U{http://en.wikipedia.org/wiki/Ramer-Douglas-Peucker_algorithm}
+        """
+        return Polyline(_simplify_points(self.points, tolerance))
+
+    @property
+    def perimeter(self):
+        """The length of the polyline."""
+        return _get_length(self.points)
 
     @property
     def area(self):
@@ -597,6 +871,15 @@ class Polyline(Shape):
         xs, ys = zip(*self.points)
         return BoundingBox(min(xs), min(ys), max(xs), max(ys))
 
+    def get_bounding_box(self, matrix):
+        return _get_transformed_bounding_box(self.points, matrix)
+
+    @property
+    def path(self):
+        commands = [Moveto(*self.points[0])]
+        commands.extend(Lineto(x, y) for x, y in self.points[1:])
+        return Path([Subpath(commands)])
+
 class Polygon(Shape):
     """A polygon."""
 
@@ -607,7 +890,30 @@ class Polygon(Shape):
         return 'Polygon(%r)' % self.points
 
     def transform(self, matrix):
-        return Polygon(matrix.transform_point(x, y) for x, y in self.points)
+        return Polygon(matrix.transform_points(self.points))
+
+    def flatten(self, tolerance):
+        return [self]
+
+    def simplify(self, tolerance):
+        """Get a copy of the polygon with vertices removed, keeping it
+        within the given tolerance of the original."""
+        if len(self.points) < 4:
+            return Polygon(self.points)
+        # Split the ring at the vertex farthest from the first one, and
+        # simplify the two halves separately.
+        x0, y0 = self.points[0]
+        i = max(xrange(len(self.points)),
+                key=lambda i: ((self.points[i][0] - x0) ** 2 +
+                               (self.points[i][1] - y0) ** 2))
+        first = _simplify_points(self.points[:i + 1], tolerance)
+        second = _simplify_points(self.points[i:] + self.points[:1],
+                                  tolerance)
+        return Polygon(first[:-1] + second[:-1])
+
+    @property
+    def perimeter(self):
+        return _get_length(self.points + self.points[:1])
 
     @property
     def area(self):
@@ -627,6 +933,16 @@ class Polygon(Shape):
         xs, ys = zip(*self.points)
         return BoundingBox(min(xs), min(ys), max(xs), max(ys))
 
+    def get_bounding_box(self, matrix):
+        return _get_transformed_bounding_box(self.points, matrix)
+
+    @property
+    def path(self):
+        commands = [Moveto(*self.points[0])]
+        commands.extend(Lineto(x, y) for x, y in self.points[1:])
+        commands.append(Closepath())
+        return Path([Subpath(commands)])
+
     def repair(self, epsilon=0.0):
         def eq(p1, p2):
             x1, y1 = p1
@@ -652,14 +968,40 @@ class Circle(Shape):
     def transform(self, matrix):
         """Get a transformed copy of the circle.
 
-        The given transform should only translate, scale, and rotate the
-        circle. The scale should maintain aspect ratio.
+        If the matrix does not maintain aspect ratio, the copy is an
+        ellipse.
         """
+        if matrix.type == Matrix.IDENTITY:
+            return Circle(self.cx, self.cy, self.r)
         cx, cy = matrix.transform_point(self.cx, self.cy)
-        px, py = matrix.transform_point(self.cx + self.r, self.cy)
-        r = math.sqrt((px - cx) ** 2 + (py - cy) ** 2)
+        a, b, c, d = matrix.abcdef[:4]
+        if not _is_similarity(a, b, c, d):
+            rx, ry, rotation = _transform_ellipse(matrix, self.r, self.r, 0.0)
+            return Ellipse(cx, cy, rx, ry, rotation)
+        if matrix.type == Matrix.GENERAL:
+            r = self.r * math.sqrt(a * a + b * b)
+        else:
+            r = self.r * abs(a)
         return Circle(cx, cy, r)
 
+    @property
+    def perimeter(self):
+        return 2.0 * math.pi * self.r
+
+    @property
+    def area(self):
+        return math.pi * self.r ** 2
+
+    def flatten(self, tolerance):
+        angle = 2.0 * math.pi
+        count = max(3, _get_arc_segment_count(self.r, angle, tolerance))
+        points = []
+        for i in xrange(count):
+            a = angle * float(i) / float(count)
+            points.append((self.cx + self.r * math.cos(a),
+                           self.cy + self.r * math.sin(a)))
+        return [Polygon(points)]
+
     @property
     def centroid(self):
         return self.cx, self.cy
@@ -669,10 +1011,28 @@ class Circle(Shape):
         return BoundingBox(self.cx - self.r, self.cy - self.r,
                            self.cx + self.r, self.cy + self.r)
 
+    def get_bounding_box(self, matrix):
+        """Get the bounding box of the circle after applying the given
+        matrix, in closed form."""
+        a, b, c, d = matrix.abcdef[:4]
+        cx, cy = matrix.transform_point(self.cx, self.cy)
+        hx = self.r * math.hypot(a, c)
+        hy = self.r * math.hypot(b, d)
+        return BoundingBox(cx - hx, cy - hy, cx + hx, cy + hy)
+
+    @property
+    def path(self):
+        r = self.r
+        commands = [Moveto(self.cx + r, self.cy),
+                    EllipticalArc(r, r, 0.0, True, True, self.cx - r, self.cy),
+                    EllipticalArc(r, r, 0.0, True, True, self.cx + r, self.cy),
+                    Closepath()]
+        return Path([Subpath(commands)])
+
 class Rect(Shape):
     """An axis-aligned rectangle with rounded corners."""
 
-    def __init__(self, x, y, width, height, rx, ry):
+    def __init__(self, x, y, width, height, rx=0.0, ry=0.0):
         """Initialize a rectangle from the given position, dimensions, and
         corner radii.
         """
@@ -687,19 +1047,35 @@ class Rect(Shape):
         return ('Rect(x=%r, y=%r, width=%r, height=%r, rx=%r, ry=%r)' %
                 (self.x, self.y, self.width, self.height, self.rx, self.ry))
 
+    def transform(self, matrix):
+        """Get a transformed copy of the rectangle.
+
+        If the matrix rotates or skews the rectangle, the copy is a polygon,
+        or a path if the rectangle has rounded corners.
+        """
+        if matrix.type == Matrix.GENERAL:
+            if self.rx and self.ry:
+                return self.path.transform(matrix)
+            return self.polygon.transform(matrix)
+        a, b, c, d, e, f = matrix.abcdef
+        x1, y1 = a * self.x + e, d * self.y + f
+        x2 = a * (self.x + self.width) + e
+        y2 = d * (self.y + self.height) + f
+        return Rect(min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1),
+                    abs(a) * self.rx, abs(d) * self.ry)
+
     @property
     def perimeter(self):
-        if not self.rx and not self.ry:
-            return 2.0 * (self.width + self.height)
-        else:
-            raise NotImplementedError()
+        perimeter = 2.0 * (self.width + self.height)
+        if self.rx and self.ry:
+            # Replace the corners with a full ellipse.
+            perimeter += (_get_ellipse_perimeter(self.rx, self.ry) -
+                          4.0 * (self.rx + self.ry))
+        return perimeter
 
     @property
     def area(self):
-        if not self.rx and not self.ry:
-            return self.width * self.height
-        else:
-            raise NotImplementedError()
+        return self.width * self.height - (4.0 - math.pi) * self.rx * self.ry
 
     @property
     def centroid(self):
@@ -710,6 +1086,45 @@ class Rect(Shape):
         return BoundingBox(self.x, self.y, self.x + self.width,
                            self.y + self.height)
 
+    def get_bounding_box(self, matrix):
+        """Get the bounding box of the rectangle after applying the given
+        matrix, in closed form.
+
+        A rounded rectangle is the sum of a smaller rectangle and an
+        ellipse, so the half extents of the two add up.
+        """
+        a, b, c, d = matrix.abcdef[:4]
+        rx, ry = (self.rx, self.ry) if self.rx and self.ry else (0.0, 0.0)
+        hw, hh = 0.5 * self.width - rx, 0.5 * self.height - ry
+        cx, cy = matrix.transform_point(self.x + 0.5 * self.width,
+                                        self.y + 0.5 * self.height)
+        hx = abs(a) * hw + abs(c) * hh + math.hypot(a * rx, c * ry)
+        hy = abs(b) * hw + abs(d) * hh + math.hypot(b * rx, d * ry)
+        return BoundingBox(cx - hx, cy - hy, cx + hx, cy + hy)
+
+    def flatten(self, tolerance):
+        if self.rx and self.ry:
+            return self.path.flatten(tolerance)
+        return [self.polygon]
+
+    @property
+    def path(self):
+        if not self.rx or not self.ry:
+            return self.polygon.path
+        x1, y1 = self.x, self.y
+        x2, y2 = self.x + self.width, self.y + self.height
+        rx, ry = self.rx, self.ry
+        commands = [Moveto(x1 + rx, y1), Lineto(x2 - rx, y1),
+                    EllipticalArc(rx, ry, 0.0, False, True, x2, y1 + ry),
+                    Lineto(x2, y2 - ry),
+                    EllipticalArc(rx, ry, 0.0, False, True, x2 - rx, y2),
+                    Lineto(x1 + rx, y2),
+                    EllipticalArc(rx, ry, 0.0, False, True, x1, y2 - ry),
+                    Lineto(x1, y1 + ry),
+                    EllipticalArc(rx, ry, 0.0, False, True, x1 + rx, y1),
+                    Closepath()]
+        return Path([Subpath(commands)])
+
     @property
     def polygon(self):
         return Polygon([(self.x, self.y),
@@ -717,6 +1132,87 @@ class Rect(Shape):
                         (self.x + self.width, self.y + self.height),
                         (self.x, self.y + self.height)])
 
+class Ellipse(Shape):
+    """An ellipse, optionally rotated around its center."""
+
+    def __init__(self, cx, cy, rx, ry, rotation=0.0):
+        """Initialize an ellipse from the given center point, radii, and
+        rotation angle in degrees."""
+        self.cx, self.cy = cx, cy
+        self.rx, self.ry = rx, ry
+        self.rotation = rotation
+
+    def __repr__(self):
+        return ('Ellipse(cx=%r, cy=%r, rx=%r, ry=%r, rotation=%r)' %
+                (self.cx, self.cy, self.rx, self.ry, self.rotation))
+
+    def transform(self, matrix):
+        cx, cy = matrix.transform_point(self.cx, self.cy)
+        rx, ry, rotation = _transform_ellipse(matrix, self.rx, self.ry,
+                                              self.rotation)
+        return Ellipse(cx, cy, rx, ry, rotation)
+
+    @property
+    def perimeter(self):
+        return _get_ellipse_perimeter(self.rx, self.ry)
+
+    @property
+    def area(self):
+        return math.pi * self.rx * self.ry
+
+    @property
+    def centroid(self):
+        return self.cx, self.cy
+
+    @property
+    def bounding_box(self):
+        hx, hy = _get_ellipse_extents(self.rx, self.ry, self.rotation)
+        return BoundingBox(self.cx - hx, self.cy - hy,
+                           self.cx + hx, self.cy + hy)
+
+    def get_bounding_box(self, matrix):
+        """Get the bounding box of the ellipse after applying the given
+        matrix, in closed form."""
+        a, b, c, d = matrix.abcdef[:4]
+        rotation_rad = self.rotation * math.pi / 180.0
+        ux = self.rx * math.cos(rotation_rad)
+        uy = self.rx * math.sin(rotation_rad)
+        vx = -self.ry * math.sin(rotation_rad)
+        vy = self.ry * math.cos(rotation_rad)
+        cx, cy = matrix.transform_point(self.cx, self.cy)
+        hx = math.hypot(a * ux + c * uy, a * vx + c * vy)
+        hy = math.hypot(b * ux + d * uy, b * vx + d * vy)
+        return BoundingBox(cx - hx, cy - hy, cx + hx, cy + hy)
+
+    def flatten(self, tolerance):
+        angle = 2.0 * math.pi
+        count = max(3, _get_arc_segment_count(max(self.rx, self.ry), angle,
+                                              tolerance))
+        rotation_rad = self.rotation * math.pi / 180.0
+        cos_rotation = math.cos(rotation_rad)
+        sin_rotation = math.sin(rotation_rad)
+        points = []
+        for i in xrange(count):
+            a = angle * float(i) / float(count)
+            ex, ey = self.rx * math.cos(a), self.ry * math.sin(a)
+            points.append((self.cx + cos_rotation * ex - sin_rotation * ey,
+                           self.cy + sin_rotation * ex + cos_rotation * ey))
+        return [Polygon(points)]
+
+    @property
+    def path(self):
+        rotation_rad = self.rotation * math.pi / 180.0
+        dx = self.rx * math.cos(rotation_rad)
+        dy = self.rx * math.sin(rotation_rad)
+        rx, ry, rotation = self.rx, self.ry, self.rotation
+        commands = [Moveto(self.cx + dx, self.cy + dy),
+                    EllipticalArc(rx, ry, rotation, True, True,
+                                  self.cx - dx, self.cy - dy),
+                    EllipticalArc(rx, ry, rotation, True, True,
+                                  self.cx + dx, self.cy + dy),
+                    Closepath()]
+        return Path([Subpath(commands)])
+
 class Command(object):
     """The base class for path commands."""
 
@@ -754,7 +1250,7 @@ class Command(object):
     def control_points(self):
         """The control points of the command."""
         args = [getattr(self, s) for s in self.__slots__]
-        return zip(args[::2], args[1::2])
+        return list(zip(args[::2], args[1::2]))
 
 class Moveto(Command):
     """A moveto command."""
@@ -804,15 +1300,15 @@ class EllipticalArc(Command):
     letter = 'A'
     __slots__ = 'rx', 'ry', 'rotation', 'large', 'sweep', 'x', 'y'
 
-    # TODO: Proper implementation?
     def transform(self, matrix):
-        rx = self.rx
-        ry = self.ry
-        rotation = self.rotation
-        large = self.large
+        rx, ry, rotation = _transform_ellipse(matrix, self.rx, self.ry,
+                                              self.rotation)
+        # A reflection reverses the direction of the arc.
         sweep = self.sweep
+        if matrix.determinant < 0.0:
+            sweep = not sweep
         x, y = matrix.transform_point(self.x, self.y)
-        return EllipticalArc(rx, ry, rotation, large, sweep, x, y)
+        return EllipticalArc(rx, ry, rotation, self.large, sweep, x, y)
 
     # TODO: Proper implementation?
     @property
@@ -829,6 +1325,75 @@ class Subpath(Shape):
     def transform(self, matrix):
         return Subpath(c.transform(matrix) for c in self.commands)
 
+    @property
+    def bounding_box(self):
+        control_points = (c.control_points for c in self.commands)
+        return BoundingBox.from_points(chain(*control_points))
+
+    def get_bounding_box(self, matrix):
+        control_points = (c.control_points for c in self.commands)
+        return _get_transformed_bounding_box(chain(*control_points), matrix)
+
+    def flatten(self, tolerance):
+        points = self.get_flat_points(tolerance)
+        if self.closed:
+            return [Polygon(points)]
+        elif len(points) == 2:
+            (x1, y1), (x2, y2) = points
+            return [Line(x1, y1, x2, y2)]
+        else:
+            return [Polyline(points)]
+
+    def get_flat_points(self, tolerance):
+        """Get the points of the subpath, with curves approximated by line
+        segments within the given tolerance.
+
+        For a closed subpath, the first point is not repeated at the end.
+        """
+        points = []
+        x, y = 0.0, 0.0
+        # The last control point, for smooth curves.
+        qx, qy = None, None
+        previous_letter = None
+        for command in self.commands:
+            letter = command.letter
+            if letter == 'M' or letter == 'L':
+                points.append((command.x, command.y))
+            elif letter == 'C':
+                _flatten_cubic(x, y, command.x1, command.y1, command.x2,
+                               command.y2, command.x, command.y, tolerance,
+                               points)
+                qx, qy = command.x2, command.y2
+            elif letter == 'S':
+                if previous_letter in ('C', 'S'):
+                    x1, y1 = 2.0 * x - qx, 2.0 * y - qy
+                else:
+                    x1, y1 = x, y
+                _flatten_cubic(x, y, x1, y1, command.x2, command.y2,
+                               command.x, command.y, tolerance, points)
+                qx, qy = command.x2, command.y2
+            elif letter == 'Q':
+                _flatten_quadratic(x, y, command.x1, command.y1, command.x,
+                                   command.y, tolerance, points)
+                qx, qy = command.x1, command.y1
+            elif letter == 'T':
+                if previous_letter in ('Q', 'T'):
+                    qx, qy = 2.0 * x - qx, 2.0 * y - qy
+                else:
+                    qx, qy = x, y
+                _flatten_quadratic(x, y, qx, qy, command.x, command.y,
+                                   tolerance, points)
+            elif letter == 'A':
+                _flatten_arc(x, y, command.rx, command.ry, command.rotation,
+                             command.large, command.sweep, command.x,
+                             command.y, tolerance, points)
+            if command.endpoint is not None:
+                x, y = command.endpoint
+            previous_letter = letter
+        if self.closed and len(points) >= 2 and points[-1] == points[0]:
+            points.pop()
+        return points
+
     @property
     def basic_shape(self):
         """Convert the subpath to a basic shape."""
@@ -845,12 +1410,20 @@ class Subpath(Shape):
     def closed(self):
         return self.commands and self.commands[-1].endpoint is None
 
+    @property
+    def perimeter(self):
+        """The length of the subpath, with curves flattened within a small
+        tolerance relative to the size of the subpath."""
+        return sum(s.perimeter for s in
+                   self.flatten(_get_fine_tolerance(self)))
+
 class Path(Shape):
     """A path."""
 
     _scanner = re.Scanner([
         ('[MmZzLlHhVvCcSsQqTtAa]', (lambda s, t: t)),
-        ('[-+0-9.Ee]+', (lambda s, t: float(t))),
+        ('[-+]?(?:[0-9]+\\.?[0-9]*|\\.[0-9]+)(?:[Ee][-+]?[0-9]+)?',
+         (lambda s, t: float(t))),
         ('[, \t\r\n]+', None),
     ])
 
@@ -874,16 +1447,30 @@ class Path(Shape):
         control_points = (c.control_points for c in self.commands)
         return BoundingBox.from_points(chain(*control_points))
 
+    def get_bounding_box(self, matrix):
+        control_points = (c.control_points for c in self.commands)
+        return _get_transformed_bounding_box(chain(*control_points), matrix)
+
     @property
     def commands(self):
         commands = (s.commands for s in self.subpaths)
         return chain(*commands)
 
+    @property
+    def perimeter(self):
+        """The total length of the subpaths, with curves flattened within a
+        small tolerance relative to the size of the path."""
+        return sum(s.perimeter for s in
+                   self.flatten(_get_fine_tolerance(self)))
+
     @property
     def basic_shapes(self):
         """Convert the path to basic shapes."""
         return [s.basic_shape for s in self.subpaths]
 
+    def flatten(self, tolerance):
+        return [s.flatten(tolerance)[0] for s in self.subpaths]
+
     @classmethod
     def from_string(cls, arg):
         assert isinstance(arg, basestring)
@@ -927,7 +1514,10 @@ class Path(Shape):
     def _split_polycommands(cls, commands):
         for command in commands:
             name = command[0]
-            arg_count = len(cls._command_classes[name.upper()].__slots__)
+            if name in 'HhVv':
+                arg_count = 1
+            else:
+                arg_count = len(cls._command_classes[name.upper()].__slots__)
             if len(command) - 1 > arg_count:
                 for i in xrange(1, len(command), arg_count):
                     if name == 'M' and i > 1:
@@ -1038,3 +1628,4832 @@ class Path(Shape):
             subpath.append(command)
         if subpath:
             yield subpath
+
+class Document(object):
+    """An SVG document.
+
+    The elements are indexed by id, Inkscape label, layer, class and element
+    type. Edit the document through its methods to keep the indexes up to
+    date.
+    """
+
+    # Attributes that the indexes depend on.
+    _indexed_attributes = frozenset(['id', 'class', 'inkscape:label',
+                                     'inkscape:groupmode'])
+
+    # Attributes that the shapes depend on.
+    _shape_attributes = frozenset(['d', 'x', 'y', 'width', 'height', 'cx',
+                                   'cy', 'r', 'rx', 'ry', 'points',
+                                   'sodipodi:type', 'sodipodi:cx',
+                                   'sodipodi:cy', 'sodipodi:rx',
+                                   'sodipodi:ry'])
+
+    def __init__(self, arg, thread_count=None):
+        """Load a document from a file name or a file object.
+
+        With a thread count, the path data, transforms and styles are parsed
+        on a thread pool before the elements are created. The result is the
+        same as when parsing serially.
+        """
+        self.dom = xml.dom.minidom.parse(arg)
+        cache = None
+        if thread_count:
+            cache = ParseCache()
+            cache.parse_all(self.dom, thread_count)
+        self.root = Element(self.dom.documentElement, cache=cache)
+        self._ids = {}
+        self._labels = {}
+        self._classes = {}
+        self._types = {}
+        self._layer_elements = {}
+        self._layers = None
+        self._index_element(self.root)
+
+    @property
+    def bounding_box(self):
+        """The bounding box of all shapes, in document coordinates."""
+        return self.root.bounding_box
+
+    @property
+    def layers(self):
+        """The layer elements, in document order."""
+        if self._layers is None:
+            self._layers = []
+            stack = [self.root]
+            while stack:
+                element = stack.pop()
+                if element in self._layer_elements:
+                    self._layers.append(element)
+                stack.extend(reversed(element.children))
+        return list(self._layers)
+
+    def get_element_by_id(self, id):
+        """Get the element with the given id, or None."""
+        return self._ids.get(id)
+
+    def query(self, id=None, label=None, layer=None, class_name=None,
+              type=None):
+        """Find the elements matching all of the given criteria.
+
+        The layer criterion is the label of the nearest enclosing layer, and
+        the type criterion is the local name of the element, such as
+        C{'path'}. Returns a list of (element, world matrix, shape) tuples.
+        """
+        if id is not None:
+            element = self._ids.get(id)
+            candidates = [] if element is None else [element]
+        else:
+            candidate_lists = []
+            if label is not None:
+                candidate_lists.append(self._labels.get(label, ()))
+            if layer is not None:
+                candidate_lists.append(list(chain(*(
+                    self._layer_elements[e] for e in self._labels.get(layer, ())
+                    if e in self._layer_elements))))
+            if class_name is not None:
+                candidate_lists.append(self._classes.get(class_name, ()))
+            if type is not None:
+                candidate_lists.append(self._types.get(type, ()))
+            if candidate_lists:
+                candidates = min(candidate_lists, key=len)
+            else:
+                candidates = chain(*self._types.values())
+        result = []
+        for element in candidates:
+            attributes = element.attributes
+            if ((label is None or attributes.get('inkscape:label') == label) and
+                (layer is None or element.layer is not None and
+                 element.layer.attributes.get('inkscape:label') == layer) and
+                (class_name is None or
+                 class_name in attributes.get('class', '').split()) and
+                (type is None or element.node.localName == type)):
+                result.append((element, element.world_matrix, element.shape))
+        return result
+
+    def create_element(self, parent, tag_name, attributes=None, index=None):
+        """Create an element and insert it into a parent element.
+
+        The element is inserted before the child at the given index, or
+        after the last child. Returns the new element.
+        """
+        prefix, _, local_name = tag_name.rpartition(':')
+        node = self.dom.createElementNS(_get_namespace(parent, prefix),
+                                        tag_name)
+        for name, value in (attributes or {}).items():
+            _set_node_attribute(parent, node, name, value)
+        if index is None or index >= len(parent.children):
+            parent.node.appendChild(node)
+            index = len(parent.children)
+        else:
+            parent.node.insertBefore(node, parent.children[index].node)
+        element = Element(node, parent)
+        parent.children.insert(index, element)
+        self._index_element(element)
+        return element
+
+    def remove_element(self, element):
+        """Remove an element and its descendants from the document."""
+        self._unindex_element(element)
+        element.parent.children.remove(element)
+        element.parent.node.removeChild(element.node)
+        element.parent = None
+        element._invalidate_world_matrix()
+
+    def set_attribute(self, element, name, value):
+        """Set an attribute of an element, or remove it if the value is None.
+
+        The matrix, style or shape of the element is updated to match.
+        """
+        indexed = name in self._indexed_attributes
+        if indexed:
+            self._unindex_element(element)
+        node = element.node
+        if value is None:
+            element.attributes.pop(name, None)
+            if node.hasAttribute(name):
+                node.removeAttribute(name)
+        else:
+            element.attributes[name] = value
+            _set_node_attribute(element, node, name, value)
+        if name == 'transform':
+            element.matrix = Matrix.from_string(value) if value else Matrix()
+        elif name == 'style':
+            element._style = None
+        elif name in self._shape_attributes:
+            element.shape = parse_shape(node)
+        if indexed:
+            self._index_element(element)
+
+    def _index_element(self, element):
+        """Add an element and its descendants to the indexes."""
+        stack = [element]
+        while stack:
+            element = stack.pop()
+            parent = element.parent
+            if parent is None:
+                element.layer = None
+            elif parent.is_layer:
+                element.layer = parent
+            else:
+                element.layer = parent.layer
+            attributes = element.attributes
+            if 'id' in attributes:
+                self._ids.setdefault(attributes['id'], element)
+            label = attributes.get('inkscape:label')
+            if label is not None:
+                self._labels.setdefault(label, []).append(element)
+            for class_name in attributes.get('class', '').split():
+                self._classes.setdefault(class_name, []).append(element)
+            self._types.setdefault(element.node.localName, []).append(element)
+            if element.is_layer:
+                self._layer_elements[element] = []
+                self._layers = None
+            if element.layer is not None:
+                self._layer_elements[element.layer].append(element)
+            stack.extend(reversed(element.children))
+
+    def _unindex_element(self, element):
+        """Remove an element and its descendants from the indexes."""
+        stack = [element]
+        while stack:
+            element = stack.pop()
+            attributes = element.attributes
+            if self._ids.get(attributes.get('id')) is element:
+                del self._ids[attributes.get('id')]
+            label = attributes.get('inkscape:label')
+            if label is not None:
+                _remove_indexed(self._labels, label, element)
+            for class_name in attributes.get('class', '').split():
+                _remove_indexed(self._classes, class_name, element)
+            _remove_indexed(self._types, element.node.localName, element)
+            if self._layer_elements.pop(element, None) is not None:
+                self._layers = None
+            if element.layer in self._layer_elements:
+                self._layer_elements[element.layer].remove(element)
+            stack.extend(element.children)
+
+    def save(self, arg, precision=3):
+        """Save the document to a file name or a file object."""
+        writer = Writer(precision)
+        if isinstance(arg, basestring):
+            with open(arg, 'wb') as file_obj:
+                writer.write_document(self, file_obj)
+        else:
+            writer.write_document(self, arg)
+
+class Element(object):
+    """An element in an SVG document, with its shape and transformation
+    matrix."""
+
+    def __init__(self, node, parent=None, cache=None):
+        """Initialize an element from a DOM node, using the parse cache if
+        given."""
+        self.node = node
+        self.parent = parent
+        self.layer = None
+        self.attributes = dict(node.attributes.items())
+        self._world_matrix = None
+        self._style = None
+        transform = node.getAttribute('transform')
+        if not transform:
+            self.matrix = Matrix()
+        elif cache is not None:
+            self.matrix = cache.get_matrix(transform)
+        else:
+            self.matrix = Matrix.from_string(transform)
+        if cache is not None and 'style' in self.attributes:
+            self._style = cache.get_style(self.attributes['style'])
+        self.shape = parse_shape(node, cache)
+        self.children = [Element(c, self, cache) for c in node.childNodes
+                         if c.nodeType == c.ELEMENT_NODE]
+
+    def __repr__(self):
+        return '<Element %s>' % self.node.tagName
+
+    @property
+    def matrix(self):
+        """The transformation matrix from the element to its parent."""
+        return self._matrix
+
+    @matrix.setter
+    def matrix(self, matrix):
+        self._matrix = matrix
+        self._invalidate_world_matrix()
+
+    @property
+    def world_matrix(self):
+        """The transformation matrix from the element to the document.
+
+        The matrix is cached until the matrix of the element or one of its
+        ancestors changes.
+        """
+        if self._world_matrix is None:
+            if self.parent is None:
+                self._world_matrix = self._matrix
+            else:
+                self._world_matrix = self.parent.world_matrix * self._matrix
+        return self._world_matrix
+
+    @property
+    def style(self):
+        """The properties of the style attribute, as a dictionary."""
+        if self._style is None:
+            self._style = parse_style(self.attributes.get('style', ''))
+        return self._style
+
+    @property
+    def is_layer(self):
+        """Is the element an Inkscape layer?"""
+        return self.attributes.get('inkscape:groupmode') == 'layer'
+
+    def _invalidate_world_matrix(self):
+        # Descendants only cache their world matrices after their ancestors.
+        stack = [self]
+        while stack:
+            element = stack.pop()
+            if element._world_matrix is not None:
+                element._world_matrix = None
+                stack.extend(element.children)
+
+    @property
+    def bounding_box(self):
+        """The bounding box of the element and its descendants, in the
+        coordinate system of the parent element."""
+        return self.get_bounding_box(Matrix())
+
+    def get_bounding_box(self, matrix):
+        """Get the bounding box of the element and its descendants, after
+        applying the given transformation matrix.
+
+        The extents of the shapes are collected in one pass over the tree,
+        and reduced at the end.
+        """
+        min_xs, min_ys = array('d'), array('d')
+        max_xs, max_ys = array('d'), array('d')
+        stack = [(self, matrix)]
+        while stack:
+            element, matrix = stack.pop()
+            matrix = matrix * element.matrix
+            if element.shape is not None:
+                bounding_box = element.shape.get_bounding_box(matrix)
+                if bounding_box:
+                    min_xs.append(bounding_box.min_x)
+                    min_ys.append(bounding_box.min_y)
+                    max_xs.append(bounding_box.max_x)
+                    max_ys.append(bounding_box.max_y)
+            stack.extend((c, matrix) for c in element.children)
+        if not min_xs:
+            return BoundingBox()
+        return BoundingBox(min(min_xs), min(min_ys), max(max_xs), max(max_ys))
+
+class ParseCache(object):
+    """Parsed path data, transforms and styles, keyed by their strings.
+
+    The cache can be filled by many threads at once, and is then used to
+    create the elements of a document. Each element gets its own copy of
+    the parsed path and style dictionary, so elements with equal strings
+    can be modified independently, as when parsing serially. Matrices are
+    immutable, so they are shared.
+    """
+
+    def __init__(self):
+        self.paths = {}
+        self.matrices = {}
+        self.styles = {}
+
+    def get_path(self, d):
+        """Get a copy of the path for path data, parsing it if
+        necessary."""
+        path = self._get_parsed(self.paths, Path.from_string, d)
+        return Path(Subpath(c.__class__(*[getattr(c, n) for n in c.__slots__])
+                            for c in s.commands) for s in path.subpaths)
+
+    def get_matrix(self, transform):
+        """Get the matrix for a transform, parsing it if necessary."""
+        return self._get_parsed(self.matrices, Matrix.from_string, transform)
+
+    def get_style(self, style):
+        """Get a copy of the properties of a style, parsing it if
+        necessary."""
+        return dict(self._get_parsed(self.styles, parse_style, style))
+
+    def parse_all(self, dom, thread_count):
+        """Parse the distinct path data, transforms and styles of a DOM on a
+        thread pool.
+
+        Each distinct string is parsed by exactly one task, and the results
+        are added to the dictionaries with atomic operations, which are
+        thread-safe with or without the global interpreter lock. The results
+        are only copied when the elements are created.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        paths, transforms, styles = set(), set(), set()
+        stack = [dom.documentElement]
+        while stack:
+            node = stack.pop()
+            if (node.namespaceURI == SVG_NAMESPACE and
+                node.localName == 'path' and
+                node.getAttributeNS(SODIPODI_NAMESPACE, 'type') != 'arc'):
+                paths.add(node.getAttribute('d'))
+            if node.getAttribute('transform'):
+                transforms.add(node.getAttribute('transform'))
+            if node.hasAttribute('style'):
+                styles.add(node.getAttribute('style'))
+            stack.extend(c for c in node.childNodes
+                         if c.nodeType == c.ELEMENT_NODE)
+        with ThreadPoolExecutor(thread_count) as executor:
+            futures = []
+            for results, parse, args in (
+                    (self.paths, Path.from_string, list(paths)),
+                    (self.matrices, Matrix.from_string, list(transforms)),
+                    (self.styles, parse_style, list(styles))):
+                # A few chunks per thread balance the load without paying
+                # for a task per string.
+                chunk_size = max(1, len(args) // (4 * thread_count))
+                for i in xrange(0, len(args), chunk_size):
+                    futures.append(executor.submit(
+                        self._parse_each, results, parse,
+                        args[i:i + chunk_size]))
+            for future in futures:
+                future.result()
+
+    def _get_parsed(self, results, parse, arg):
+        result = results.get(arg)
+        if result is None:
+            result = results.setdefault(arg, parse(arg))
+        return result
+
+    def _parse_each(self, results, parse, args):
+        for arg in args:
+            self._get_parsed(results, parse, arg)
+
+def _get_namespace(element, prefix):
+    """Get the namespace URI that a prefix is bound to at an element."""
+    name = 'xmlns:' + prefix if prefix else 'xmlns'
+    while element is not None:
+        if name in element.attributes:
+            return element.attributes[name]
+        element = element.parent
+    return None if prefix else SVG_NAMESPACE
+
+def _set_node_attribute(parent, node, name, value):
+    """Set an attribute of a DOM node, in the namespace of its prefix."""
+    prefix, _, local_name = name.rpartition(':')
+    if prefix and prefix != 'xmlns':
+        node.setAttributeNS(_get_namespace(parent, prefix), name, value)
+    else:
+        node.setAttribute(name, value)
+
+def _remove_indexed(index, key, element):
+    elements = index[key]
+    elements.remove(element)
+    if not elements:
+        del index[key]
+
+class Writer(object):
+    """A fast SVG writer with configurable numeric precision.
+
+    Path data is written as compactly as possible, using relative commands,
+    horizontal and vertical lineto shortcuts, implicit command repetition,
+    and no redundant separators. The output is collected in a single buffer.
+    """
+
+    # Elements where whitespace is significant.
+    _text_elements = frozenset(['text', 'tspan', 'textPath', 'flowRoot',
+                                'flowPara', 'flowSpan', 'title', 'desc',
+                                'style', 'script'])
+
+    def __init__(self, precision=3, matrix_precision=6):
+        """Initialize a writer, rounding coordinates to the given number of
+        decimals, and the linear part of matrices to the given matrix
+        precision."""
+        self.precision = precision
+        self.matrix_precision = matrix_precision
+
+    def format_number(self, value, precision=None):
+        """Format a number in the shortest form with the given precision."""
+        if precision is None:
+            precision = self.precision
+        return _get_number_formatter(precision)(value)
+
+    def format_path(self, path):
+        """Format a path as compact SVG path data."""
+        parts = []
+        self._write_path_data(path, parts.append)
+        return ''.join(parts)
+
+    def format_matrix(self, matrix):
+        """Format a matrix as a compact SVG transform, or None for the
+        identity matrix."""
+        a, b, c, d, e, f = matrix.abcdef
+        if b == 0.0 and c == 0.0:
+            if a == 1.0 and d == 1.0:
+                if e == 0.0 and f == 0.0:
+                    return None
+                if f == 0.0:
+                    return 'translate(%s)' % self.format_number(e)
+                return 'translate(%s,%s)' % (self.format_number(e),
+                                             self.format_number(f))
+            if e == 0.0 and f == 0.0:
+                precision = self.matrix_precision
+                if a == d:
+                    return 'scale(%s)' % self.format_number(a, precision)
+                return 'scale(%s,%s)' % (self.format_number(a, precision),
+                                         self.format_number(d, precision))
+        args = [self.format_number(x, self.matrix_precision)
+                for x in (a, b, c, d)]
+        args.extend([self.format_number(e), self.format_number(f)])
+        return 'matrix(%s)' % ','.join(args)
+
+    def format_document(self, document):
+        """Format a document as a unicode string."""
+        parts = [u'<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n']
+        append = parts.append
+        for node in document.dom.childNodes:
+            if node.nodeType == node.ELEMENT_NODE:
+                self._write_element(document.root, append)
+            elif node.nodeType == node.COMMENT_NODE:
+                append(u'<!--%s-->\n' % node.data)
+        return u''.join(parts)
+
+    def write_document(self, document, file_obj):
+        """Write a document to a binary file object as UTF-8."""
+        file_obj.write(self.format_document(document).encode('utf-8'))
+
+    def _write_element(self, element, append):
+        node = element.node
+        tag_name = node.tagName
+        attributes = dict(element.attributes)
+        transform = self.format_matrix(element.matrix)
+        if transform is None:
+            attributes.pop('transform', None)
+        else:
+            attributes['transform'] = transform
+        if element.shape is not None:
+            tag_name = self._update_shape_attributes(element, tag_name,
+                                                     attributes)
+        append(u'<')
+        append(tag_name)
+        for name, value in sorted(attributes.items()):
+            append(u' %s="%s"' % (name, _escape_xml(value, True)))
+        if not node.childNodes:
+            append(u'/>')
+            return
+        append(u'>')
+        preserve_space = node.localName in self._text_elements
+        children = iter(element.children)
+        for child_node in node.childNodes:
+            node_type = child_node.nodeType
+            if node_type == child_node.ELEMENT_NODE:
+                self._write_element(next(children), append)
+            elif node_type == child_node.TEXT_NODE:
+                if preserve_space or child_node.data.strip():
+                    append(_escape_xml(child_node.data))
+            elif node_type == child_node.CDATA_SECTION_NODE:
+                append(u'<![CDATA[%s]]>' % child_node.data)
+            elif node_type == child_node.COMMENT_NODE:
+                append(u'<!--%s-->' % child_node.data)
+        append(u'</%s>' % tag_name)
+
+    def _update_shape_attributes(self, element, tag_name, attributes):
+        """Update the geometry attributes from the shape of the element, and
+        get the tag name to write the element with."""
+        node = element.node
+        shape = element.shape
+        number = self.format_number
+        if node.localName == 'circle' and isinstance(shape, Circle):
+            attributes.update(cx=number(shape.cx), cy=number(shape.cy),
+                              r=number(shape.r))
+            return tag_name
+        if node.localName == 'rect' and isinstance(shape, Rect):
+            attributes.update(x=number(shape.x), y=number(shape.y),
+                              width=number(shape.width),
+                              height=number(shape.height))
+            for name in ('rx', 'ry'):
+                value = getattr(shape, name)
+                if value:
+                    attributes[name] = number(value)
+                else:
+                    attributes.pop(name, None)
+            return tag_name
+        if (node.localName == 'ellipse' and isinstance(shape, Ellipse) and
+            not shape.rotation):
+            attributes.update(cx=number(shape.cx), cy=number(shape.cy),
+                              rx=number(shape.rx), ry=number(shape.ry))
+            return tag_name
+        if node.localName == 'path' and isinstance(shape, (Circle, Ellipse)):
+            # Keep the Inkscape arc parameters in sync with the path data.
+            if isinstance(shape, Circle):
+                rx = ry = shape.r
+            else:
+                rx, ry = shape.rx, shape.ry
+            for name, value in (('cx', shape.cx), ('cy', shape.cy),
+                                ('rx', rx), ('ry', ry)):
+                attribute_node = node.getAttributeNodeNS(SODIPODI_NAMESPACE,
+                                                         name)
+                if attribute_node is not None:
+                    attributes[attribute_node.name] = number(value)
+        for name in ('cx', 'cy', 'r', 'rx', 'ry', 'x', 'y', 'width',
+                     'height'):
+            attributes.pop(name, None)
+        path = shape if isinstance(shape, Path) else shape.path
+        attributes['d'] = self.format_path(path)
+        if tag_name == node.localName:
+            return 'path'
+        return tag_name[:-len(node.localName)] + 'path'
+
+    def _write_path_data(self, path, append):
+        number = _get_number_formatter(self.precision)
+        # The current point and start point, as a reader of the written data
+        # will see them.
+        px, py = 0.0, 0.0
+        sx, sy = 0.0, 0.0
+        # The last written letter and number.
+        letter = None
+        last = ''
+        for command in path.commands:
+            name = command.letter
+            if name == 'Z':
+                append('z')
+                px, py = sx, sy
+                letter = 'z'
+                last = ''
+                continue
+            if name == 'L' or name == 'M' or name == 'T':
+                coords = command.x, command.y
+            elif name == 'C':
+                coords = (command.x1, command.y1, command.x2, command.y2,
+                          command.x, command.y)
+            elif name == 'A':
+                coords = command.x, command.y
+            else:
+                coords = [getattr(command, s) for s in command.__slots__]
+            absolute = [number(v) for v in coords]
+            relative = [number(v - (py if i & 1 else px))
+                        for i, v in enumerate(coords)]
+            if len(''.join(relative)) < len(''.join(absolute)):
+                best_letter, args = name.lower(), relative
+            else:
+                best_letter, args = name, absolute
+            if name == 'L':
+                if relative[1] == '0':
+                    if len(relative[0]) < len(absolute[0]):
+                        best_letter, args = 'h', relative[:1]
+                    else:
+                        best_letter, args = 'H', absolute[:1]
+                elif relative[0] == '0':
+                    if len(relative[1]) < len(absolute[1]):
+                        best_letter, args = 'v', relative[1:]
+                    else:
+                        best_letter, args = 'V', absolute[1:]
+            if letter == 'M':
+                implicit = 'L'
+            elif letter == 'm':
+                implicit = 'l'
+            else:
+                implicit = letter
+            if best_letter != implicit or letter == 'z':
+                append(best_letter)
+                last = ''
+            if name == 'A':
+                args = [number(command.rx), number(command.ry),
+                        number(command.rotation),
+                        '1' if command.large else '0',
+                        '1' if command.sweep else '0'] + args
+            for arg in args:
+                if last and arg[0] != '-' and not (arg[0] == '.' and
+                                                   '.' in last):
+                    append(' ')
+                append(arg)
+                last = arg
+            if best_letter == 'H':
+                px = float(args[0])
+            elif best_letter == 'h':
+                px += float(args[0])
+            elif best_letter == 'V':
+                py = float(args[0])
+            elif best_letter == 'v':
+                py += float(args[0])
+            elif best_letter == name:
+                px, py = float(args[-2]), float(args[-1])
+            else:
+                px += float(args[-2])
+                py += float(args[-1])
+            letter = best_letter
+            if name == 'M':
+                sx, sy = px, py
+
+def _get_number_formatter(precision):
+    """Get a function that formats numbers in the shortest form with the
+    given number of decimals."""
+    format_str = '%%.%if' % precision
+    def format_number(value):
+        result = format_str % value
+        if precision:
+            result = result.rstrip('0').rstrip('.')
+        if result[0] == '0':
+            if len(result) > 1:
+                return result[1:]
+        elif result[0] == '-' and result[1] == '0':
+            if len(result) == 2:
+                return '0'
+            if result[2] == '.':
+                return '-' + result[2:]
+        return result
+    return format_number
+
+def _escape_xml(data, quote=False):
+    """Escape special characters in XML character data."""
+    if '&' in data:
+        data = data.replace('&', '&amp;')
+    if '<' in data:
+        data = data.replace('<', '&lt;')
+    if '>' in data:
+        data = data.replace('>', '&gt;')
+    if quote and '"' in data:
+        data = data.replace('"', '&quot;')
+    return data
+
+def _is_similarity(a, b, c, d):
+    """Does the linear part of a matrix maintain aspect ratio?"""
+    epsilon = 1e-9 * (abs(a) + abs(b) + abs(c) + abs(d))
+    return ((abs(a - d) <= epsilon and abs(b + c) <= epsilon) or
+            (abs(a + d) <= epsilon and abs(b - c) <= epsilon))
+
+def _transform_ellipse(matrix, rx, ry, rotation):
+    """Get the radii and rotation angle of a transformed ellipse.
+
+    The ellipse is the image of the unit circle under a linear map, and its
+    radii are the singular values of that map.
+    """
+    a, b, c, d = matrix.abcdef[:4]
+    rotation_rad = rotation * math.pi / 180.0
+    cos_rotation = math.cos(rotation_rad)
+    sin_rotation = math.sin(rotation_rad)
+    # The images of the ellipse axes.
+    ux = rx * (a * cos_rotation + c * sin_rotation)
+    uy = rx * (b * cos_rotation + d * sin_rotation)
+    vx = ry * (c * cos_rotation - a * sin_rotation)
+    vy = ry * (d * cos_rotation - b * sin_rotation)
+    p = ux * ux + vx * vx
+    q = ux * uy + vx * vy
+    r = uy * uy + vy * vy
+    mean = 0.5 * (p + r)
+    deviation = math.hypot(0.5 * (p - r), q)
+    major = math.sqrt(mean + deviation)
+    minor = math.sqrt(max(0.0, mean - deviation))
+    angle = 0.5 * math.atan2(2.0 * q, p - r) * 180.0 / math.pi
+    return major, minor, angle
+
+def _get_ellipse_extents(rx, ry, rotation):
+    """Get the half width and half height of the bounding box of a rotated
+    ellipse."""
+    rotation_rad = rotation * math.pi / 180.0
+    cos_rotation = math.cos(rotation_rad)
+    sin_rotation = math.sin(rotation_rad)
+    return (math.hypot(rx * cos_rotation, ry * sin_rotation),
+            math.hypot(rx * sin_rotation, ry * cos_rotation))
+
+def _get_transformed_bounding_box(points, matrix):
+    """Get the bounding box of points after applying a matrix, without
+    creating the transformed points."""
+    a, b, c, d, e, f = matrix.abcdef
+    min_x = min_y = float('inf')
+    max_x = max_y = float('-inf')
+    for x, y in points:
+        tx = a * x + c * y + e
+        ty = b * x + d * y + f
+        if tx < min_x:
+            min_x = tx
+        if tx > max_x:
+            max_x = tx
+        if ty < min_y:
+            min_y = ty
+        if ty > max_y:
+            max_y = ty
+    return BoundingBox(min_x, min_y, max_x, max_y)
+
+def _get_ellipse_perimeter(rx, ry):
+    """Get the perimeter of an ellipse, using Ramanujan's second
+    approximation.
+
+    See: U{http://en.wikipedia.org/wiki/Ellipse#Circumference}
+    """
+    if not rx + ry:
+        return 0.0
+    h = ((rx - ry) / (rx + ry)) ** 2
+    return math.pi * (rx + ry) * (1.0 + 3.0 * h / (10.0 + math.sqrt(4.0 -
+                                                                    3.0 * h)))
+
+def _get_fine_tolerance(shape):
+    """Get a flattening tolerance that is small relative to the size of a
+    shape."""
+    bounding_box = shape.bounding_box
+    return 1e-6 * max(bounding_box.width, bounding_box.height) or 1e-6
+
+def _get_length(points):
+    """Get the length of a line strip."""
+    return sum(math.hypot(x2 - x1, y2 - y1)
+               for (x1, y1), (x2, y2) in zip(points, points[1:]))
+
+def _get_arc_segment_count(radius, angle, tolerance):
+    """Get the number of line segments needed to approximate a circular arc
+    within the given tolerance."""
+    if radius <= 0.5 * tolerance:
+        return 1
+    step = 2.0 * math.acos(1.0 - tolerance / radius)
+    return max(1, int(math.ceil(abs(angle) / step)))
+
+def _flatten_cubic(x0, y0, x1, y1, x2, y2, x3, y3, tolerance, points):
+    """Append points approximating a cubic Bezier curve, excluding the first
+    point.
+
+    The segment count is the bound given by Wang's formula.
+    """
+    dd = max(math.hypot(x0 - 2.0 * x1 + x2, y0 - 2.0 * y1 + y2),
+             math.hypot(x1 - 2.0 * x2 + x3, y1 - 2.0 * y2 + y3))
+    count = max(1, int(math.ceil(math.sqrt(0.75 * dd / tolerance))))
+    for i in xrange(1, count):
+        t = float(i) / float(count)
+        u = 1.0 - t
+        b0, b1, b2, b3 = u * u * u, 3.0 * u * u * t, 3.0 * u * t * t, t * t * t
+        points.append((b0 * x0 + b1 * x1 + b2 * x2 + b3 * x3,
+                       b0 * y0 + b1 * y1 + b2 * y2 + b3 * y3))
+    points.append((x3, y3))
+
+def _flatten_quadratic(x0, y0, x1, y1, x2, y2, tolerance, points):
+    """Append points approximating a quadratic Bezier curve, excluding the
+    first point."""
+    dd = math.hypot(x0 - 2.0 * x1 + x2, y0 - 2.0 * y1 + y2)
+    count = max(1, int(math.ceil(math.sqrt(0.25 * dd / tolerance))))
+    for i in xrange(1, count):
+        t = float(i) / float(count)
+        u = 1.0 - t
+        b0, b1, b2 = u * u, 2.0 * u * t, t * t
+        points.append((b0 * x0 + b1 * x1 + b2 * x2,
+                       b0 * y0 + b1 * y1 + b2 * y2))
+    points.append((x2, y2))
+
+def _flatten_arc(x1, y1, rx, ry, rotation, large, sweep, x2, y2, tolerance,
+                 points):
+    """Append points approximating an elliptical arc, excluding the first
+    point.
+
+    See: U{http://www.w3.org/TR/SVG/implnote.html#ArcImplementationNotes}
+    """
+    if (x1, y1) == (x2, y2):
+        return
+    rx, ry = abs(rx), abs(ry)
+    if not rx or not ry:
+        points.append((x2, y2))
+        return
+    phi = rotation * math.pi / 180.0
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = 0.5 * (x1 - x2), 0.5 * (y1 - y2)
+    x1p = cos_phi * dx + sin_phi * dy
+    y1p = -sin_phi * dx + cos_phi * dy
+    scale = (x1p / rx) ** 2 + (y1p / ry) ** 2
+    if scale > 1.0:
+        rx *= math.sqrt(scale)
+        ry *= math.sqrt(scale)
+    numerator = (rx * ry) ** 2 - (rx * y1p) ** 2 - (ry * x1p) ** 2
+    denominator = (rx * y1p) ** 2 + (ry * x1p) ** 2
+    coefficient = math.sqrt(max(0.0, numerator / denominator))
+    if bool(large) == bool(sweep):
+        coefficient = -coefficient
+    cxp = coefficient * rx * y1p / ry
+    cyp = -coefficient * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + 0.5 * (x1 + x2)
+    cy = sin_phi * cxp + cos_phi * cyp + 0.5 * (y1 + y2)
+    theta = math.atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+    delta = math.atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx) - theta
+    if sweep and delta < 0.0:
+        delta += 2.0 * math.pi
+    elif not sweep and delta > 0.0:
+        delta -= 2.0 * math.pi
+    count = _get_arc_segment_count(max(rx, ry), delta, tolerance)
+    for i in xrange(1, count):
+        angle = theta + delta * float(i) / float(count)
+        ex, ey = rx * math.cos(angle), ry * math.sin(angle)
+        points.append((cx + cos_phi * ex - sin_phi * ey,
+                       cy + sin_phi * ex + cos_phi * ey))
+    points.append((x2, y2))
+
+def _simplify_points(points, tolerance):
+    """Simplify a point sequence with the Ramer-Douglas-Peucker algorithm.
+
+    The first and last points are always kept.
+    """
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    squared_tolerance = tolerance ** 2
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        x2, y2 = points[last]
+        dx, dy = x2 - x1, y2 - y1
+        squared_length = dx * dx + dy * dy
+        max_distance, max_index = -1.0, None
+        for i in xrange(first + 1, last):
+            x, y = points[i]
+            if squared_length:
+                t = ((x - x1) * dx + (y - y1) * dy) / squared_length
+                t = min(max(t, 0.0), 1.0)
+                distance = (x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2
+            else:
+                distance = (x - x1) ** 2 + (y - y1) ** 2
+            if distance > max_distance:
+                max_distance, max_index = distance, i
+        if max_index is not None and max_distance > squared_tolerance:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+def _get_rings(shape, tolerance):
+    """Get the closed outlines of a flattened shape as point lists.
+
+    Open subpaths are closed implicitly, as when filling them.
+    """
+    rings = []
+    for basic_shape in shape.flatten(tolerance):
+        if isinstance(basic_shape, (Polygon, Polyline)):
+            points = list(basic_shape.points)
+            if len(points) >= 2 and points[0] == points[-1]:
+                points.pop()
+            if len(points) >= 3:
+                rings.append(points)
+    return rings
+
+def _get_ring_area(points):
+    area = 0.0
+    for i in xrange(-1, len(points) - 1):
+        x1, y1 = points[i]
+        x2, y2 = points[i + 1]
+        area += x1 * y2 - x2 * y1
+    return 0.5 * area
+
+def _create_region_path(regions):
+    """Create a path from regions given as outer rings with holes."""
+    subpaths = []
+    for outer, holes in regions:
+        for points in [outer] + holes:
+            commands = [Moveto(*points[0])]
+            commands.extend(Lineto(x, y) for x, y in points[1:])
+            commands.append(Closepath())
+            subpaths.append(Subpath(commands))
+    return Path(subpaths)
+
+def _boolean(shape, other, tolerance, predicate):
+    regions = _overlay([_get_rings(shape, tolerance),
+                        _get_rings(other, tolerance)],
+                       lambda windings: predicate(windings[0] != 0,
+                                                  windings[1] != 0))
+    return _create_region_path(regions)
+
+class _WindingIndex(object):
+    """Edges bucketed into horizontal bands, for computing winding numbers
+    without visiting every edge."""
+
+    def __init__(self, edges, operand_count):
+        self.operand_count = operand_count
+        self.band_count = max(1, int(math.sqrt(len(edges))))
+        ys = [y for edge in edges for y in (edge[1], edge[3])] or [0.0]
+        self.min_y = min(ys)
+        self.band_height = ((max(ys) - self.min_y) / self.band_count or 1.0)
+        self.bands = [[] for i in xrange(self.band_count)]
+        for edge in edges:
+            first = self._get_band(min(edge[1], edge[3]))
+            last = self._get_band(max(edge[1], edge[3]))
+            for band in xrange(first, last + 1):
+                self.bands[band].append(edge)
+
+    def _get_band(self, y):
+        band = int((y - self.min_y) / self.band_height)
+        return min(max(band, 0), self.band_count - 1)
+
+    def get_windings(self, x, y):
+        """Get the winding numbers of a point for each operand.
+
+        See: U{http://geomalgorithms.com/a03-_inclusion.html}
+        """
+        windings = [0] * self.operand_count
+        for x1, y1, x2, y2, operand in self.bands[self._get_band(y)]:
+            if y1 <= y:
+                if y2 > y and (x2 - x1) * (y - y1) - (x - x1) * (y2 - y1) > 0.0:
+                    windings[operand] += 1
+            elif y2 <= y and (x2 - x1) * (y - y1) - (x - x1) * (y2 - y1) < 0.0:
+                windings[operand] -= 1
+        return windings
+
+def _overlay(operands, predicate):
+    """Compute a boolean combination of operands, each given as a list of
+    rings with the nonzero fill rule.
+
+    All edges are split where they cross or touch, and each resulting edge
+    is kept if the predicate, given the winding numbers of the operands,
+    holds on exactly one of its sides. Shared edges between adjacent inputs
+    are thereby removed. The kept edges are linked into regions, each an
+    outer ring with counter-clockwise orientation and a list of clockwise
+    holes.
+    """
+    edges = []
+    for operand, rings in enumerate(operands):
+        for points in rings:
+            points = [(float(x), float(y)) for x, y in points]
+            for i in xrange(len(points)):
+                x1, y1 = points[i - 1]
+                x2, y2 = points[i]
+                if (x1, y1) != (x2, y2):
+                    edges.append((x1, y1, x2, y2, operand))
+    if not edges:
+        return []
+    xs = [x for edge in edges for x in (edge[0], edge[2])]
+    ys = [y for edge in edges for y in (edge[1], edge[3])]
+    extent = max(max(xs) - min(xs), max(ys) - min(ys)) or 1.0
+    epsilon = 1e-9 * extent
+
+    # Find the split points of all edges, testing only pairs of edges that
+    # share a cell in a uniform grid.
+    splits = [[(x1, y1), (x2, y2)] for x1, y1, x2, y2, operand in edges]
+    cell_size = (sum(abs(x2 - x1) + abs(y2 - y1)
+                     for x1, y1, x2, y2, operand in edges) / len(edges) or
+                 extent)
+    cells = {}
+    for i, (x1, y1, x2, y2, operand) in enumerate(edges):
+        min_col = int(math.floor((min(x1, x2) - epsilon) / cell_size))
+        max_col = int(math.floor((max(x1, x2) + epsilon) / cell_size))
+        min_row = int(math.floor((min(y1, y2) - epsilon) / cell_size))
+        max_row = int(math.floor((max(y1, y2) + epsilon) / cell_size))
+        for col in xrange(min_col, max_col + 1):
+            for row in xrange(min_row, max_row + 1):
+                cells.setdefault((col, row), []).append(i)
+    tested = set()
+    for cell in cells.values():
+        for position, i in enumerate(cell):
+            ax1, ay1, ax2, ay2 = edges[i][:4]
+            for j in cell[position + 1:]:
+                if (i, j) in tested:
+                    continue
+                tested.add((i, j))
+                bx1, by1, bx2, by2 = edges[j][:4]
+                if (max(bx1, bx2) < min(ax1, ax2) - epsilon or
+                    min(bx1, bx2) > max(ax1, ax2) + epsilon or
+                    max(by1, by2) < min(ay1, ay2) - epsilon or
+                    min(by1, by2) > max(ay1, ay2) + epsilon):
+                    continue
+                _split_edges(ax1, ay1, ax2, ay2, bx1, by1, bx2, by2, epsilon,
+                             splits[i], splits[j])
+
+    # Snap the split points, and collect the unique edge fragments.
+    snapped = {}
+    def snap(point):
+        key = int(round(point[0] / epsilon)), int(round(point[1] / epsilon))
+        return snapped.setdefault(key, point)
+    fragments = set()
+    for (x1, y1, x2, y2, operand), points in zip(edges, splits):
+        dx, dy = x2 - x1, y2 - y1
+        points.sort(key=lambda p: (p[0] - x1) * dx + (p[1] - y1) * dy)
+        points = [snap(p) for p in points]
+        for p, q in zip(points, points[1:]):
+            if p != q:
+                fragments.add((p, q) if p < q else (q, p))
+
+    # Keep the fragments where the predicate changes, with the inside on
+    # the left.
+    index = _WindingIndex(edges, len(operands))
+    offset = 1e-7 * extent
+    outgoing = {}
+    for p, q in fragments:
+        (x1, y1), (x2, y2) = p, q
+        length = math.hypot(x2 - x1, y2 - y1)
+        nx, ny = -(y2 - y1) / length * offset, (x2 - x1) / length * offset
+        mx, my = 0.5 * (x1 + x2), 0.5 * (y1 + y2)
+        left = predicate(index.get_windings(mx + nx, my + ny))
+        right = predicate(index.get_windings(mx - nx, my - ny))
+        if left != right:
+            if not left:
+                p, q = q, p
+            outgoing.setdefault(p, []).append(q)
+
+    # Link the kept fragments into rings, turning as sharply clockwise as
+    # possible at each vertex so that regions touching at a vertex stay
+    # separate.
+    rings = []
+    while outgoing:
+        start = next(iter(outgoing))
+        ring = [start]
+        p, q = start, outgoing[start].pop()
+        while True:
+            if not outgoing[p]:
+                del outgoing[p]
+            if q == start:
+                break
+            ring.append(q)
+            candidates = outgoing.get(q)
+            if not candidates:
+                break
+            back = math.atan2(p[1] - q[1], p[0] - q[0])
+            def turn(r):
+                angle = back - math.atan2(r[1] - q[1], r[0] - q[0])
+                return angle % (2.0 * math.pi) or 2.0 * math.pi
+            r = min(candidates, key=turn)
+            candidates.remove(r)
+            p, q = q, r
+        ring = _remove_collinear_points(ring, epsilon)
+        if len(ring) >= 3:
+            rings.append(ring)
+
+    # Assign each hole to the smallest outer ring containing it.
+    outers = [(_get_ring_area(r), r) for r in rings]
+    holes = [r for area, r in outers if area < 0.0]
+    outers = sorted((area, r) for area, r in outers if area > 0.0)
+    regions = [(r, []) for area, r in outers]
+    for hole in holes:
+        (x1, y1), (x2, y2) = hole[0], hole[1]
+        length = math.hypot(x2 - x1, y2 - y1)
+        x = 0.5 * (x1 + x2) - (y2 - y1) / length * offset
+        y = 0.5 * (y1 + y2) + (x2 - x1) / length * offset
+        for outer, outer_holes in regions:
+            if _get_winding(outer, x, y):
+                outer_holes.append(hole)
+                break
+    return regions
+
+def _split_edges(ax1, ay1, ax2, ay2, bx1, by1, bx2, by2, epsilon, a_points,
+                 b_points):
+    """Add the points where two edges cross or touch to their split
+    points."""
+    adx, ady = ax2 - ax1, ay2 - ay1
+    bdx, bdy = bx2 - bx1, by2 - by1
+    denominator = adx * bdy - ady * bdx
+    a_length = math.hypot(adx, ady)
+    b_length = math.hypot(bdx, bdy)
+    if abs(denominator) > epsilon * max(a_length, b_length):
+        t = ((bx1 - ax1) * bdy - (by1 - ay1) * bdx) / denominator
+        u = ((bx1 - ax1) * ady - (by1 - ay1) * adx) / denominator
+        t_epsilon = epsilon / a_length
+        u_epsilon = epsilon / b_length
+        if (-t_epsilon <= t <= 1.0 + t_epsilon and
+            -u_epsilon <= u <= 1.0 + u_epsilon):
+            if t_epsilon < t < 1.0 - t_epsilon:
+                if u_epsilon < u < 1.0 - u_epsilon:
+                    point = ax1 + t * adx, ay1 + t * ady
+                    b_points.append(point)
+                else:
+                    point = (bx1, by1) if u < 0.5 else (bx2, by2)
+                a_points.append(point)
+            elif u_epsilon < u < 1.0 - u_epsilon:
+                b_points.append((ax1, ay1) if t < 0.5 else (ax2, ay2))
+        return
+    # The edges are parallel. If they are collinear, split each one at the
+    # endpoints of the other.
+    if abs((bx1 - ax1) * ady - (by1 - ay1) * adx) > epsilon * a_length:
+        return
+    for x, y in ((bx1, by1), (bx2, by2)):
+        t = ((x - ax1) * adx + (y - ay1) * ady) / (a_length * a_length)
+        if 0.0 < t < 1.0:
+            a_points.append((x, y))
+    for x, y in ((ax1, ay1), (ax2, ay2)):
+        u = ((x - bx1) * bdx + (y - by1) * bdy) / (b_length * b_length)
+        if 0.0 < u < 1.0:
+            b_points.append((x, y))
+
+def _remove_collinear_points(points, epsilon):
+    result = []
+    for i in xrange(len(points)):
+        x0, y0 = result[-1] if result else points[i - 1]
+        x1, y1 = points[i]
+        x2, y2 = points[(i + 1) % len(points)]
+        cross = (x1 - x0) * (y2 - y1) - (y1 - y0) * (x2 - x1)
+        if abs(cross) > epsilon * (abs(x2 - x0) + abs(y2 - y0)):
+            result.append(points[i])
+    return result
+
+def _get_winding(points, x, y):
+    """Get the winding number of a point with respect to a ring."""
+    winding = 0
+    for i in xrange(len(points)):
+        x1, y1 = points[i - 1]
+        x2, y2 = points[i]
+        if y1 <= y:
+            if y2 > y and (x2 - x1) * (y - y1) - (x - x1) * (y2 - y1) > 0.0:
+                winding += 1
+        elif y2 <= y and (x2 - x1) * (y - y1) - (x - x1) * (y2 - y1) < 0.0:
+            winding -= 1
+    return winding
+
+def dissolve(element, tolerance=0.1):
+    """Merge the filled shapes of an element and its descendants, such as
+    the tiles of a layer, into as few regions as possible.
+
+    Shapes are grouped by fill and fill opacity, from the style attribute
+    or else the presentation attributes, and the shapes in each group that
+    overlap or touch are merged. Returns a list of style and path pairs in
+    world coordinates, so the transforms of the ancestors of the element
+    apply. Each style gives the fill of the group, and each path is a single
+    region with an outer boundary and any holes.
+    """
+    groups = {}
+    order = []
+    stack = [(element, Matrix())]
+    if element.parent is not None:
+        stack = [(element, element.parent.world_matrix)]
+    while stack:
+        element, matrix = stack.pop()
+        matrix = matrix * element.matrix
+        if element.shape is not None:
+            attributes = element.attributes
+            fill = element.style.get('fill',
+                                     attributes.get('fill', 'black')).strip()
+            opacity = element.style.get('fill-opacity',
+                                        attributes.get('fill-opacity'))
+            style = 'fill:' + fill
+            if opacity is not None:
+                style += ';fill-opacity:' + opacity.strip()
+            if fill != 'none':
+                if style not in groups:
+                    groups[style] = []
+                    order.append(style)
+                shape = element.shape.transform(matrix)
+                # Normalize each shape to positively oriented rings, so that
+                # the union is where the total winding number is positive.
+                regions = _overlay([_get_rings(shape, tolerance)],
+                                   lambda windings: windings[0] != 0)
+                for outer, holes in regions:
+                    groups[style].append(outer)
+                    groups[style].extend(holes)
+        stack.extend((c, matrix) for c in reversed(element.children))
+    result = []
+    for style in order:
+        regions = _overlay([groups[style]], lambda windings: windings[0] > 0)
+        result.extend((style, _create_region_path([r])) for r in regions)
+    return result
+
+def recognize_shape(shape, tolerance=0.1):
+    """Recognize a path that is a simple shape within the given tolerance.
+
+    A single straight subpath becomes a line, and a single closed subpath
+    becomes a rect, circle, ellipse, or convex polygon, in that order of
+    preference. Rects, circles, and ellipses are fitted to the area moments
+    of the flattened outline, and accepted if the outline stays within the
+    tolerance of them.
+
+    Returns the shape and a matrix from its coordinates to the coordinates
+    of the path, which rotates rotated rects and is the identity otherwise,
+    or None if the path is not recognized.
+    """
+    if not isinstance(shape, Path) or len(shape.subpaths) != 1:
+        return None
+    subpath = shape.subpaths[0]
+    points = subpath.get_flat_points(0.25 * tolerance)
+    if not subpath.closed:
+        return _recognize_line(points, tolerance)
+    if len(points) < 3:
+        return None
+    moments = _get_area_moments(points)
+    if moments is None:
+        return None
+    for recognize in (_recognize_rect, _recognize_ellipse,
+                      _recognize_polygon):
+        result = recognize(points, moments, tolerance)
+        if result is not None:
+            return result
+    return None
+
+def recognize_shapes(document, tolerance=0.1):
+    """Replace the path shapes of a document's elements that are simple
+    shapes with those shapes.
+
+    The tolerance is in the coordinates of each element. The matrices of
+    elements with rotated rects are updated to include the rotation. Returns
+    the number of paths converted to each shape class, by class name.
+    """
+    counts = {}
+    stack = [document.root]
+    while stack:
+        element = stack.pop()
+        result = recognize_shape(element.shape, tolerance)
+        if result is not None:
+            shape, matrix = result
+            element.shape = shape
+            if matrix.type != Matrix.IDENTITY:
+                element.matrix = element.matrix * matrix
+            name = type(shape).__name__
+            counts[name] = counts.get(name, 0) + 1
+        stack.extend(element.children)
+    return counts
+
+def _recognize_line(points, tolerance):
+    if len(points) < 2:
+        return None
+    (x1, y1), (x2, y2) = points[0], points[-1]
+    dx, dy = x2 - x1, y2 - y1
+    length = math.hypot(dx, dy)
+    if length == 0.0:
+        return None
+    for x, y in points[1:-1]:
+        along = ((x - x1) * dx + (y - y1) * dy) / length
+        across = ((x - x1) * dy - (y - y1) * dx) / length
+        if (along < -tolerance or along > length + tolerance or
+            abs(across) > tolerance):
+            return None
+    return Line(x1, y1, x2, y2), Matrix()
+
+def _recognize_rect(points, moments, tolerance):
+    area, cx, cy, sxx, syy, sxy = moments
+    # Try the coordinate axes first, then the direction of the longest edge,
+    # which is well defined for squares unlike the principal axes.
+    i = max(xrange(-1, len(points) - 1),
+            key=lambda i: ((points[i + 1][0] - points[i][0]) ** 2 +
+                           (points[i + 1][1] - points[i][1]) ** 2))
+    angle = math.atan2(points[i + 1][1] - points[i][1],
+                       points[i + 1][0] - points[i][0])
+    angle = (angle + 0.25 * math.pi) % (0.5 * math.pi) - 0.25 * math.pi
+    for angle in (0.0, angle):
+        cos_angle, sin_angle = math.cos(angle), math.sin(angle)
+        # The variance of a rect along its width w is w ** 2 / 12.
+        suu = (cos_angle * cos_angle * sxx + sin_angle * sin_angle * syy +
+               2.0 * cos_angle * sin_angle * sxy)
+        svv = (sin_angle * sin_angle * sxx + cos_angle * cos_angle * syy -
+               2.0 * cos_angle * sin_angle * sxy)
+        hw = math.sqrt(3.0 * max(suu, 0.0))
+        hh = math.sqrt(3.0 * max(svv, 0.0))
+        def get_distance(x, y):
+            u = abs((x - cx) * cos_angle + (y - cy) * sin_angle) - hw
+            v = abs((y - cy) * cos_angle - (x - cx) * sin_angle) - hh
+            if u <= 0.0 and v <= 0.0:
+                return -max(u, v)
+            return math.hypot(max(u, 0.0), max(v, 0.0))
+        if (abs(area - 4.0 * hw * hh) <= 4.0 * (hw + hh) * tolerance and
+            _is_within(points, get_distance, tolerance)):
+            if angle == 0.0:
+                return Rect(cx - hw, cy - hh, 2.0 * hw, 2.0 * hh), Matrix()
+            u = cx * cos_angle + cy * sin_angle
+            v = cy * cos_angle - cx * sin_angle
+            return (Rect(u - hw, v - hh, 2.0 * hw, 2.0 * hh),
+                    Matrix.create_rotate(angle * 180.0 / math.pi))
+    return None
+
+def _recognize_ellipse(points, moments, tolerance):
+    area, cx, cy, sxx, syy, sxy = moments
+    # The covariance of an ellipse has the squared half axes divided by 4
+    # as its eigenvalues.
+    mean = 0.5 * (sxx + syy)
+    root = math.hypot(0.5 * (sxx - syy), sxy)
+    rx = 2.0 * math.sqrt(mean + root)
+    ry = 2.0 * math.sqrt(max(mean - root, 0.0))
+    if ry == 0.0:
+        return None
+    if rx - ry <= 2.0 * tolerance:
+        # The flattened outline is inscribed, so fit the radius to the
+        # vertices rather than to the area.
+        r = math.fsum(math.hypot(x - cx, y - cy)
+                      for x, y in points) / len(points)
+        get_distance = lambda x, y: abs(math.hypot(x - cx, y - cy) - r)
+        if (abs(area - math.pi * r * r) <= 2.0 * math.pi * r * tolerance and
+            _is_within(points, get_distance, tolerance)):
+            return Circle(cx, cy, r), Matrix()
+    angle = 0.5 * math.atan2(2.0 * sxy, sxx - syy)
+    cos_angle, sin_angle = math.cos(angle), math.sin(angle)
+    scale = math.fsum(
+        math.hypot(((x - cx) * cos_angle + (y - cy) * sin_angle) / rx,
+                   ((y - cy) * cos_angle - (x - cx) * sin_angle) / ry)
+        for x, y in points) / len(points)
+    rx, ry = scale * rx, scale * ry
+    def get_distance(x, y):
+        # The first order distance to the level set of the normalized
+        # radius k through the point.
+        u = ((x - cx) * cos_angle + (y - cy) * sin_angle) / rx
+        v = ((y - cy) * cos_angle - (x - cx) * sin_angle) / ry
+        k = math.hypot(u, v)
+        gradient = math.hypot(u / rx, v / ry)
+        if gradient == 0.0:
+            return ry
+        return abs(k - 1.0) * k / gradient
+    if (abs(area - math.pi * rx * ry) <=
+        _get_ellipse_perimeter(rx, ry) * tolerance and
+        _is_within(points, get_distance, tolerance)):
+        return Ellipse(cx, cy, rx, ry, angle * 180.0 / math.pi), Matrix()
+    return None
+
+def _recognize_polygon(points, moments, tolerance):
+    polygon = Polygon(points).simplify(0.75 * tolerance)
+    points = polygon.points
+    if len(points) < 3:
+        return None
+    # A convex polygon turns the same way at every vertex, and once around.
+    sign = 0.0
+    turn = 0.0
+    for i in xrange(-2, len(points) - 2):
+        x1, y1 = points[i]
+        x2, y2 = points[i + 1]
+        x3, y3 = points[i + 2]
+        cross = (x2 - x1) * (y3 - y2) - (y2 - y1) * (x3 - x2)
+        dot = (x2 - x1) * (x3 - x2) + (y2 - y1) * (y3 - y2)
+        if cross * sign < 0.0:
+            return None
+        if cross != 0.0:
+            sign = cross
+        turn += abs(math.atan2(cross, dot))
+    if abs(turn - 2.0 * math.pi) > 1e-6:
+        return None
+    return polygon, Matrix()
+
+def _get_area_moments(points):
+    """Get the area, centroid, and central second moments of a polygon,
+    divided by its area, or None if the area is zero.
+
+    See: U{http://en.wikipedia.org/wiki/Second_moment_of_area}
+    """
+    x0, y0 = points[0]
+    a = mx = my = mxx = myy = mxy = 0.0
+    for i in xrange(-1, len(points) - 1):
+        x1, y1 = points[i][0] - x0, points[i][1] - y0
+        x2, y2 = points[i + 1][0] - x0, points[i + 1][1] - y0
+        cross = x1 * y2 - x2 * y1
+        a += cross
+        mx += (x1 + x2) * cross
+        my += (y1 + y2) * cross
+        mxx += (x1 * x1 + x1 * x2 + x2 * x2) * cross
+        myy += (y1 * y1 + y1 * y2 + y2 * y2) * cross
+        mxy += (x1 * y2 + 2.0 * x1 * y1 + 2.0 * x2 * y2 + x2 * y1) * cross
+    if a == 0.0:
+        return None
+    cx, cy = mx / (3.0 * a), my / (3.0 * a)
+    return (0.5 * abs(a), cx + x0, cy + y0, mxx / (6.0 * a) - cx * cx,
+            myy / (6.0 * a) - cy * cy, mxy / (12.0 * a) - cx * cy)
+
+def _is_within(points, get_distance, tolerance):
+    """Are the edges of a ring within the tolerance of a shape, given the
+    distance function of its boundary? The edges are sampled at quarters."""
+    for i in xrange(-1, len(points) - 1):
+        x1, y1 = points[i]
+        x2, y2 = points[i + 1]
+        for t in (0.25, 0.5, 0.75, 1.0):
+            if get_distance(x1 + t * (x2 - x1),
+                            y1 + t * (y2 - y1)) > tolerance:
+                return False
+    return True
+
+class DetailLevel(object):
+    """The flattened outlines of a shape at a single level of detail.
+
+    The vertices of all outlines are stored in one flat coordinate array,
+    with an offset array marking where each outline starts.
+    """
+
+    __slots__ = 'tolerance', 'coords', 'offsets', 'closed'
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.coords = array('d')
+        self.offsets = array('l', [0])
+        self.closed = array('b')
+
+    def __len__(self):
+        """Get the number of outlines."""
+        return len(self.closed)
+
+    def __iter__(self):
+        """Iterate over the outlines as point lists and closed flags."""
+        for i in xrange(len(self.closed)):
+            yield self.get_points(i), bool(self.closed[i])
+
+    def __repr__(self):
+        return ('<DetailLevel tolerance=%g outlines=%i vertices=%i>' %
+                (self.tolerance, len(self), self.vertex_count))
+
+    def add_points(self, points, closed):
+        """Add an outline."""
+        for x, y in points:
+            self.coords.append(x)
+            self.coords.append(y)
+        self.offsets.append(len(self.coords) // 2)
+        self.closed.append(bool(closed))
+
+    def get_points(self, index):
+        """Get the points of an outline."""
+        start = 2 * self.offsets[index]
+        stop = 2 * self.offsets[index + 1]
+        coords = self.coords[start:stop]
+        return list(zip(coords[::2], coords[1::2]))
+
+    @property
+    def vertex_count(self):
+        """The total number of vertices in all outlines."""
+        return len(self.coords) // 2
+
+    @property
+    def basic_shapes(self):
+        """Convert the outlines to basic shapes."""
+        shapes = []
+        for points, closed in self:
+            if closed:
+                shapes.append(Polygon(points))
+            elif len(points) == 2:
+                (x1, y1), (x2, y2) = points
+                shapes.append(Line(x1, y1, x2, y2))
+            else:
+                shapes.append(Polyline(points))
+        return shapes
+
+    @classmethod
+    def from_shape(cls, shape, tolerance):
+        """Flatten and simplify a shape within the given tolerance.
+
+        Outlines that fit within the tolerance are dropped altogether.
+        """
+        level = cls(tolerance)
+        for basic_shape in shape.flatten(0.5 * tolerance):
+            bounding_box = basic_shape.bounding_box
+            if max(bounding_box.width, bounding_box.height) < tolerance:
+                continue
+            if isinstance(basic_shape, Line):
+                level.add_points([basic_shape.p1, basic_shape.p2], False)
+            else:
+                simple_shape = basic_shape.simplify(0.5 * tolerance)
+                level.add_points(simple_shape.points,
+                                 isinstance(simple_shape, Polygon))
+        return level
+
+class LevelOfDetail(object):
+    """Precomputed levels of detail for a shape.
+
+    The tolerance doubles from one level to the next, so that each level has
+    about half the vertices of the previous one on curved outlines.
+    """
+
+    def __init__(self, shape, tolerance=0.1, level_count=8):
+        """Flatten and simplify a shape at the given number of levels,
+        starting from the given tolerance in shape coordinates."""
+        self.tolerance = tolerance
+        self.levels = [DetailLevel.from_shape(shape, tolerance * 2.0 ** i)
+                       for i in xrange(level_count)]
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, index):
+        return self.levels[index]
+
+    def get_level_index(self, scale, pixel_tolerance=0.5):
+        """Get the index of the coarsest level that stays within the given
+        tolerance in pixels at the given scale.
+
+        The scale is either a number or a matrix from shape coordinates to
+        pixels.
+        """
+        if isinstance(scale, Matrix):
+            scale = scale.scale_factor
+        if scale <= 0.0:
+            return len(self.levels) - 1
+        ratio = pixel_tolerance / (scale * self.tolerance)
+        if ratio < 1.0:
+            return 0
+        index = int(math.floor(math.log(ratio, 2.0) + 1e-9))
+        return min(index, len(self.levels) - 1)
+
+    def select(self, scale, pixel_tolerance=0.5):
+        """Get the coarsest level that stays within the given tolerance in
+        pixels at the given scale."""
+        return self.levels[self.get_level_index(scale, pixel_tolerance)]
+
+class QuantizedBuffer(Shape):
+    """Flattened outlines with compactly stored vertices.
+
+    The coordinates are stored as 32-bit floats (type code C{'f'}), or as
+    16-bit or 32-bit fixed-point integers (C{'h'} or C{'i'}), relative to
+    the origin of a chunk. Each outline starts a new chunk, and so does each
+    vertex that is too far from the origin of the current chunk to be stored
+    within the error bound. Decoded coordinates are within the error bound
+    of the original coordinates.
+
+    A 16-bit buffer is widened to 32-bit integers before adding an outline
+    that would need more chunks than the narrower coordinates save, such as
+    scattered points far apart, so that the chunks never outgrow the
+    vertices.
+
+    The buffer is a shape, so that it can be transformed, measured,
+    stroked, and triangulated like the shapes it was created from.
+    """
+
+    _integer_limits = {'h': 32767, 'i': 2147483647}
+
+    def __init__(self, error, type_code='h'):
+        """Initialize an empty buffer with the given error bound and type
+        code."""
+        if error <= 0.0:
+            raise ValueError('error bound must be positive: %r' % error)
+        if type_code == 'f':
+            # The rounding error of a 32-bit float is at most 2 ** -24 times
+            # its magnitude.
+            self.step = 1.0
+            self.limit = error * 2.0 ** 24
+        elif type_code in self._integer_limits:
+            self.step = 2.0 * error
+            self.limit = self._integer_limits[type_code] * self.step
+        else:
+            raise ValueError('invalid type code: %r' % type_code)
+        self.error = error
+        self.type_code = type_code
+        self.coords = array(type_code)
+        self.offsets = array('l', [0])
+        self.closed = array('b')
+        self.chunk_offsets = array('l')
+        self.chunk_origins = array('d')
+
+    def __len__(self):
+        """Get the number of outlines."""
+        return len(self.closed)
+
+    def __iter__(self):
+        """Iterate over the outlines as point lists and closed flags."""
+        for i in xrange(len(self.closed)):
+            yield self.get_points(i), bool(self.closed[i])
+
+    def __repr__(self):
+        return ('<QuantizedBuffer type_code=%r error=%g outlines=%i '
+                'vertices=%i chunks=%i>' %
+                (self.type_code, self.error, len(self), self.vertex_count,
+                 len(self.chunk_offsets)))
+
+    def add(self, shape, matrix=None, tolerance=0.1):
+        """Flatten a shape within the given tolerance, and add its outlines
+        after applying the given matrix."""
+        if matrix is not None:
+            shape = shape.transform(matrix)
+        for basic_shape in shape.flatten(tolerance):
+            if isinstance(basic_shape, Line):
+                self.add_points([basic_shape.p1, basic_shape.p2], False)
+            else:
+                self.add_points(basic_shape.points,
+                                isinstance(basic_shape, Polygon))
+
+    def add_points(self, points, closed):
+        """Add an outline."""
+        if self.type_code == 'h':
+            points = list(points)
+            # Each extra chunk costs an offset and an origin, 24 bytes, and
+            # 32-bit coordinates cost 4 more bytes per vertex.
+            if 24 * (self._get_chunk_count(points) - 1) > 4 * len(points):
+                self._widen()
+        coords = self.coords
+        limit = self.limit
+        inverse_step = 1.0 / self.step
+        integral = self.type_code != 'f'
+        ox = oy = None
+        for x, y in points:
+            if ox is None or abs(x - ox) > limit or abs(y - oy) > limit:
+                ox, oy = x, y
+                self.chunk_offsets.append(len(coords) // 2)
+                self.chunk_origins.append(x)
+                self.chunk_origins.append(y)
+            if integral:
+                coords.append(int(round((x - ox) * inverse_step)))
+                coords.append(int(round((y - oy) * inverse_step)))
+            else:
+                coords.append(x - ox)
+                coords.append(y - oy)
+        self.offsets.append(len(coords) // 2)
+        self.closed.append(bool(closed))
+
+    def _get_chunk_count(self, points):
+        """Get the number of chunks that storing an outline would start."""
+        limit = self.limit
+        count = 0
+        ox = oy = None
+        for x, y in points:
+            if ox is None or abs(x - ox) > limit or abs(y - oy) > limit:
+                ox, oy = x, y
+                count += 1
+        return count
+
+    def _widen(self):
+        """Store the coordinates as 32-bit integers.
+
+        The stored 16-bit coordinates are kept as they are, so the decoded
+        coordinates do not change.
+        """
+        self.coords = array('i', self.coords)
+        self.type_code = 'i'
+        self.limit = self._integer_limits['i'] * self.step
+
+    def get_points(self, index):
+        """Get the decoded points of an outline."""
+        return list(self._iter_points(self.offsets[index],
+                                      self.offsets[index + 1]))
+
+    def _iter_points(self, start, stop):
+        coords = self.coords
+        chunk_offsets = self.chunk_offsets
+        origins = self.chunk_origins
+        step = self.step
+        chunk = bisect_right(chunk_offsets, start) - 1
+        next_offset = (chunk_offsets[chunk + 1]
+                       if chunk + 1 < len(chunk_offsets) else stop)
+        for i in xrange(start, stop):
+            while i >= next_offset:
+                chunk += 1
+                next_offset = (chunk_offsets[chunk + 1]
+                               if chunk + 1 < len(chunk_offsets) else stop)
+            yield (origins[2 * chunk] + step * coords[2 * i],
+                   origins[2 * chunk + 1] + step * coords[2 * i + 1])
+
+    def _get_points_numpy(self):
+        """Get all decoded points as an array with one row per point."""
+        coords = numpy.frombuffer(self.coords, dtype=self.type_code)
+        points = coords.reshape(-1, 2) * self.step
+        chunk_offsets = numpy.frombuffer(self.chunk_offsets, dtype='l')
+        counts = numpy.diff(numpy.append(chunk_offsets, len(points)))
+        origins = numpy.frombuffer(self.chunk_origins).reshape(-1, 2)
+        return points + numpy.repeat(origins, counts, axis=0)
+
+    @property
+    def vertex_count(self):
+        """The total number of vertices in all outlines."""
+        return len(self.coords) // 2
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the coordinates, offsets, and chunk
+        origins."""
+        return sum(len(a) * a.itemsize for a in (
+            self.coords, self.offsets, self.closed, self.chunk_offsets,
+            self.chunk_origins))
+
+    @property
+    def bounding_box(self):
+        """The bounding box of the decoded vertices.
+
+        The bounds are found chunk by chunk on the stored coordinates, and
+        only the bounds are decoded.
+        """
+        bounding_box = BoundingBox()
+        coords = self.coords
+        chunk_offsets = self.chunk_offsets
+        origins = self.chunk_origins
+        step = self.step
+        for chunk in xrange(len(chunk_offsets)):
+            start = 2 * chunk_offsets[chunk]
+            stop = (2 * chunk_offsets[chunk + 1]
+                    if chunk + 1 < len(chunk_offsets) else len(coords))
+            if start == stop:
+                continue
+            xs = coords[start:stop:2]
+            ys = coords[start + 1:stop:2]
+            ox, oy = origins[2 * chunk], origins[2 * chunk + 1]
+            bounding_box.add_point(ox + step * min(xs), oy + step * min(ys))
+            bounding_box.add_point(ox + step * max(xs), oy + step * max(ys))
+        return bounding_box
+
+    def get_bounding_box(self, matrix):
+        """Get the bounding box of the decoded vertices after applying the
+        given matrix, without creating shapes."""
+        if matrix.type == Matrix.IDENTITY:
+            return self.bounding_box
+        if not self.coords:
+            return BoundingBox()
+        if numpy is not None:
+            a, b, c, d, e, f = matrix.abcdef
+            points = self._get_points_numpy()
+            xs = a * points[:, 0] + c * points[:, 1] + e
+            ys = b * points[:, 0] + d * points[:, 1] + f
+            return BoundingBox(float(xs.min()), float(ys.min()),
+                               float(xs.max()), float(ys.max()))
+        bounding_box = BoundingBox()
+        for x, y in self._iter_points(0, self.vertex_count):
+            bounding_box.add_point(x, y, matrix)
+        return bounding_box
+
+    def transform(self, matrix):
+        """Get a transformed copy of the buffer.
+
+        The transformed vertices are quantized again with the same error
+        bound, so the errors of the two quantizations add up.
+        """
+        buffer = QuantizedBuffer(self.error, self.type_code)
+        for points, closed in self:
+            buffer.add_points(matrix.transform_points(points), closed)
+        return buffer
+
+    def flatten(self, tolerance):
+        return self.basic_shapes
+
+    @property
+    def basic_shapes(self):
+        """Convert the outlines to basic shapes."""
+        shapes = []
+        for points, closed in self:
+            if closed:
+                shapes.append(Polygon(points))
+            elif len(points) == 2:
+                (x1, y1), (x2, y2) = points
+                shapes.append(Line(x1, y1, x2, y2))
+            else:
+                shapes.append(Polyline(points))
+        return shapes
+
+    @classmethod
+    def from_shapes(cls, shapes, error, type_code='h', matrix=None,
+                    tolerance=0.1):
+        """Create a buffer from shapes with a common matrix."""
+        buffer = cls(error, type_code)
+        for shape in shapes:
+            buffer.add(shape, matrix, tolerance)
+        return buffer
+
+    @classmethod
+    def from_document(cls, document, error, type_code='h', tolerance=0.1):
+        """Create a buffer from the shapes of a document in world
+        coordinates."""
+        buffer = cls(error, type_code)
+        stack = [document.root]
+        while stack:
+            element = stack.pop()
+            if element.shape is not None:
+                buffer.add(element.shape, element.world_matrix, tolerance)
+            stack.extend(reversed(element.children))
+        return buffer
+
+def _column_property(column_name, doc=None):
+    """Create a property for a field of a row view, backed by a column of
+    the table."""
+    def fget(self):
+        return getattr(self._table, column_name)[self._index]
+    def fset(self, value):
+        getattr(self._table, column_name)[self._index] = value
+    return property(fget, fset, doc=doc)
+
+class _RowView(object):
+    """A mixin for shapes that are views of a row in a shape table."""
+
+    def __init__(self, table, row, index):
+        self._table = table
+        self._row = row
+        self._index = index
+
+    @property
+    def id(self):
+        """The ID of the row."""
+        return self._table.ids[self._row]
+
+    @property
+    def style(self):
+        """The style of the row."""
+        return self._table.get_style(self._row)
+
+    @property
+    def matrix(self):
+        """The transformation matrix of the row."""
+        return self._table.get_matrix(self._row)
+
+class CircleView(_RowView, Circle):
+    """A circle stored in a shape table."""
+
+    cx = _column_property('circle_cx')
+    cy = _column_property('circle_cy')
+    r = _column_property('circle_r')
+
+class RectView(_RowView, Rect):
+    """A rectangle stored in a shape table."""
+
+    x = _column_property('rect_x')
+    y = _column_property('rect_y')
+    width = _column_property('rect_width')
+    height = _column_property('rect_height')
+    rx = _column_property('rect_rx')
+    ry = _column_property('rect_ry')
+
+class EllipseView(_RowView, Ellipse):
+    """An ellipse stored in a shape table."""
+
+    cx = _column_property('ellipse_cx')
+    cy = _column_property('ellipse_cy')
+    rx = _column_property('ellipse_rx')
+    ry = _column_property('ellipse_ry')
+    rotation = _column_property('ellipse_rotation')
+
+class _VertexView(_RowView):
+    """A mixin for shapes with vertices stored in a shape table."""
+
+    @property
+    def points(self):
+        """The points of the shape, copied from the vertex buffer."""
+        table = self._table
+        start = 2 * table.vertex_offsets[self._index]
+        stop = 2 * table.vertex_offsets[self._index + 1]
+        coords = table.vertex_coords[start:stop]
+        return list(zip(coords[::2], coords[1::2]))
+
+class PolygonView(_VertexView, Polygon):
+    """A polygon stored in a shape table."""
+
+class PolylineView(_VertexView, Polyline):
+    """A polyline stored in a shape table."""
+
+class LineView(_VertexView, Line):
+    """A line stored in a shape table."""
+
+    @property
+    def x1(self):
+        return self._table.vertex_coords[2 * self._table.vertex_offsets[
+            self._index]]
+
+    @property
+    def y1(self):
+        return self._table.vertex_coords[2 * self._table.vertex_offsets[
+            self._index] + 1]
+
+    @property
+    def x2(self):
+        return self._table.vertex_coords[2 * self._table.vertex_offsets[
+            self._index] + 2]
+
+    @property
+    def y2(self):
+        return self._table.vertex_coords[2 * self._table.vertex_offsets[
+            self._index] + 3]
+
+class ShapeTable(object):
+    """Columnar storage for the shapes of a level.
+
+    Each row is a shape with an ID, a style index, and a transformation
+    matrix. The geometry is stored column-wise in typed arrays: one set of
+    columns each for circles, ellipses, and rectangles, and one ragged
+    vertex buffer with offsets for polygons, polylines, and lines. Indexing the table
+    gives lightweight views that behave like the shape classes.
+    """
+
+    CIRCLE = 0
+    RECT = 1
+    POLYGON = 2
+    POLYLINE = 3
+    LINE = 4
+    ELLIPSE = 5
+
+    _view_classes = {CIRCLE: CircleView, RECT: RectView,
+                     POLYGON: PolygonView, POLYLINE: PolylineView,
+                     LINE: LineView, ELLIPSE: EllipseView}
+
+    _column_types = dict(kinds='B', indices='l', style_indices='l',
+                         matrices='d', circle_cx='d', circle_cy='d',
+                         circle_r='d', ellipse_cx='d', ellipse_cy='d',
+                         ellipse_rx='d', ellipse_ry='d',
+                         ellipse_rotation='d', rect_x='d', rect_y='d',
+                         rect_width='d', rect_height='d', rect_rx='d',
+                         rect_ry='d', vertex_coords='d', vertex_offsets='l')
+
+    def __init__(self, tolerance=0.1):
+        """Initialize an empty table. Curves are flattened within the given
+        tolerance when added."""
+        self.tolerance = tolerance
+        for name, type_code in self._column_types.items():
+            setattr(self, name, array(type_code))
+        self.vertex_offsets.append(0)
+        self.ids = []
+        self.styles = []
+        self._style_indices = {}
+
+    def __len__(self):
+        """Get the number of rows."""
+        return len(self.kinds)
+
+    def __getitem__(self, row):
+        """Get a view of the shape in a row."""
+        if row < 0:
+            row += len(self.kinds)
+        view_class = self._view_classes[self.kinds[row]]
+        return view_class(self, row, self.indices[row])
+
+    def __iter__(self):
+        for row in xrange(len(self.kinds)):
+            yield self[row]
+
+    def __repr__(self):
+        return '<ShapeTable rows=%i vertices=%i>' % (
+            len(self), len(self.vertex_coords) // 2)
+
+    def get_matrix(self, row):
+        """Get the transformation matrix of a row."""
+        return Matrix(*self.matrices[6 * row:6 * row + 6])
+
+    def get_style(self, row):
+        """Get the style of a row."""
+        style_index = self.style_indices[row]
+        return None if style_index == -1 else self.styles[style_index]
+
+    def get_style_index(self, style):
+        """Get the index of a style, adding it if necessary."""
+        if style is None:
+            return -1
+        style_index = self._style_indices.get(style)
+        if style_index is None:
+            style_index = self._style_indices[style] = len(self.styles)
+            self.styles.append(style)
+        return style_index
+
+    def add(self, shape, matrix=None, id=None, style=None):
+        """Add a shape, and get the index of its first row.
+
+        Paths are flattened and added as one row per subpath. Styles are
+        stored once and referenced by index.
+        """
+        first_row = len(self.kinds)
+        if isinstance(shape, Circle):
+            self._add_row(self.CIRCLE, len(self.circle_r), matrix, id, style)
+            self.circle_cx.append(shape.cx)
+            self.circle_cy.append(shape.cy)
+            self.circle_r.append(shape.r)
+        elif isinstance(shape, Ellipse):
+            self._add_row(self.ELLIPSE, len(self.ellipse_rx), matrix, id,
+                          style)
+            self.ellipse_cx.append(shape.cx)
+            self.ellipse_cy.append(shape.cy)
+            self.ellipse_rx.append(shape.rx)
+            self.ellipse_ry.append(shape.ry)
+            self.ellipse_rotation.append(shape.rotation)
+        elif isinstance(shape, Rect):
+            self._add_row(self.RECT, len(self.rect_x), matrix, id, style)
+            self.rect_x.append(shape.x)
+            self.rect_y.append(shape.y)
+            self.rect_width.append(shape.width)
+            self.rect_height.append(shape.height)
+            self.rect_rx.append(shape.rx)
+            self.rect_ry.append(shape.ry)
+        elif isinstance(shape, (Polygon, Polyline, Line)):
+            if isinstance(shape, Polygon):
+                kind, points = self.POLYGON, shape.points
+            elif isinstance(shape, Polyline):
+                kind, points = self.POLYLINE, shape.points
+            else:
+                kind, points = self.LINE, [shape.p1, shape.p2]
+            self._add_row(kind, len(self.vertex_offsets) - 1, matrix, id,
+                          style)
+            for x, y in points:
+                self.vertex_coords.append(x)
+                self.vertex_coords.append(y)
+            self.vertex_offsets.append(len(self.vertex_coords) // 2)
+        else:
+            for basic_shape in shape.flatten(self.tolerance):
+                self.add(basic_shape, matrix, id, style)
+        return first_row
+
+    def _add_row(self, kind, index, matrix, id, style):
+        self.kinds.append(kind)
+        self.indices.append(index)
+        self.style_indices.append(self.get_style_index(style))
+        abcdef = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0) if matrix is None else \
+                 matrix.abcdef
+        self.matrices.extend(abcdef)
+        self.ids.append(id)
+
+    def transform(self, matrix):
+        """Get a copy of the table with the given matrix applied to the
+        matrices of all rows."""
+        table = self.copy()
+        a1, b1, c1, d1, e1, f1 = matrix.abcdef
+        matrices = table.matrices
+        for i in xrange(0, len(matrices), 6):
+            a2, b2, c2, d2, e2, f2 = matrices[i:i + 6]
+            matrices[i:i + 6] = array('d', (
+                a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+                a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+                a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1))
+        return table
+
+    def copy(self):
+        """Get a copy of the table."""
+        table = ShapeTable(self.tolerance)
+        for name, type_code in self._column_types.items():
+            setattr(table, name, array(type_code, getattr(self, name)))
+        table.ids = list(self.ids)
+        table.styles = list(self.styles)
+        table._style_indices = dict(self._style_indices)
+        return table
+
+    def get_bounding_boxes(self):
+        """Get the bounding boxes of all rows after applying their matrices,
+        as four arrays of minimum x, minimum y, maximum x, and maximum y."""
+        count = len(self.kinds)
+        min_xs = array('d', [0.0]) * count
+        min_ys = array('d', [0.0]) * count
+        max_xs = array('d', [0.0]) * count
+        max_ys = array('d', [0.0]) * count
+        matrices = self.matrices
+        coords = self.vertex_coords
+        offsets = self.vertex_offsets
+        for row in xrange(count):
+            a, b, c, d, e, f = matrices[6 * row:6 * row + 6]
+            kind = self.kinds[row]
+            index = self.indices[row]
+            if kind == self.CIRCLE:
+                cx = self.circle_cx[index]
+                cy = self.circle_cy[index]
+                r = self.circle_r[index]
+                x, y = a * cx + c * cy + e, b * cx + d * cy + f
+                hx = r * math.sqrt(a * a + c * c)
+                hy = r * math.sqrt(b * b + d * d)
+                min_xs[row], min_ys[row] = x - hx, y - hy
+                max_xs[row], max_ys[row] = x + hx, y + hy
+                continue
+            if kind == self.ELLIPSE:
+                cx = self.ellipse_cx[index]
+                cy = self.ellipse_cy[index]
+                rx, ry, rotation = _transform_ellipse(
+                    Matrix(a, b, c, d), self.ellipse_rx[index],
+                    self.ellipse_ry[index], self.ellipse_rotation[index])
+                x, y = a * cx + c * cy + e, b * cx + d * cy + f
+                hx, hy = _get_ellipse_extents(rx, ry, rotation)
+                min_xs[row], min_ys[row] = x - hx, y - hy
+                max_xs[row], max_ys[row] = x + hx, y + hy
+                continue
+            if kind == self.RECT:
+                x1, y1 = self.rect_x[index], self.rect_y[index]
+                x2 = x1 + self.rect_width[index]
+                y2 = y1 + self.rect_height[index]
+                xs = [x1, x2, x2, x1]
+                ys = [y1, y1, y2, y2]
+            else:
+                vertices = coords[2 * offsets[index]:2 * offsets[index + 1]]
+                xs = vertices[::2]
+                ys = vertices[1::2]
+            txs = [a * x + c * y + e for x, y in zip(xs, ys)]
+            tys = [b * x + d * y + f for x, y in zip(xs, ys)]
+            min_xs[row], min_ys[row] = min(txs), min(tys)
+            max_xs[row], max_ys[row] = max(txs), max(tys)
+        return min_xs, min_ys, max_xs, max_ys
+
+    @property
+    def bounding_box(self):
+        """The bounding box of all rows after applying their matrices."""
+        if not self.kinds:
+            return BoundingBox()
+        min_xs, min_ys, max_xs, max_ys = self.get_bounding_boxes()
+        return BoundingBox(min(min_xs), min(min_ys), max(max_xs),
+                           max(max_ys))
+
+    def get_areas(self):
+        """Get the areas of all rows after applying their matrices.
+
+        Polygon areas are signed, as for L{Polygon.area}.
+        """
+        areas = array('d', [0.0]) * len(self.kinds)
+        matrices = self.matrices
+        coords = self.vertex_coords
+        offsets = self.vertex_offsets
+        for row in xrange(len(self.kinds)):
+            a, b, c, d = matrices[6 * row:6 * row + 4]
+            kind = self.kinds[row]
+            index = self.indices[row]
+            if kind == self.CIRCLE:
+                r = self.circle_r[index]
+                areas[row] = math.pi * r * r * abs(a * d - b * c)
+            elif kind == self.ELLIPSE:
+                areas[row] = (math.pi * self.ellipse_rx[index] *
+                              self.ellipse_ry[index] * abs(a * d - b * c))
+            elif kind == self.RECT:
+                areas[row] = ((self.rect_width[index] *
+                               self.rect_height[index] -
+                               (4.0 - math.pi) * self.rect_rx[index] *
+                               self.rect_ry[index]) * abs(a * d - b * c))
+            elif kind == self.POLYGON:
+                start, stop = 2 * offsets[index], 2 * offsets[index + 1]
+                xs = coords[start:stop:2]
+                ys = coords[start + 1:stop:2]
+                area = 0.0
+                for i in xrange(-1, len(xs) - 1):
+                    area += xs[i] * ys[i + 1] - xs[i + 1] * ys[i]
+                areas[row] = 0.5 * area * (a * d - b * c)
+        return areas
+
+    @property
+    def area(self):
+        """The total area of all rows after applying their matrices."""
+        return math.fsum(self.get_areas())
+
+    @classmethod
+    def from_shapes(cls, shapes, matrix=None, tolerance=0.1):
+        """Create a table from shapes with a common matrix."""
+        table = cls(tolerance)
+        for shape in shapes:
+            table.add(shape, matrix)
+        return table
+
+    @classmethod
+    def from_document(cls, document, tolerance=0.1):
+        """Create a table from the shapes of a document, with their IDs,
+        styles, and world matrices."""
+        table = cls(tolerance)
+        stack = [(document.root, Matrix())]
+        while stack:
+            element, matrix = stack.pop()
+            matrix = matrix * element.matrix
+            if element.shape is not None:
+                table.add(element.shape, matrix, element.attributes.get('id'),
+                          element.attributes.get('style'))
+            stack.extend((c, matrix) for c in reversed(element.children))
+        return table
+
+class SharedShapeTable(ShapeTable):
+    """A read-only shape table in a shared memory segment.
+
+    Publish a table once, and attach to it by name from other processes.
+    The columns are memoryviews of the segment, so attaching neither copies
+    nor unpickles any geometry. Every process must close the table when it
+    is done with it, and one process must unlink the segment. Requires
+    Python 3.8 or later.
+
+    The segment starts with the byte size of a JSON header, followed by the
+    header itself and then the columns, each aligned to 8 bytes. The column
+    offsets in the header are relative to the end of the padded header.
+    """
+
+    def __init__(self, shared_memory, owner=False):
+        """Wrap a shared memory segment with a published table."""
+        self.shared_memory = shared_memory
+        self.owner = owner
+        buf = shared_memory.buf
+        header_size, = struct.unpack_from('<Q', buf, 0)
+        header = json.loads(bytes(buf[8:8 + header_size]).decode('utf-8'))
+        data_start = _align(8 + header_size, 8)
+        self.tolerance = header['tolerance']
+        self.ids = header['ids']
+        self.styles = header['styles']
+        self._style_indices = dict((s, i) for i, s in enumerate(self.styles))
+        view = buf.toreadonly()
+        self._views = [view]
+        for name, type_code, start, stop in header['columns']:
+            column = view[data_start + start:data_start + stop].cast(
+                type_code)
+            setattr(self, name, column)
+            self._views.append(column)
+
+    def __repr__(self):
+        return '<SharedShapeTable %s rows=%i vertices=%i>' % (
+            self.name, len(self), len(self.vertex_coords) // 2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def name(self):
+        """The name of the shared memory segment."""
+        return self.shared_memory.name
+
+    @classmethod
+    def publish(cls, table, name=None):
+        """Copy a table into a new shared memory segment, and get the table
+        that owns it."""
+        from multiprocessing import shared_memory
+        columns = []
+        start = 0
+        for column_name in sorted(cls._column_types):
+            column = memoryview(getattr(table, column_name)).cast('B')
+            columns.append((column_name, cls._column_types[column_name],
+                            start, start + len(column), column))
+            start = _align(start + len(column), 8)
+        header = json.dumps(dict(
+            tolerance=table.tolerance, ids=table.ids, styles=table.styles,
+            columns=[c[:4] for c in columns])).encode('utf-8')
+        data_start = _align(8 + len(header), 8)
+        memory = shared_memory.SharedMemory(name, create=True,
+                                            size=data_start + start)
+        buf = memory.buf
+        struct.pack_into('<Q', buf, 0, len(header))
+        buf[8:8 + len(header)] = header
+        for _, _, a, b, column in columns:
+            buf[data_start + a:data_start + b] = column
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to a table published by another process."""
+        from multiprocessing import shared_memory
+        try:
+            memory = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13, attaching registers the segment with the
+            # resource tracker, which would unlink it when this process
+            # exits. Unregister it again rather than patching the tracker,
+            # which would affect every thread.
+            memory = shared_memory.SharedMemory(name)
+            if os.name == 'posix':
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(memory._name, 'shared_memory')
+        return cls(memory)
+
+    def add(self, shape, matrix=None, id=None, style=None):
+        raise TypeError('shared shape tables are read-only')
+
+    def get_style_index(self, style):
+        """Get the index of a style."""
+        if style is None:
+            return -1
+        return self._style_indices[style]
+
+    def close(self):
+        """Release the views of the segment, and detach from it."""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        for name in self._column_types:
+            setattr(self, name, None)
+        self.shared_memory.close()
+
+    def unlink(self):
+        """Destroy the shared memory segment once every process has closed
+        it."""
+        self.shared_memory.unlink()
+
+def _align(offset, alignment):
+    """Round an offset up to a multiple of the alignment."""
+    return offset + -offset % alignment
+
+class ArcLengthTable(object):
+    """A lookup table from arc length to points on a flattened shape, for
+    moving along paths at a given speed.
+
+    The table is built once, and each query is a binary search. Subpaths
+    follow each other without any length between them. Distances wrap
+    around for a single closed outline, and are clamped otherwise.
+    """
+
+    def __init__(self, shape, tolerance=0.1):
+        """Build a table for a shape, flattened within the given
+        tolerance."""
+        self.xs = array('d')
+        self.ys = array('d')
+        self.distances = array('d')
+        basic_shapes = shape.flatten(tolerance)
+        self.closed = (len(basic_shapes) == 1 and
+                       isinstance(basic_shapes[0], Polygon))
+        distance = 0.0
+        for basic_shape in basic_shapes:
+            if isinstance(basic_shape, Line):
+                points = [basic_shape.p1, basic_shape.p2]
+            elif isinstance(basic_shape, Polygon):
+                points = basic_shape.points + basic_shape.points[:1]
+            else:
+                points = basic_shape.points
+            for i, (x, y) in enumerate(points):
+                if i:
+                    distance += math.hypot(x - self.xs[-1], y - self.ys[-1])
+                self.xs.append(x)
+                self.ys.append(y)
+                self.distances.append(distance)
+
+    def __len__(self):
+        """Get the number of points in the table."""
+        return len(self.distances)
+
+    @property
+    def length(self):
+        """The total length."""
+        return self.distances[-1] if self.distances else 0.0
+
+    def _find_segment(self, distance):
+        """Get the segment index and the distance along the shape for a
+        distance, wrapped or clamped."""
+        length = self.length
+        if self.closed and length:
+            distance %= length
+        else:
+            distance = min(max(distance, 0.0), length)
+        i = bisect_right(self.distances, distance) - 1
+        return min(max(i, 0), len(self.distances) - 2), distance
+
+    def _get_point(self, i, distance):
+        start = self.distances[i]
+        segment_length = self.distances[i + 1] - start
+        t = (distance - start) / segment_length if segment_length else 0.0
+        x1, y1 = self.xs[i], self.ys[i]
+        return (x1 + t * (self.xs[i + 1] - x1),
+                y1 + t * (self.ys[i + 1] - y1))
+
+    def _get_tangent(self, i):
+        # Skip zero-length segments, such as the gaps between subpaths.
+        j = i
+        while j < len(self.distances) - 2 and not (self.distances[j + 1] -
+                                                   self.distances[j]):
+            j += 1
+        while j > 0 and not (self.distances[j + 1] - self.distances[j]):
+            j -= 1
+        dx = self.xs[j + 1] - self.xs[j]
+        dy = self.ys[j + 1] - self.ys[j]
+        length = math.hypot(dx, dy)
+        return (dx / length, dy / length) if length else (0.0, 0.0)
+
+    def point_at(self, distance):
+        """Get the point at a distance along the shape.
+
+        Raises ValueError if the flattened shape has no points.
+        """
+        if not self.distances:
+            raise ValueError('table has no points')
+        if len(self.distances) == 1:
+            return self.xs[0], self.ys[0]
+        i, distance = self._find_segment(distance)
+        return self._get_point(i, distance)
+
+    def tangent_at(self, distance):
+        """Get the unit tangent at a distance along the shape.
+
+        Raises ValueError if the flattened shape has no points.
+        """
+        if not self.distances:
+            raise ValueError('table has no points')
+        if len(self.distances) == 1:
+            return 0.0, 0.0
+        i, distance = self._find_segment(distance)
+        return self._get_tangent(i)
+
+    def points_at(self, distances):
+        """Get the points at many distances along the shape.
+
+        Sorted distances are looked up in a single pass over the table.
+        """
+        return [self._get_point(i, d) for i, d in self._find_segments(
+            distances)]
+
+    def tangents_at(self, distances):
+        """Get the unit tangents at many distances along the shape."""
+        return [self._get_tangent(i) for i, d in self._find_segments(
+            distances)]
+
+    def _find_segments(self, distances):
+        distances = list(distances)
+        if len(self.distances) < 2:
+            raise ValueError('table has no segments')
+        if any(a > b for a, b in zip(distances, distances[1:])):
+            return [self._find_segment(d) for d in distances]
+        # Walk the table and the sorted distances together.
+        length = self.length
+        table = self.distances
+        last = len(table) - 2
+        result = []
+        i = 0
+        for distance in distances:
+            if self.closed and length and not 0.0 <= distance < length:
+                result.append(self._find_segment(distance))
+                continue
+            distance = min(max(distance, 0.0), length)
+            while i < last and table[i + 1] <= distance:
+                i += 1
+            result.append((i, distance))
+        return result
+
+class Grid(object):
+    """A grid of values covering a bounding box in world coordinates.
+
+    The values are stored row by row, in a NumPy array if NumPy is
+    available, or in a flat typed array otherwise. Each value is sampled at
+    the center of its cell.
+    """
+
+    def __init__(self, bounding_box, cell_size, data, width, height):
+        self.bounding_box = bounding_box
+        self.cell_size = cell_size
+        self.data = data
+        self.width = width
+        self.height = height
+
+    def __repr__(self):
+        return '<%s %ix%i cell_size=%g>' % (self.__class__.__name__,
+                                            self.width, self.height,
+                                            self.cell_size)
+
+    @classmethod
+    def _get_dimensions(cls, bounding_box, cell_size):
+        width = max(1, int(math.ceil(bounding_box.width / cell_size)))
+        height = max(1, int(math.ceil(bounding_box.height / cell_size)))
+        return width, height
+
+    def get(self, col, row):
+        """Get the value of a cell."""
+        if numpy is not None:
+            return self.data[row, col]
+        return self.data[row * self.width + col]
+
+    def sample(self, x, y, default=0):
+        """Get the value of the cell containing a point, or the default
+        value outside the grid."""
+        col = int(math.floor((x - self.bounding_box.min_x) / self.cell_size))
+        row = int(math.floor((y - self.bounding_box.min_y) / self.cell_size))
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return self.get(col, row)
+        return default
+
+    def sample_bilinear(self, x, y):
+        """Interpolate the values of the four cells nearest to a point.
+
+        Points outside the grid get the values at its edges.
+        """
+        u = (x - self.bounding_box.min_x) / self.cell_size - 0.5
+        v = (y - self.bounding_box.min_y) / self.cell_size - 0.5
+        u = min(max(u, 0.0), self.width - 1.0)
+        v = min(max(v, 0.0), self.height - 1.0)
+        col, row = min(int(u), self.width - 2), min(int(v), self.height - 2)
+        col, row = max(col, 0), max(row, 0)
+        s, t = u - col, v - row
+        col2 = min(col + 1, self.width - 1)
+        row2 = min(row + 1, self.height - 1)
+        top = (1.0 - s) * self.get(col, row) + s * self.get(col2, row)
+        bottom = (1.0 - s) * self.get(col, row2) + s * self.get(col2, row2)
+        return (1.0 - t) * top + t * bottom
+
+    def sample_many(self, xs, ys, default=0):
+        """Get the values of the cells containing many points."""
+        if numpy is None:
+            return [self.sample(x, y, default) for x, y in zip(xs, ys)]
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        cols = numpy.floor((xs - self.bounding_box.min_x) /
+                           self.cell_size).astype(int)
+        rows = numpy.floor((ys - self.bounding_box.min_y) /
+                           self.cell_size).astype(int)
+        inside = ((cols >= 0) & (cols < self.width) & (rows >= 0) &
+                  (rows < self.height))
+        result = numpy.full(xs.shape, default, dtype=self.data.dtype)
+        result[inside] = self.data[rows[inside], cols[inside]]
+        return result
+
+    def sample_bilinear_many(self, xs, ys):
+        """Interpolate the values of the cells nearest to many points."""
+        if numpy is None:
+            return [self.sample_bilinear(x, y) for x, y in zip(xs, ys)]
+        us = (numpy.asarray(xs, dtype=float) - self.bounding_box.min_x)
+        us = numpy.clip(us / self.cell_size - 0.5, 0.0, self.width - 1.0)
+        vs = (numpy.asarray(ys, dtype=float) - self.bounding_box.min_y)
+        vs = numpy.clip(vs / self.cell_size - 0.5, 0.0, self.height - 1.0)
+        cols = numpy.clip(us.astype(int), 0, max(self.width - 2, 0))
+        rows = numpy.clip(vs.astype(int), 0, max(self.height - 2, 0))
+        s, t = us - cols, vs - rows
+        cols2 = numpy.minimum(cols + 1, self.width - 1)
+        rows2 = numpy.minimum(rows + 1, self.height - 1)
+        data = self.data
+        top = (1.0 - s) * data[rows, cols] + s * data[rows, cols2]
+        bottom = (1.0 - s) * data[rows2, cols] + s * data[rows2, cols2]
+        return (1.0 - t) * top + t * bottom
+
+class OccupancyGrid(Grid):
+    """A grid of solid and empty cells.
+
+    A cell is solid if its center is inside any of the rasterized shapes,
+    using the nonzero fill rule for each shape.
+    """
+
+    def is_solid(self, x, y):
+        """Is the point in a solid cell?"""
+        return bool(self.sample(x, y))
+
+    @classmethod
+    def from_shapes(cls, shapes, bounding_box, cell_size, tolerance=None):
+        """Rasterize shapes in world coordinates."""
+        return cls._rasterize(((s, None) for s in shapes), bounding_box,
+                              cell_size, tolerance)
+
+    @classmethod
+    def from_document(cls, document, bounding_box, cell_size, predicate=None,
+                      tolerance=None):
+        """Rasterize the shapes of a document, in world coordinates.
+
+        If a predicate is given, only the shapes of elements for which it
+        returns true are rasterized.
+        """
+        def generate_shapes():
+            stack = [(document.root, Matrix())]
+            while stack:
+                element, matrix = stack.pop()
+                matrix = matrix * element.matrix
+                if (element.shape is not None and
+                    (predicate is None or predicate(element))):
+                    yield element.shape, matrix
+                stack.extend((c, matrix) for c in element.children)
+        return cls._rasterize(generate_shapes(), bounding_box, cell_size,
+                              tolerance)
+
+    @classmethod
+    def _rasterize(cls, shapes, bounding_box, cell_size, tolerance):
+        if tolerance is None:
+            tolerance = 0.1 * cell_size
+        width, height = cls._get_dimensions(bounding_box, cell_size)
+        if numpy is not None:
+            data = numpy.zeros((height, width), dtype=numpy.uint8)
+        else:
+            data = array('B', [0]) * (width * height)
+        for shape, matrix in shapes:
+            if matrix is not None:
+                shape = shape.transform(matrix)
+            rings = _get_rings(shape, tolerance)
+            if not rings:
+                continue
+            if numpy is not None:
+                cls._fill_rings_numpy(rings, data, bounding_box, cell_size)
+            else:
+                cls._fill_rings(rings, data, width, height, bounding_box,
+                                cell_size)
+        return cls(bounding_box, cell_size, data, width, height)
+
+    @classmethod
+    def _fill_rings(cls, rings, data, width, height, bounding_box,
+                    cell_size):
+        """Fill the cells inside rings with a scanline algorithm."""
+        min_x, min_y = bounding_box.min_x, bounding_box.min_y
+        crossings = {}
+        for points in rings:
+            for i in xrange(len(points)):
+                x1, y1 = points[i - 1]
+                x2, y2 = points[i]
+                if y1 == y2:
+                    continue
+                direction = 1 if y2 > y1 else -1
+                # The rows with cell centers in the half-open y range.
+                v1 = (min(y1, y2) - min_y) / cell_size - 0.5
+                v2 = (max(y1, y2) - min_y) / cell_size - 0.5
+                first_row = max(0, int(math.ceil(v1)))
+                last_row = min(height - 1, int(math.ceil(v2)) - 1)
+                slope = float(x2 - x1) / float(y2 - y1)
+                for row in xrange(first_row, last_row + 1):
+                    y = min_y + (row + 0.5) * cell_size
+                    x = x1 + (y - y1) * slope
+                    col = int(math.ceil((x - min_x) / cell_size - 0.5))
+                    crossings.setdefault(row, []).append(
+                        (min(max(col, 0), width), direction))
+        for row, row_crossings in crossings.items():
+            row_crossings.sort()
+            winding = 0
+            offset = row * width
+            for (col, direction), (next_col, _) in zip(row_crossings,
+                                                      row_crossings[1:]):
+                winding += direction
+                if winding:
+                    for i in xrange(offset + col, offset + next_col):
+                        data[i] = 1
+
+    @classmethod
+    def _fill_rings_numpy(cls, rings, data, bounding_box, cell_size):
+        """Fill the cells inside rings, accumulating winding number changes
+        at edge crossings for all edges at once."""
+        height, width = data.shape
+        starts = numpy.concatenate([numpy.roll(numpy.asarray(p, dtype=float),
+                                               1, axis=0) for p in rings])
+        ends = numpy.concatenate([numpy.asarray(p, dtype=float)
+                                  for p in rings])
+        x1, y1 = starts[:, 0], starts[:, 1]
+        x2, y2 = ends[:, 0], ends[:, 1]
+        keep = y1 != y2
+        x1, y1, x2, y2 = x1[keep], y1[keep], x2[keep], y2[keep]
+        v1 = (numpy.minimum(y1, y2) - bounding_box.min_y) / cell_size - 0.5
+        v2 = (numpy.maximum(y1, y2) - bounding_box.min_y) / cell_size - 0.5
+        first_rows = numpy.maximum(numpy.ceil(v1).astype(int), 0)
+        last_rows = numpy.minimum(numpy.ceil(v2).astype(int), height)
+        counts = numpy.maximum(last_rows - first_rows, 0)
+        total = counts.sum()
+        if not total:
+            return
+        edges = numpy.repeat(numpy.arange(len(counts)), counts)
+        offsets = numpy.cumsum(counts) - counts
+        rows = first_rows[edges] + numpy.arange(total) - offsets[edges]
+        ys = bounding_box.min_y + (rows + 0.5) * cell_size
+        xs = x1[edges] + (ys - y1[edges]) * ((x2 - x1) / (y2 - y1))[edges]
+        cols = numpy.ceil((xs - bounding_box.min_x) / cell_size - 0.5)
+        cols = numpy.clip(cols.astype(int), 0, width)
+        directions = numpy.where(y2 > y1, 1, -1)[edges]
+        windings = numpy.zeros((height, width + 1), dtype=numpy.int32)
+        numpy.add.at(windings, (rows, cols), directions)
+        data |= (numpy.cumsum(windings, axis=1)[:, :width] != 0)
+
+class DistanceField(Grid):
+    """A grid of signed distances to the nearest boundary between solid and
+    empty cells, negative inside solid cells.
+
+    Distances are measured between cell centers, offset by half a cell so
+    that the zero level lies on the boundary, and are exact Euclidean
+    distances at that resolution.
+
+    See: U{http://cs.brown.edu/~pff/papers/dt-final.pdf}
+    """
+
+    def is_solid(self, x, y):
+        """Is the point inside a solid region?"""
+        return self.sample_bilinear(x, y) < 0.0
+
+    @classmethod
+    def from_occupancy(cls, occupancy):
+        """Compute the signed distance field of an occupancy grid."""
+        width, height = occupancy.width, occupancy.height
+        max_distance = math.hypot(width, height)
+        if numpy is not None:
+            solid = occupancy.data.astype(bool)
+            outside = numpy.sqrt(_get_squared_distances_numpy(solid))
+            inside = numpy.sqrt(_get_squared_distances_numpy(~solid))
+            distances = numpy.where(solid, 0.5 - inside, outside - 0.5)
+            distances = numpy.clip(distances, -max_distance, max_distance)
+            data = distances * occupancy.cell_size
+        else:
+            solid = occupancy.data
+            outside = _get_squared_distances(solid, width, height, 1)
+            inside = _get_squared_distances(solid, width, height, 0)
+            data = array('d', [0.0]) * (width * height)
+            for i in xrange(width * height):
+                if solid[i]:
+                    distance = 0.5 - math.sqrt(inside[i])
+                else:
+                    distance = math.sqrt(outside[i]) - 0.5
+                distance = min(max(distance, -max_distance), max_distance)
+                data[i] = distance * occupancy.cell_size
+        return cls(occupancy.bounding_box, occupancy.cell_size, data, width,
+                   height)
+
+    @classmethod
+    def from_shapes(cls, shapes, bounding_box, cell_size, tolerance=None):
+        """Compute the signed distance field of shapes in world
+        coordinates."""
+        return cls.from_occupancy(OccupancyGrid.from_shapes(
+            shapes, bounding_box, cell_size, tolerance))
+
+    @classmethod
+    def from_document(cls, document, bounding_box, cell_size, predicate=None,
+                      tolerance=None):
+        """Compute the signed distance field of the shapes of a document."""
+        return cls.from_occupancy(OccupancyGrid.from_document(
+            document, bounding_box, cell_size, predicate, tolerance))
+
+# A squared distance larger than any within a grid.
+_FAR = 1e20
+
+def _get_squared_distance_transform(f):
+    """Get the one-dimensional squared distance transform of a sampled
+    function, as the lower envelope of parabolas."""
+    n = len(f)
+    v = [0] * n
+    z = [0.0] * (n + 1)
+    z[0], z[1] = -_FAR, _FAR
+    k = 0
+    for q in xrange(1, n):
+        while True:
+            p = v[k]
+            s = ((f[q] + q * q) - (f[p] + p * p)) / (2.0 * (q - p))
+            if s > z[k]:
+                break
+            k -= 1
+        k += 1
+        v[k] = q
+        z[k] = s
+        z[k + 1] = _FAR
+    d = [0.0] * n
+    k = 0
+    for q in xrange(n):
+        while z[k + 1] < q:
+            k += 1
+        p = v[k]
+        d[q] = (q - p) ** 2 + f[p]
+    return d
+
+def _get_squared_distances(data, width, height, feature):
+    """Get the squared distances in cells from each cell to the nearest cell
+    with the feature value."""
+    columns = []
+    for col in xrange(width):
+        f = [0.0 if data[row * width + col] == feature else _FAR
+             for row in xrange(height)]
+        columns.append(_get_squared_distance_transform(f))
+    result = array('d', [0.0]) * (width * height)
+    for row in xrange(height):
+        f = [columns[col][row] for col in xrange(width)]
+        result[row * width:(row + 1) * width] = array(
+            'd', _get_squared_distance_transform(f))
+    return result
+
+def _get_squared_distances_numpy(features):
+    """Get the squared distances in cells from each cell to the nearest
+    feature cell.
+
+    The distances along rows are found with running maxima and minima of
+    feature positions. The column pass then finds the lower envelope of
+    parabolas for all columns at once.
+    """
+    height, width = features.shape
+    cols = numpy.arange(width)
+    previous = numpy.where(features, cols, -_FAR)
+    previous = numpy.maximum.accumulate(previous, axis=1)
+    following = numpy.where(features, cols, _FAR)
+    following = numpy.minimum.accumulate(following[:, ::-1], axis=1)[:, ::-1]
+    row_distances = numpy.minimum(cols - previous, following - cols)
+    squared = numpy.minimum(row_distances ** 2, _FAR)
+    return numpy.minimum(_get_squared_distance_transform_numpy(squared), _FAR)
+
+def _get_squared_distance_transform_numpy(f):
+    """Get the one-dimensional squared distance transforms of the columns of
+    a sampled function, as the lower envelopes of parabolas.
+
+    This is L{_get_squared_distance_transform} run on all columns in step.
+    Each step only revisits the columns that still pop or advance, so the
+    work is linear in the size of the grid.
+    """
+    height, width = f.shape
+    cols = numpy.arange(width)
+    v = numpy.zeros((height, width), dtype=int)
+    z = numpy.empty((height + 1, width))
+    z[0], z[1] = -_FAR, _FAR
+    k = numpy.zeros(width, dtype=int)
+    s = numpy.empty(width)
+    for q in xrange(1, height):
+        active = cols
+        while len(active):
+            p = v[k[active], active]
+            s[active] = (((f[q, active] + q * q) - (f[p, active] + p * p)) /
+                         (2.0 * (q - p)))
+            active = active[s[active] <= z[k[active], active]]
+            k[active] -= 1
+        k += 1
+        v[k, cols] = q
+        z[k, cols] = s
+        z[k + 1, cols] = _FAR
+    d = numpy.empty((height, width))
+    k[:] = 0
+    for q in xrange(height):
+        active = cols
+        while len(active):
+            active = active[z[k[active] + 1, active] < q]
+            k[active] += 1
+        p = v[k, cols]
+        d[q] = (q - p) ** 2 + f[p, cols]
+    return d
+
+class Prototype(object):
+    """A shape shared by all instances with the same canonical geometry.
+
+    Derived geometry, such as flattened outlines or tessellations, can be
+    cached per prototype in the cache dictionary, and is then computed once
+    for all instances.
+    """
+
+    def __init__(self, shape, key):
+        self.shape = shape
+        self.key = key
+        self.instance_count = 0
+        self.cache = {}
+
+    def __repr__(self):
+        return '<Prototype %r instances=%i>' % (self.shape,
+                                                self.instance_count)
+
+    def flatten(self, tolerance):
+        """Get the flattened prototype, within the given tolerance in the
+        coordinates of the prototype."""
+        key = 'flatten', tolerance
+        if key not in self.cache:
+            self.cache[key] = self.shape.flatten(tolerance)
+        return self.cache[key]
+
+class Instance(object):
+    """A shape stored as a prototype and a transformation matrix from the
+    prototype to the coordinates of the shape."""
+
+    __slots__ = 'prototype', 'matrix', 'element'
+
+    def __init__(self, prototype, matrix, element=None):
+        self.prototype = prototype
+        self.matrix = matrix
+        self.element = element
+
+    def __repr__(self):
+        return 'Instance(%r, %r)' % (self.prototype, self.matrix)
+
+    @property
+    def shape(self):
+        """A copy of the shape, transformed from the prototype."""
+        return self.prototype.shape.transform(self.matrix)
+
+class GeometryLibrary(object):
+    """Deduplicated geometry, with one prototype per distinct shape.
+
+    Each added shape is normalized by moving its reference point to the
+    origin, and optionally by scaling it to unit size and rotating its first
+    vertex onto the positive x axis. Its canonical geometry is rounded to
+    the given precision and hashed, and shapes with the same hash share a
+    prototype. Rectangles and circles are never rotated, so that they keep
+    their analytic form, and ellipses are rotated onto their axes.
+    """
+
+    def __init__(self, scale=False, rotation=False, precision=1e-6):
+        self.scale = scale
+        self.rotation = rotation
+        self.precision = precision
+        self.prototypes = []
+        self.instances = []
+        self._prototypes = {}
+        self._shape_size = 0
+
+    def __repr__(self):
+        return '<GeometryLibrary prototypes=%i instances=%i>' % (
+            len(self.prototypes), len(self.instances))
+
+    @property
+    def memory_saved(self):
+        """The estimated number of bytes saved by storing prototypes and
+        matrices instead of the added shapes."""
+        prototype_size = sum(_get_size(p.shape) for p in self.prototypes)
+        matrix_size = sum(_get_size(i.matrix) for i in self.instances)
+        return self._shape_size - prototype_size - matrix_size
+
+    def add(self, shape, element=None):
+        """Add a shape, and get its instance."""
+        matrix = self._get_normalization(shape)
+        canonical_shape = shape.transform(matrix)
+        key = _get_geometry_key(canonical_shape, self.precision)
+        prototype = self._prototypes.get(key)
+        if prototype is None:
+            prototype = self._prototypes[key] = Prototype(canonical_shape, key)
+            self.prototypes.append(prototype)
+        prototype.instance_count += 1
+        self._shape_size += _get_size(shape)
+        instance = Instance(prototype, matrix.inverse(), element)
+        self.instances.append(instance)
+        return instance
+
+    @classmethod
+    def from_document(cls, document, scale=False, rotation=False,
+                      precision=1e-6):
+        """Create a library from the shapes of a document, with an instance
+        for each element with a shape."""
+        library = cls(scale, rotation, precision)
+        stack = [document.root]
+        while stack:
+            element = stack.pop()
+            if element.shape is not None:
+                library.add(element.shape, element)
+            stack.extend(reversed(element.children))
+        return library
+
+    def _get_normalization(self, shape):
+        """Get the matrix from a shape to its canonical form."""
+        angle = 0.0
+        if isinstance(shape, Circle):
+            (cx, cy), size = (shape.cx, shape.cy), shape.r
+        elif isinstance(shape, Ellipse):
+            (cx, cy), size = (shape.cx, shape.cy), max(shape.rx, shape.ry)
+            angle = shape.rotation
+        elif isinstance(shape, Rect):
+            (cx, cy), size = (shape.x, shape.y), max(shape.width, shape.height)
+        else:
+            if isinstance(shape, Line):
+                points = [shape.p1, shape.p2]
+            elif isinstance(shape, (Polyline, Polygon)):
+                points = shape.points
+            else:
+                points = list(chain(*(c.control_points
+                                      for c in shape.commands)))
+            if not points:
+                return Matrix()
+            cx = math.fsum(x for x, y in points) / len(points)
+            cy = math.fsum(y for x, y in points) / len(points)
+            size = math.sqrt(math.fsum((x - cx) ** 2 + (y - cy) ** 2
+                                       for x, y in points) / len(points))
+            for x, y in points:
+                if math.hypot(x - cx, y - cy) > 1e-9 * size:
+                    angle = math.degrees(math.atan2(y - cy, x - cx))
+                    break
+        matrix = Matrix.create_translate(-float(cx), -float(cy))
+        if self.scale and size > 0.0:
+            matrix = Matrix.create_scale(1.0 / size) * matrix
+        if self.rotation and angle and not isinstance(shape, (Circle, Rect)):
+            matrix = Matrix.create_rotate(-angle) * matrix
+        return matrix
+
+def _get_geometry_key(shape, precision):
+    """Get a hashable key for the geometry of a shape, with the numbers
+    rounded to the given precision."""
+    if isinstance(shape, Circle):
+        numbers = shape.cx, shape.cy, shape.r
+    elif isinstance(shape, Ellipse):
+        numbers = shape.cx, shape.cy, shape.rx, shape.ry, shape.rotation
+    elif isinstance(shape, Rect):
+        numbers = (shape.x, shape.y, shape.width, shape.height, shape.rx,
+                   shape.ry)
+    elif isinstance(shape, Line):
+        numbers = shape.x1, shape.y1, shape.x2, shape.y2
+    elif isinstance(shape, (Polyline, Polygon)):
+        numbers = list(chain(*shape.points))
+    else:
+        return tuple((c.letter, _get_geometry_key_numbers(
+            [getattr(c, name) for name in c.__slots__], precision))
+            for c in shape.commands)
+    return shape.__class__.__name__, _get_geometry_key_numbers(numbers,
+                                                                precision)
+
+def _get_geometry_key_numbers(numbers, precision):
+    return tuple(int(round(n / precision)) for n in numbers)
+
+def _get_size(obj):
+    """Estimate the number of bytes used by an object and everything it
+    references."""
+    size = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif not isinstance(obj, (basestring, int, float, bool, type)):
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get('__slots__', ())
+                if isinstance(slots, basestring):
+                    slots = slots,
+                stack.extend(getattr(obj, name) for name in slots
+                             if hasattr(obj, name))
+    return size
+
+def write_tiles(document, directory, tile_size, tolerance=0.1, precision=3):
+    """Split the shapes of a document into square tiles in world
+    coordinates, and write each tile to the directory as an SVG document.
+
+    Shapes that fit in a tile are written whole, where the tiles include
+    their top and left borders but not their bottom and right ones. Rects
+    without rounded corners are clipped into rects. Other shapes are
+    flattened within the tolerance and clipped at the tile borders: closed
+    outlines into polygons, and open ones into polylines, leaving out parts
+    with no area or length. A manifest with the tile size and
+    the file, bounding box and size of each tile is written to
+    C{manifest.json}, and returned.
+    """
+    tiles = {}
+    stack = [(document.root, Matrix())]
+    while stack:
+        element, matrix = stack.pop()
+        matrix = matrix * element.matrix
+        stack.extend((c, matrix) for c in reversed(element.children))
+        if element.shape is None:
+            continue
+        attributes = dict((k, v) for k, v in element.attributes.items()
+                          if k in _tile_attribute_names)
+        shape = element.shape.transform(matrix)
+        bounding_box = shape.bounding_box
+        if not bounding_box:
+            continue
+        min_col = int(math.floor(bounding_box.min_x / tile_size))
+        min_row = int(math.floor(bounding_box.min_y / tile_size))
+        max_col = max(min_col, int(math.ceil(bounding_box.max_x /
+                                             tile_size)) - 1)
+        max_row = max(min_row, int(math.ceil(bounding_box.max_y /
+                                             tile_size)) - 1)
+        if min_col == max_col and min_row == max_row:
+            tiles.setdefault((min_col, min_row), []).append(
+                (attributes, shape))
+            continue
+        if isinstance(shape, Rect) and not (shape.rx and shape.ry):
+            for col in xrange(min_col, max_col + 1):
+                for row in xrange(min_row, max_row + 1):
+                    x = max(shape.x, col * tile_size)
+                    y = max(shape.y, row * tile_size)
+                    width = min(shape.x + shape.width,
+                                (col + 1) * tile_size) - x
+                    height = min(shape.y + shape.height,
+                                 (row + 1) * tile_size) - y
+                    if width > 0.0 and height > 0.0:
+                        tiles.setdefault((col, row), []).append(
+                            (attributes, Rect(x, y, width, height)))
+            continue
+        basic_shapes = shape.flatten(tolerance)
+        for col in xrange(min_col, max_col + 1):
+            for row in xrange(min_row, max_row + 1):
+                subpaths = []
+                for basic_shape in basic_shapes:
+                    subpaths.extend(_clip_basic_shape(
+                        basic_shape, col * tile_size, row * tile_size,
+                        (col + 1) * tile_size, (row + 1) * tile_size))
+                if subpaths:
+                    tiles.setdefault((col, row), []).append(
+                        (attributes, Path(subpaths)))
+    writer = Writer(precision)
+    manifest = dict(tile_size=tile_size, tiles={})
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for (col, row), entries in sorted(tiles.items()):
+        file_name = 'tile_%i_%i.svg' % (col, row)
+        data = _format_tile(writer, entries).encode('utf-8')
+        with open(os.path.join(directory, file_name), 'wb') as file_obj:
+            file_obj.write(data)
+        manifest['tiles']['%i,%i' % (col, row)] = dict(
+            file=file_name, size=len(data), shape_count=len(entries),
+            bounding_box=[col * tile_size, row * tile_size,
+                          (col + 1) * tile_size, (row + 1) * tile_size])
+    with open(os.path.join(directory, 'manifest.json'), 'w') as file_obj:
+        json.dump(manifest, file_obj, indent=1, sort_keys=True)
+    return manifest
+
+# Attributes copied from the elements of a document to its tiles.
+_tile_attribute_names = frozenset(['id', 'class', 'style', 'fill', 'stroke',
+                                   'stroke-width', 'fill-rule', 'opacity'])
+
+def _format_tile(writer, entries):
+    parts = [u'<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n',
+             u'<svg xmlns="%s">\n' % SVG_NAMESPACE]
+    number = writer.format_number
+    for attributes, shape in entries:
+        attributes = dict(attributes)
+        if isinstance(shape, Circle):
+            tag_name = u'circle'
+            attributes.update(cx=number(shape.cx), cy=number(shape.cy),
+                              r=number(shape.r))
+        elif isinstance(shape, Rect):
+            tag_name = u'rect'
+            attributes.update(x=number(shape.x), y=number(shape.y),
+                              width=number(shape.width),
+                              height=number(shape.height))
+            if shape.rx or shape.ry:
+                attributes.update(rx=number(shape.rx), ry=number(shape.ry))
+        elif isinstance(shape, Ellipse) and not shape.rotation:
+            tag_name = u'ellipse'
+            attributes.update(cx=number(shape.cx), cy=number(shape.cy),
+                              rx=number(shape.rx), ry=number(shape.ry))
+        else:
+            tag_name = u'path'
+            path = shape if isinstance(shape, Path) else shape.path
+            attributes['d'] = writer.format_path(path)
+        parts.append(u'<%s' % tag_name)
+        for name, value in sorted(attributes.items()):
+            parts.append(u' %s="%s"' % (name, _escape_xml(value, True)))
+        parts.append(u'/>\n')
+    parts.append(u'</svg>\n')
+    return u''.join(parts)
+
+def _clip_basic_shape(shape, min_x, min_y, max_x, max_y):
+    """Clip a line, polyline or polygon to a rectangle, and get the parts
+    as subpaths."""
+    if isinstance(shape, Polygon):
+        points = _clip_polygon(shape.points, min_x, min_y, max_x, max_y)
+        if len(points) < 3 or not Polygon(points).area:
+            return []
+        return Polygon(points).path.subpaths
+    points = shape.points if isinstance(shape, Polyline) else [shape.p1,
+                                                               shape.p2]
+    return [Polyline(p).path.subpaths[0]
+            for p in _clip_polyline(points, min_x, min_y, max_x, max_y)]
+
+def _clip_polygon(points, min_x, min_y, max_x, max_y):
+    """Clip a polygon to a rectangle with the Sutherland-Hodgman algorithm.
+
+    See: U{http://en.wikipedia.org/wiki/Sutherland-Hodgman_algorithm}
+    """
+    # Each edge of the rectangle as the axis, the bound, and the side kept.
+    for axis, bound, sign in ((0, min_x, 1.0), (0, max_x, -1.0),
+                              (1, min_y, 1.0), (1, max_y, -1.0)):
+        if not points:
+            break
+        result = []
+        previous = points[-1]
+        previous_inside = sign * (previous[axis] - bound) >= 0.0
+        for point in points:
+            inside = sign * (point[axis] - bound) >= 0.0
+            if inside != previous_inside:
+                t = (bound - previous[axis]) / (point[axis] - previous[axis])
+                x = previous[0] + t * (point[0] - previous[0])
+                y = previous[1] + t * (point[1] - previous[1])
+                result.append((bound, y) if axis == 0 else (x, bound))
+            if inside:
+                result.append(point)
+            previous, previous_inside = point, inside
+        points = result
+    return points
+
+def _clip_polyline(points, min_x, min_y, max_x, max_y):
+    """Clip a polyline to a rectangle with the Liang-Barsky algorithm, and
+    get the parts that are inside as lists of points."""
+    parts = []
+    part = []
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        dx, dy = x2 - x1, y2 - y1
+        t1, t2 = 0.0, 1.0
+        for p, q in ((-dx, x1 - min_x), (dx, max_x - x1),
+                     (-dy, y1 - min_y), (dy, max_y - y1)):
+            if p == 0.0:
+                if q < 0.0:
+                    t1, t2 = 1.0, 0.0
+                    break
+            elif p < 0.0:
+                t1 = max(t1, q / p)
+            else:
+                t2 = min(t2, q / p)
+        if t1 >= t2:
+            if len(part) > 1:
+                parts.append(part)
+            part = []
+            continue
+        start = x1 + t1 * dx, y1 + t1 * dy
+        if t1 > 0.0 or not part:
+            if len(part) > 1:
+                parts.append(part)
+            part = [start]
+        part.append((x1 + t2 * dx, y1 + t2 * dy))
+        if t2 < 1.0:
+            parts.append(part)
+            part = []
+    if len(part) > 1:
+        parts.append(part)
+    return parts
+
+class Tile(object):
+    """A loaded tile of a split document."""
+
+    def __init__(self, key, bounding_box, document, size):
+        self.key = key
+        self.bounding_box = bounding_box
+        self.document = document
+        self.size = size
+
+    def __repr__(self):
+        return '<Tile %i,%i>' % self.key
+
+class TileLoader(object):
+    """Loads the tiles of a split document around a camera, and unloads the
+    least recently used ones when over a memory budget.
+
+    The memory used by a tile is estimated by the size of its file. Tiles in
+    view are never unloaded, even when they alone exceed the budget.
+    """
+
+    def __init__(self, directory, memory_budget):
+        """Initialize a loader for the tiles in a directory written by
+        L{write_tiles}, with a memory budget in bytes."""
+        self.directory = directory
+        self.memory_budget = memory_budget
+        with open(os.path.join(directory, 'manifest.json')) as file_obj:
+            manifest = json.load(file_obj)
+        self.tile_size = manifest['tile_size']
+        self._entries = {}
+        for key, entry in manifest['tiles'].items():
+            col, row = key.split(',')
+            self._entries[int(col), int(row)] = entry
+        self.tiles = OrderedDict()
+        self.memory_used = 0
+
+    def update(self, camera):
+        """Load the tiles overlapping the camera bounding box, and get them.
+
+        Tiles outside the view are unloaded, least recently used first,
+        until the memory used is within the budget.
+        """
+        tile_size = self.tile_size
+        min_col = int(math.floor(camera.min_x / tile_size))
+        min_row = int(math.floor(camera.min_y / tile_size))
+        max_col = int(math.floor(camera.max_x / tile_size))
+        max_row = int(math.floor(camera.max_y / tile_size))
+        visible = []
+        for col in xrange(min_col, max_col + 1):
+            for row in xrange(min_row, max_row + 1):
+                key = col, row
+                tile = self.tiles.pop(key, None)
+                if tile is None:
+                    if key not in self._entries:
+                        continue
+                    tile = self._load_tile(key)
+                    self.memory_used += tile.size
+                # Keep the tiles in order of use, most recent last.
+                self.tiles[key] = tile
+                visible.append(tile)
+        if self.memory_used > self.memory_budget:
+            visible_keys = set(t.key for t in visible)
+            for key in list(self.tiles):
+                if self.memory_used <= self.memory_budget:
+                    break
+                if key not in visible_keys:
+                    self.memory_used -= self.tiles.pop(key).size
+        return visible
+
+    def _load_tile(self, key):
+        entry = self._entries[key]
+        document = Document(os.path.join(self.directory, entry['file']))
+        bounding_box = BoundingBox(*entry['bounding_box'])
+        return Tile(key, bounding_box, document, entry['size'])
+
+class StrokeBuffer(object):
+    """Triangles covering stroked outlines, batched into one vertex array and
+    one index array.
+
+    The vertices are stored as interleaved x and y coordinates, and the
+    indices as triples of vertex indices. Each added stroke gets a range of
+    vertices and indices, stored with its key in the ranges list. Segments
+    are separate quads, with join triangles on the outer side of each turn,
+    so triangles overlap on the inner side.
+    """
+
+    def __init__(self, tolerance=0.1):
+        """Initialize an empty buffer. Curves and round joins and caps are
+        flattened within the given tolerance, in world coordinates."""
+        self.tolerance = tolerance
+        self.vertices = array('d')
+        self.indices = array('I')
+        self.ranges = []
+
+    def __repr__(self):
+        return '<StrokeBuffer vertices=%i triangles=%i>' % (
+            len(self.vertices) // 2, len(self.indices) // 3)
+
+    def add(self, shape, width=1.0, join='miter', cap='butt', miter_limit=4.0,
+            matrix=None, key=None):
+        """Add the stroke of a shape.
+
+        The stroke is generated in the coordinates of the shape, and then
+        transformed by the matrix, like in SVG. The range of the stroke is
+        stored as a (key, first vertex, vertex count, first index, index
+        count) tuple.
+        """
+        first_vertex = len(self.vertices) // 2
+        first_index = len(self.indices)
+        tolerance = self.tolerance
+        if matrix is not None and matrix.scale_factor > 0.0:
+            tolerance /= matrix.scale_factor
+        for basic_shape in shape.flatten(tolerance):
+            if isinstance(basic_shape, Line):
+                points, closed = [basic_shape.p1, basic_shape.p2], False
+            else:
+                points = basic_shape.points
+                closed = isinstance(basic_shape, Polygon)
+            self._add_outline(points, closed, 0.5 * width, join, cap,
+                              miter_limit, tolerance)
+        vertex_count = len(self.vertices) // 2 - first_vertex
+        if matrix is not None and matrix.type != Matrix.IDENTITY:
+            start, stop = 2 * first_vertex, len(self.vertices)
+            coords = self.vertices[start:stop]
+            points = matrix.transform_points(zip(coords[::2], coords[1::2]))
+            self.vertices[start:stop] = array('d', chain(*points))
+        self.ranges.append((key, first_vertex, vertex_count, first_index,
+                            len(self.indices) - first_index))
+
+    @classmethod
+    def from_document(cls, document, tolerance=0.1):
+        """Create a buffer with the strokes of all stroked elements in a
+        document, in world coordinates, keyed by element."""
+        buffer = cls(tolerance)
+        stack = [document.root]
+        while stack:
+            element = stack.pop()
+            stack.extend(reversed(element.children))
+            if element.shape is None:
+                continue
+            style = parse_stroke_style(element.attributes)
+            if style is not None:
+                buffer.add(element.shape, matrix=element.world_matrix,
+                           key=element, **style)
+        return buffer
+
+    def _add_outline(self, points, closed, half_width, join, cap,
+                     miter_limit, tolerance):
+        points = [p for i, p in enumerate(points) if not i or
+                  p != points[i - 1]]
+        if closed and len(points) > 1 and points[0] == points[-1]:
+            del points[-1]
+        if len(points) < 2:
+            return
+        count = len(points)
+        directions = []
+        for i in xrange(count if closed else count - 1):
+            (x1, y1), (x2, y2) = points[i], points[(i + 1) % count]
+            length = math.hypot(x2 - x1, y2 - y1)
+            directions.append(((x2 - x1) / length, (y2 - y1) / length))
+        for i, (dx, dy) in enumerate(directions):
+            (x1, y1), (x2, y2) = points[i], points[(i + 1) % count]
+            nx, ny = -dy * half_width, dx * half_width
+            self._add_quad((x1 + nx, y1 + ny), (x1 - nx, y1 - ny),
+                           (x2 + nx, y2 + ny), (x2 - nx, y2 - ny))
+        if closed:
+            joints = xrange(count)
+        else:
+            joints = xrange(1, count - 1)
+        for i in joints:
+            self._add_join(points[i], directions[i - 1], directions[i],
+                           half_width, join, miter_limit, tolerance)
+        if not closed:
+            dx, dy = directions[0]
+            self._add_cap(points[0], -dx, -dy, half_width, cap, tolerance)
+            self._add_cap(points[-1], directions[-1][0], directions[-1][1],
+                          half_width, cap, tolerance)
+
+    def _add_join(self, point, direction1, direction2, half_width, join,
+                  miter_limit, tolerance):
+        (dx1, dy1), (dx2, dy2) = direction1, direction2
+        cross = dx1 * dy2 - dy1 * dx2
+        if abs(cross) < 1e-12 and dx1 * dx2 + dy1 * dy2 > 0.0:
+            return
+        # The outer side of a left turn is on the right.
+        side = -half_width if cross > 0.0 else half_width
+        nx1, ny1 = -dy1 * side, dx1 * side
+        nx2, ny2 = -dy2 * side, dx2 * side
+        x, y = point
+        outer1 = x + nx1, y + ny1
+        outer2 = x + nx2, y + ny2
+        if join == 'round':
+            angle1 = math.atan2(ny1, nx1)
+            angle = math.atan2(nx1 * ny2 - ny1 * nx2, nx1 * nx2 + ny1 * ny2)
+            segment_count = _get_arc_segment_count(half_width, angle,
+                                                   tolerance)
+            fan = [outer1]
+            for j in xrange(1, segment_count):
+                a = angle1 + angle * j / segment_count
+                fan.append((x + half_width * math.cos(a),
+                            y + half_width * math.sin(a)))
+            fan.append(outer2)
+            self._add_fan(point, fan)
+            return
+        if join != 'bevel':
+            mx, my = nx1 + nx2, ny1 + ny2
+            cos_half_angle = 0.5 * math.hypot(mx, my) / half_width
+            if cos_half_angle * miter_limit >= 1.0:
+                scale = 1.0 / (2.0 * cos_half_angle * cos_half_angle)
+                miter = x + mx * scale, y + my * scale
+                self._add_fan(point, [outer1, miter, outer2])
+                return
+        self._add_fan(point, [outer1, outer2])
+
+    def _add_cap(self, point, dx, dy, half_width, cap, tolerance):
+        """Add a cap to the end of an outline, facing the direction."""
+        x, y = point
+        nx, ny = -dy * half_width, dx * half_width
+        if cap == 'square':
+            ex, ey = dx * half_width, dy * half_width
+            self._add_quad((x - nx, y - ny), (x + nx, y + ny),
+                           (x - nx + ex, y - ny + ey),
+                           (x + nx + ex, y + ny + ey))
+        elif cap == 'round':
+            angle1 = math.atan2(-ny, -nx)
+            segment_count = _get_arc_segment_count(half_width, math.pi,
+                                                   tolerance)
+            fan = [(x - nx, y - ny)]
+            for j in xrange(1, segment_count):
+                a = angle1 + math.pi * j / segment_count
+                fan.append((x + half_width * math.cos(a),
+                            y + half_width * math.sin(a)))
+            fan.append((x + nx, y + ny))
+            self._add_fan(point, fan)
+
+    def _add_quad(self, p1, p2, p3, p4):
+        """Add two triangles covering a quad with the vertices in strip
+        order."""
+        index = len(self.vertices) // 2
+        self.vertices.extend(chain(p1, p2, p3, p4))
+        self.indices.extend((index, index + 1, index + 2,
+                             index + 2, index + 1, index + 3))
+
+    def _add_fan(self, center, points):
+        """Add a triangle fan around a center."""
+        index = len(self.vertices) // 2
+        self.vertices.extend(center)
+        self.vertices.extend(chain(*points))
+        for i in xrange(1, len(points)):
+            self.indices.extend((index, index + i, index + i + 1))
+
+class Animation(object):
+    """Interpolation between keyframes with matching elements.
+
+    The elements with shapes that match in every keyframe are animated,
+    and the ids attribute lists their matching keys. Their world matrices
+    are packed in decomposed form, so that rotations interpolate without
+    shearing, along with their fill and stroke colors, and their outlines in
+    shape coordinates, resampled by arc length to the same number of
+    vertices in every keyframe. Each evaluation then interpolates all the
+    packed values at once, with NumPy if available.
+    """
+
+    def __init__(self, keyframes, times=None, tolerance=0.1, match='id'):
+        """Initialize an animation between keyframe elements, such as
+        layers or document roots, at the given times. The times default to
+        the keyframe indices.
+
+        Elements are matched by ID, or with C{match='label'} by Inkscape
+        label, and by document order among the unlabeled elements. IDs are
+        unique within a document, so use labels for the layers of a single
+        document.
+        """
+        if times is None:
+            times = range(len(keyframes))
+        self.times = [float(t) for t in times]
+        if match == 'id':
+            elements = [_get_elements_by_id(k) for k in keyframes]
+        elif match == 'label':
+            elements = [_get_elements_by_label(k) for k in keyframes]
+        else:
+            raise ValueError('invalid match: ' + match)
+        # Labels sort before the document order positions.
+        self.ids = sorted(set(elements[0]).intersection(*elements[1:]),
+                          key=lambda k: (not isinstance(k, basestring), k))
+        self.vertex_offsets = array('l', [0])
+        self.closed = array('b')
+        self.outline_offsets = array('l', [0])
+        matrices = [[] for _ in keyframes]
+        colors = [[] for _ in keyframes]
+        vertices = [[] for _ in keyframes]
+        for id in self.ids:
+            keyframe_elements = [e[id] for e in elements]
+            for i, element in enumerate(keyframe_elements):
+                matrices[i].extend(element.world_matrix.decompose())
+                colors[i].extend(_get_element_colors(element))
+            self._add_outlines([e.shape for e in keyframe_elements],
+                               tolerance, vertices)
+            self.outline_offsets.append(len(self.closed))
+        # Rotate the shortest way between keyframes.
+        for previous, current in zip(matrices, matrices[1:]):
+            for i in xrange(2, len(current), 6):
+                turn = (current[i] - previous[i]) % 360.0
+                current[i] = previous[i] + (turn - 360.0 if turn > 180.0 else
+                                            turn)
+        if numpy is not None:
+            self._matrices = numpy.array(matrices, dtype=float)
+            self._colors = numpy.array(colors, dtype=float)
+            self._vertices = numpy.array(vertices, dtype=float)
+        else:
+            self._matrices = [array('d', m) for m in matrices]
+            self._colors = [array('d', c) for c in colors]
+            self._vertices = [array('d', v) for v in vertices]
+
+    def __repr__(self):
+        return '<Animation elements=%i keyframes=%i>' % (len(self.ids),
+                                                         len(self.times))
+
+    @classmethod
+    def from_documents(cls, documents, times=None, tolerance=0.1):
+        """Create an animation between documents."""
+        return cls([d.root for d in documents], times, tolerance)
+
+    @classmethod
+    def from_layers(cls, document, labels, times=None, tolerance=0.1):
+        """Create an animation between the layers of a document with the
+        given labels, matching their elements by label."""
+        layers = dict((l.attributes.get('inkscape:label'), l)
+                      for l in document.layers)
+        return cls([layers[l] for l in labels], times, tolerance, 'label')
+
+    def evaluate(self, time):
+        """Interpolate the animation at a time, clamped to the keyframes.
+
+        Returns the world matrices as six numbers per element, the fill and
+        stroke colors as eight RGBA components per element, and the outline
+        vertices as interleaved coordinates. The outlines of element i are
+        numbered from outline_offsets[i] to outline_offsets[i + 1], and the
+        vertices of outline j from vertex_offsets[j] to vertex_offsets[j +
+        1].
+        """
+        times = self.times
+        index = max(0, min(bisect_right(times, time) - 1, len(times) - 2))
+        if len(times) == 1:
+            t, index, next_index = 0.0, 0, 0
+        else:
+            next_index = index + 1
+            t = (time - times[index]) / (times[next_index] - times[index])
+            t = min(max(t, 0.0), 1.0)
+        values = []
+        for keyframes in (self._matrices, self._colors, self._vertices):
+            start, stop = keyframes[index], keyframes[next_index]
+            if numpy is not None:
+                values.append(start + (stop - start) * t)
+            else:
+                values.append(array('d', [a + (b - a) * t
+                                          for a, b in zip(start, stop)]))
+        decomposed, colors, vertices = values
+        return self._compose_matrices(decomposed), colors, vertices
+
+    def _compose_matrices(self, decomposed):
+        if numpy is not None:
+            tx, ty, angle, sx, sy, skew = decomposed.reshape(-1, 6).T
+            angle = numpy.radians(angle)
+            cos_angle, sin_angle = numpy.cos(angle), numpy.sin(angle)
+            tan_skew = numpy.tan(numpy.radians(skew))
+            return numpy.column_stack([
+                cos_angle * sx, sin_angle * sx,
+                (cos_angle * tan_skew - sin_angle) * sy,
+                (sin_angle * tan_skew + cos_angle) * sy, tx, ty]).ravel()
+        matrices = array('d')
+        for i in xrange(0, len(decomposed), 6):
+            matrices.extend(Matrix.create_from_decomposition(
+                *decomposed[i:i + 6]).abcdef)
+        return matrices
+
+    def _add_outlines(self, shapes, tolerance, vertices):
+        """Resample the outlines of a shape in every keyframe to the same
+        number of vertices."""
+        keyframe_outlines = [s.flatten(tolerance) for s in shapes]
+        outline_count = len(keyframe_outlines[0])
+        if any(len(o) != outline_count or
+               [isinstance(b, Polygon) for b in o] !=
+               [isinstance(b, Polygon) for b in keyframe_outlines[0]]
+               for o in keyframe_outlines):
+            # Without matching outlines, resample the shapes as a whole.
+            keyframe_outlines = [[s] for s in shapes]
+        for outlines in zip(*keyframe_outlines):
+            tables = [ArcLengthTable(o, tolerance) for o in outlines]
+            closed = all(t.closed for t in tables)
+            count = max(len(t.xs) for t in tables)
+            if closed:
+                # The last vertex of a closed table repeats the first.
+                count -= 1
+            for i, table in enumerate(tables):
+                step = table.length / (count if closed else
+                                       max(count - 1, 1))
+                points = table.points_at([j * step for j in xrange(count)])
+                vertices[i].extend(chain(*points))
+            self.closed.append(closed)
+            self.vertex_offsets.append(self.vertex_offsets[-1] + count)
+
+def _get_elements_by_id(root):
+    """Get the descendants of an element that have shapes, by ID."""
+    elements = {}
+    stack = list(root.children)
+    while stack:
+        element = stack.pop()
+        id = element.attributes.get('id')
+        if id is not None and element.shape is not None:
+            elements[id] = element
+        stack.extend(element.children)
+    return elements
+
+def _get_elements_by_label(root):
+    """Get the descendants of an element that have shapes, by Inkscape
+    label, or by document order among the unlabeled ones."""
+    elements = {}
+    index = 0
+    stack = list(reversed(root.children))
+    while stack:
+        element = stack.pop()
+        if element.shape is not None:
+            label = element.attributes.get('inkscape:label')
+            if label is None:
+                elements[index] = element
+                index += 1
+            else:
+                elements.setdefault(label, element)
+        stack.extend(reversed(element.children))
+    return elements
+
+def _get_element_colors(element):
+    """Get the fill and stroke colors of an element as RGBA components.
+
+    C{currentColor} is the color property of the element. Paint servers,
+    such as gradients, and inherited paint are treated like C{none}, and get
+    zero components.
+    """
+    style = dict(element.attributes)
+    style.update(parse_style(style.get('style', '')))
+    components = []
+    for name, default in (('fill', 'black'), ('stroke', 'none')):
+        paint = style.get(name, default).strip()
+        if paint == 'currentColor':
+            paint = style.get('color', 'none').strip()
+        color = None
+        if paint != 'inherit' and not paint.startswith('url('):
+            color = Color.from_string(paint)
+        opacity = float(style.get(name + '-opacity', '1'))
+        if color is None:
+            components.extend((0.0, 0.0, 0.0, 0.0))
+        else:
+            components.extend(color.components_as_float + (opacity,))
+    return components
+
+class Topology(object):
+    """Welded vertices and half-edge connectivity for the outlines of many
+    shapes.
+
+    Vertices within epsilon of an existing vertex are welded to it, using a
+    spatial hash with cells of size epsilon. Closed outlines become
+    counterclockwise faces bounded by half-edges, and half-edges between the
+    same vertices in opposite directions are twins, so shared edges connect
+    neighboring faces. Half-edges without twins are on the boundary. Open
+    outlines are welded and kept as polylines of vertex indices.
+
+    Edges are split at the face vertices within epsilon of them, so that
+    faces meeting at T-junctions, such as a small tile next to a larger
+    one, share the split edges. The face vertices and half-edges are
+    found with a grid whose cells are the average length of the face edges,
+    and which is rebuilt when the average halves or doubles. Each
+    edge is in the cells along it rather than in every cell of its bounding
+    box, so the number of entries stays proportional to the number of edges.
+    """
+
+    def __init__(self, epsilon=1e-6):
+        self.epsilon = epsilon
+        self.vertices = array('d')
+        self.origins = array('l')
+        self.twins = array('l')
+        self.nexts = array('l')
+        self.edge_faces = array('l')
+        self.face_edges = array('l')
+        self.face_keys = []
+        self.polylines = []
+        self.weld_count = 0
+        self._cells = {}
+        self._edges = {}
+        self._grid_size = None
+        self._vertex_grid = {}
+        self._edge_grid = {}
+        self._edge_length_sum = 0.0
+
+    def __repr__(self):
+        return '<Topology vertices=%i faces=%i half_edges=%i>' % (
+            self.vertex_count, len(self.face_edges), len(self.origins))
+
+    @property
+    def vertex_count(self):
+        """The number of welded vertices."""
+        return len(self.vertices) // 2
+
+    def get_vertex(self, vertex):
+        """Get the position of a vertex."""
+        return self.vertices[2 * vertex], self.vertices[2 * vertex + 1]
+
+    def add_vertex(self, x, y):
+        """Get the index of the vertex within epsilon of a point, adding one
+        if there is none."""
+        epsilon = self.epsilon
+        col = int(math.floor(x / epsilon))
+        row = int(math.floor(y / epsilon))
+        vertices = self.vertices
+        for neighbor_col in (col - 1, col, col + 1):
+            for neighbor_row in (row - 1, row, row + 1):
+                for vertex in self._cells.get((neighbor_col, neighbor_row),
+                                              ()):
+                    if (math.hypot(x - vertices[2 * vertex],
+                                   y - vertices[2 * vertex + 1]) <= epsilon):
+                        self.weld_count += 1
+                        return vertex
+        vertex = len(vertices) // 2
+        vertices.append(x)
+        vertices.append(y)
+        self._cells.setdefault((col, row), []).append(vertex)
+        return vertex
+
+    def add(self, shape, key=None, tolerance=0.1):
+        """Add the outlines of a shape, flattened within the tolerance."""
+        for basic_shape in shape.flatten(tolerance):
+            if isinstance(basic_shape, Line):
+                points = [basic_shape.p1, basic_shape.p2]
+            else:
+                points = basic_shape.points
+            indices = []
+            for x, y in points:
+                vertex = self.add_vertex(x, y)
+                if not indices or indices[-1] != vertex:
+                    indices.append(vertex)
+            if isinstance(basic_shape, Polygon):
+                if len(indices) > 1 and indices[0] == indices[-1]:
+                    del indices[-1]
+                if len(indices) >= 3:
+                    self._add_face(indices, key)
+            elif len(indices) >= 2:
+                self.polylines.append((key, indices))
+
+    def _add_face(self, indices, key):
+        points = [self.get_vertex(v) for v in indices]
+        if _get_ring_area(points) < 0.0:
+            indices.reverse()
+            points.reverse()
+        self._edge_length_sum += _get_length(points + points[:1])
+        size = max(self._edge_length_sum / (len(self.origins) + len(points)),
+                   self.epsilon)
+        if self._grid_size is None or not (0.5 * self._grid_size <= size <=
+                                           2.0 * self._grid_size):
+            self._build_grids(size)
+        indices = self._split_face_edges(indices)
+        for vertex in indices:
+            self._split_edges(vertex)
+        face = len(self.face_edges)
+        first_edge = len(self.origins)
+        count = len(indices)
+        self.face_edges.append(first_edge)
+        self.face_keys.append(key)
+        for i, origin in enumerate(indices):
+            edge = first_edge + i
+            destination = indices[(i + 1) % count]
+            self.origins.append(origin)
+            self.nexts.append(first_edge + (i + 1) % count)
+            self.edge_faces.append(face)
+            self.twins.append(-1)
+            self._twin_edge(edge, origin, destination)
+            self._edges.setdefault((origin, destination), edge)
+            self._add_edge_to_grid(edge, origin, destination)
+        for vertex in indices:
+            self._add_vertex_to_grid(vertex)
+
+    def _twin_edge(self, edge, origin, destination):
+        """Twin a half-edge with an untwinned opposite half-edge."""
+        twin = self._edges.get((destination, origin), -1)
+        if twin != -1 and self.twins[twin] == -1:
+            self.twins[twin] = edge
+            self.twins[edge] = twin
+
+    def _build_grids(self, size):
+        """Rebuild the grids of face vertices and half-edges with a new cell
+        size."""
+        self._grid_size = size
+        self._vertex_grid = {}
+        self._edge_grid = {}
+        for edge in xrange(len(self.origins)):
+            self._add_edge_to_grid(edge, self.origins[edge],
+                                   self.get_destination(edge))
+        for vertex in sorted(set(self.origins)):
+            self._add_vertex_to_grid(vertex)
+
+    def _get_grid_cells(self, vertex1, vertex2):
+        """Get the grid cells within epsilon of the segment between two
+        vertices, a column at a time."""
+        (x1, y1), (x2, y2) = self.get_vertex(vertex1), self.get_vertex(vertex2)
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        size, epsilon = self._grid_size, self.epsilon
+        cells = []
+        for col in xrange(int(math.floor((x1 - epsilon) / size)),
+                          int(math.floor((x2 + epsilon) / size)) + 1):
+            # The part of the segment within epsilon of the column.
+            left_y, right_y = y1, y2
+            if x2 > x1:
+                slope = (y2 - y1) / (x2 - x1)
+                left = min(max(col * size - epsilon, x1), x2)
+                right = min(max((col + 1) * size + epsilon, x1), x2)
+                left_y = y1 + (left - x1) * slope
+                right_y = y1 + (right - x1) * slope
+            for row in xrange(
+                    int(math.floor((min(left_y, right_y) - epsilon) / size)),
+                    int(math.floor((max(left_y, right_y) + epsilon) /
+                                   size)) + 1):
+                cells.append((col, row))
+        return cells
+
+    def _get_grid_cell(self, vertex):
+        x, y = self.get_vertex(vertex)
+        size = self._grid_size
+        return int(math.floor(x / size)), int(math.floor(y / size))
+
+    def _add_vertex_to_grid(self, vertex):
+        # Only the edges are expanded by epsilon, so that each vertex is in
+        # a single cell.
+        self._vertex_grid.setdefault(self._get_grid_cell(vertex),
+                                     []).append(vertex)
+
+    def _add_edge_to_grid(self, edge, origin, destination):
+        for cell in self._get_grid_cells(origin, destination):
+            self._edge_grid.setdefault(cell, []).append(edge)
+
+    def _get_edge_parameter(self, vertex, origin, destination):
+        """Get the parameter along an edge of a vertex within epsilon of its
+        interior, or None."""
+        if vertex == origin or vertex == destination:
+            return None
+        x, y = self.get_vertex(vertex)
+        (x1, y1), (x2, y2) = self.get_vertex(origin), self.get_vertex(
+            destination)
+        dx, dy = x2 - x1, y2 - y1
+        length_squared = dx * dx + dy * dy
+        if not length_squared:
+            return None
+        t = ((x - x1) * dx + (y - y1) * dy) / length_squared
+        if (0.0 < t < 1.0 and math.hypot(x1 + t * dx - x, y1 + t * dy - y) <=
+            self.epsilon):
+            return t
+        return None
+
+    def _split_face_edges(self, indices):
+        """Insert the face vertices that lie on the edges of a new face."""
+        result = []
+        count = len(indices)
+        for i, origin in enumerate(indices):
+            destination = indices[(i + 1) % count]
+            result.append(origin)
+            splits = set()
+            for cell in self._get_grid_cells(origin, destination):
+                for vertex in self._vertex_grid.get(cell, ()):
+                    t = self._get_edge_parameter(vertex, origin, destination)
+                    if t is not None:
+                        splits.add((t, vertex))
+            result.extend(vertex for t, vertex in sorted(splits))
+        return result
+
+    def _split_edges(self, vertex):
+        """Split the existing half-edges that pass through a vertex."""
+        split_edges = []
+        for edge in self._edge_grid.get(self._get_grid_cell(vertex), ()):
+            origin = self.origins[edge]
+            destination = self.get_destination(edge)
+            if self._get_edge_parameter(vertex, origin,
+                                        destination) is not None:
+                split_edges.append(edge)
+        changed_edges = []
+        for edge in split_edges:
+            origin = self.origins[edge]
+            destination = self.get_destination(edge)
+            new_edge = len(self.origins)
+            self.origins.append(vertex)
+            self.nexts.append(self.nexts[edge])
+            self.edge_faces.append(self.edge_faces[edge])
+            self.twins.append(-1)
+            self.nexts[edge] = new_edge
+            twin = self.twins[edge]
+            if twin != -1:
+                self.twins[twin] = -1
+                self.twins[edge] = -1
+            if self._edges.get((origin, destination)) == edge:
+                del self._edges[origin, destination]
+            self._edges.setdefault((origin, vertex), edge)
+            self._edges.setdefault((vertex, destination), new_edge)
+            self._add_edge_to_grid(new_edge, vertex, destination)
+            changed_edges.extend((edge, new_edge))
+        for edge in changed_edges:
+            if self.twins[edge] == -1:
+                self._twin_edge(edge, self.origins[edge],
+                                self.get_destination(edge))
+
+    @classmethod
+    def from_shapes(cls, shapes, epsilon=1e-6, tolerance=0.1):
+        """Create a topology from shapes, keyed by their indices."""
+        topology = cls(epsilon)
+        for i, shape in enumerate(shapes):
+            topology.add(shape, i, tolerance)
+        return topology
+
+    @classmethod
+    def from_document(cls, document, epsilon=1e-6, tolerance=0.1):
+        """Create a topology from the shapes of a document, in world
+        coordinates, keyed by element."""
+        topology = cls(epsilon)
+        stack = [document.root]
+        while stack:
+            element = stack.pop()
+            stack.extend(reversed(element.children))
+            if element.shape is not None:
+                topology.add(element.shape.transform(element.world_matrix),
+                             element, tolerance)
+        return topology
+
+    def get_destination(self, edge):
+        """Get the vertex at the end of a half-edge."""
+        return self.origins[self.nexts[edge]]
+
+    def get_face_vertices(self, face):
+        """Get the vertices of a face in counterclockwise order."""
+        first_edge = edge = self.face_edges[face]
+        vertices = []
+        while True:
+            vertices.append(self.origins[edge])
+            edge = self.nexts[edge]
+            if edge == first_edge:
+                return vertices
+
+    def get_face_polygon(self, face):
+        """Get a face as a polygon with the welded vertex positions."""
+        return Polygon([self.get_vertex(v)
+                        for v in self.get_face_vertices(face)])
+
+    def get_face_neighbors(self, face):
+        """Get the faces that share an edge with a face."""
+        first_edge = edge = self.face_edges[face]
+        neighbors = []
+        while True:
+            twin = self.twins[edge]
+            if twin != -1:
+                neighbor = self.edge_faces[twin]
+                if neighbor not in neighbors:
+                    neighbors.append(neighbor)
+            edge = self.nexts[edge]
+            if edge == first_edge:
+                return neighbors
+
+    @property
+    def boundary_edges(self):
+        """The half-edges without twins."""
+        return [e for e in xrange(len(self.origins)) if self.twins[e] == -1]
+
+    @property
+    def boundary_loops(self):
+        """The loops of boundary half-edges, as lists of vertices.
+
+        Loops around the outside of regions are counterclockwise, and loops
+        around holes are clockwise, like the chain shapes of Box2D expect.
+        """
+        outgoing = {}
+        for edge in self.boundary_edges:
+            outgoing.setdefault(self.origins[edge], []).append(edge)
+        loops = []
+        for edges in list(outgoing.values()):
+            while edges:
+                edge = edges.pop()
+                loop = []
+                while True:
+                    loop.append(self.origins[edge])
+                    next_edges = outgoing.get(self.get_destination(edge))
+                    if not next_edges:
+                        break
+                    edge = next_edges.pop()
+                loops.append(loop)
+        return loops
+
+class NavigationMesh(object):
+    """Convex walkable polygons connected by portals, for pathfinding.
+
+    The walkable area is the union of the walkable shapes minus the union of
+    the obstacles. It is triangulated, and the triangles are merged into
+    convex polygons with the Hertel-Mehlhorn algorithm. Paths are found with
+    A* over the polygons, and straightened through the portals with the
+    funnel algorithm.
+
+    See: U{http://digestingduck.blogspot.com/2010/03/simple-stupid-funnel-algorithm.html}
+    """
+
+    def __init__(self, polygons, neighbors):
+        """Initialize a mesh from counterclockwise convex polygons, given as
+        point lists, and the neighbors of each polygon, given as (polygon
+        index, edge index) pairs."""
+        self.polygons = polygons
+        self.neighbors = neighbors
+        self.bounding_boxes = [BoundingBox.from_points(p) for p in polygons]
+        self.centroids = [(sum(x for x, y in p) / len(p),
+                           sum(y for x, y in p) / len(p)) for p in polygons]
+
+    def __repr__(self):
+        return '<NavigationMesh polygons=%i portals=%i>' % (
+            len(self.polygons), sum(len(n) for n in self.neighbors) // 2)
+
+    @classmethod
+    def from_shapes(cls, walkable, obstacles=(), tolerance=0.1):
+        """Create a mesh from walkable shapes and obstacle shapes."""
+        walkable = [_get_rings(s, tolerance) for s in walkable]
+        obstacles = [_get_rings(s, tolerance) for s in obstacles]
+        walkable_count = len(walkable)
+        regions = _overlay(walkable + obstacles, lambda windings: (
+            any(windings[:walkable_count]) and
+            not any(windings[walkable_count:])))
+        triangles = []
+        for outer, holes in regions:
+            triangles.extend(_triangulate(outer, holes))
+        return cls(*_merge_triangles(triangles))
+
+    @classmethod
+    def from_document(cls, document, is_walkable, is_obstacle=None,
+                      tolerance=0.1):
+        """Create a mesh from the shapes of a document, in world coordinates.
+
+        The predicates select the elements with walkable and obstacle
+        shapes.
+        """
+        walkable = []
+        obstacles = []
+        stack = [document.root]
+        while stack:
+            element = stack.pop()
+            stack.extend(reversed(element.children))
+            if element.shape is None:
+                continue
+            if is_walkable(element):
+                walkable.append(element.shape.transform(element.world_matrix))
+            elif is_obstacle is not None and is_obstacle(element):
+                obstacles.append(element.shape.transform(element.world_matrix))
+        return cls.from_shapes(walkable, obstacles, tolerance)
+
+    @classmethod
+    def from_file(cls, file_name, is_walkable, is_obstacle=None,
+                  tolerance=0.1, cache_file_name=None, cache_key=''):
+        """Create a mesh from an SVG file, cached in a file next to it.
+
+        The cache is keyed by a hash of the SVG file, the tolerance, and the
+        cache key, which should change whenever the predicates do. The mesh
+        is only rebuilt when the key changes.
+        """
+        if cache_file_name is None:
+            cache_file_name = file_name + '.navmesh.json'
+        with open(file_name, 'rb') as file_obj:
+            data = file_obj.read()
+        key = hashlib.sha1(data + repr((tolerance, cache_key)).encode(
+            'utf-8')).hexdigest()
+        if os.path.exists(cache_file_name):
+            mesh = cls.load(cache_file_name, key)
+            if mesh is not None:
+                return mesh
+        document = Document(io.BytesIO(data))
+        mesh = cls.from_document(document, is_walkable, is_obstacle,
+                                 tolerance)
+        mesh.save(cache_file_name, key)
+        return mesh
+
+    @classmethod
+    def load(cls, file_name, key=None):
+        """Load a saved mesh, or get None if it was saved with another
+        key."""
+        with open(file_name) as file_obj:
+            data = json.load(file_obj)
+        if key is not None and data.get('key') != key:
+            return None
+        polygons = [[tuple(p) for p in polygon]
+                    for polygon in data['polygons']]
+        neighbors = [[tuple(n) for n in polygon_neighbors]
+                     for polygon_neighbors in data['neighbors']]
+        return cls(polygons, neighbors)
+
+    def save(self, file_name, key=None):
+        """Save the mesh as JSON, with an optional key."""
+        with open(file_name, 'w') as file_obj:
+            json.dump(dict(key=key, polygons=self.polygons,
+                           neighbors=self.neighbors), file_obj)
+
+    def find_polygon(self, x, y):
+        """Get the index of the polygon containing a point, or None."""
+        for i, bounding_box in enumerate(self.bounding_boxes):
+            if (bounding_box.min_x <= x <= bounding_box.max_x and
+                bounding_box.min_y <= y <= bounding_box.max_y and
+                _is_inside_convex(self.polygons[i], x, y)):
+                return i
+        return None
+
+    def find_path(self, start, goal):
+        """Find a shortest path between two points, as a list of points, or
+        get None if there is none."""
+        start_polygon = self.find_polygon(*start)
+        goal_polygon = self.find_polygon(*goal)
+        if start_polygon is None or goal_polygon is None:
+            return None
+        portals = self._find_portals(start_polygon, goal_polygon, start, goal)
+        if portals is None:
+            return None
+        return _pull_string([(start, start)] + portals + [(goal, goal)])
+
+    def _find_portals(self, start_polygon, goal_polygon, start, goal):
+        """Find the portals crossed on the way between two polygons with
+        A*, as (left, right) point pairs."""
+        costs = {start_polygon: 0.0}
+        positions = {start_polygon: start}
+        previous = {start_polygon: None}
+        queue = [(0.0, start_polygon)]
+        while queue:
+            _, polygon = heapq.heappop(queue)
+            if polygon == goal_polygon:
+                break
+            x1, y1 = positions[polygon]
+            points = self.polygons[polygon]
+            for neighbor, edge in self.neighbors[polygon]:
+                (px, py), (qx, qy) = points[edge], points[(edge + 1) %
+                                                          len(points)]
+                x2, y2 = 0.5 * (px + qx), 0.5 * (py + qy)
+                cost = costs[polygon] + math.hypot(x2 - x1, y2 - y1)
+                if neighbor not in costs or cost < costs[neighbor]:
+                    costs[neighbor] = cost
+                    positions[neighbor] = x2, y2
+                    previous[neighbor] = polygon, edge
+                    heuristic = math.hypot(goal[0] - x2, goal[1] - y2)
+                    heapq.heappush(queue, (cost + heuristic, neighbor))
+        else:
+            return None
+        portals = []
+        polygon = goal_polygon
+        while previous[polygon] is not None:
+            polygon, edge = previous[polygon]
+            points = self.polygons[polygon]
+            # Leaving a counterclockwise polygon, the end of the edge is on
+            # the left.
+            portals.append((points[(edge + 1) % len(points)], points[edge]))
+        portals.reverse()
+        return portals
+
+def _get_cross(a, b, c):
+    """Get the cross product of the vectors from a to b and from a to c."""
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+def _is_inside_convex(points, x, y):
+    point = x, y
+    return all(_get_cross(points[i - 1], points[i], point) >= 0.0
+               for i in xrange(len(points)))
+
+def _pull_string(portals):
+    """Straighten a path through portals with the funnel algorithm."""
+    apex = left = right = portals[0][0]
+    apex_index = left_index = right_index = 0
+    path = [apex]
+    i = 1
+    while i < len(portals):
+        new_left, new_right = portals[i]
+        if _get_cross(apex, right, new_right) >= 0.0:
+            if apex == right or _get_cross(apex, left, new_right) < 0.0:
+                right, right_index = new_right, i
+            else:
+                # The right side crossed the left side, so the left side
+                # becomes the new apex.
+                apex = right = left
+                apex_index = right_index = left_index
+                path.append(apex)
+                i = apex_index + 1
+                continue
+        if _get_cross(apex, left, new_left) <= 0.0:
+            if apex == left or _get_cross(apex, right, new_left) > 0.0:
+                left, left_index = new_left, i
+            else:
+                apex = left = right
+                apex_index = left_index = right_index
+                path.append(apex)
+                i = apex_index + 1
+                continue
+        i += 1
+    if path[-1] != portals[-1][0]:
+        path.append(portals[-1][0])
+    return path
+
+def _triangulate(outer, holes):
+    """Triangulate a counterclockwise polygon with clockwise holes by ear
+    clipping, after bridging the holes into the outer ring.
+
+    See: U{http://www.geometrictools.com/Documentation/TriangulationByEarClipping.pdf}
+    """
+    points = list(outer)
+    for hole in sorted(holes, key=lambda h: -max(x for x, y in h)):
+        points = _bridge_hole(points, hole)
+    return _clip_ears(points)
+
+def _bridge_hole(points, hole):
+    """Merge a hole into a polygon through a bridge to a visible vertex."""
+    m = max(xrange(len(hole)), key=lambda i: hole[i][0])
+    mx, my = hole[m]
+    # Cast a ray to the right, and find the closest edge that it hits.
+    hit_x, hit_edge = float('inf'), None
+    for i in xrange(len(points)):
+        (px, py), (qx, qy) = points[i], points[(i + 1) % len(points)]
+        if (py - my) * (qy - my) > 0.0 or py == qy:
+            continue
+        x = px + (my - py) * (qx - px) / (qy - py)
+        if mx <= x < hit_x:
+            hit_x, hit_edge = x, i
+    if hit_edge is None:
+        return points
+    i, j = hit_edge, (hit_edge + 1) % len(points)
+    visible = i if points[i][0] > points[j][0] else j
+    # Reflex vertices inside the triangle between the hole vertex, the hit
+    # point and the candidate can block the view. The blocking vertex with
+    # the smallest angle to the ray is visible.
+    m_point, hit_point, candidate = (mx, my), (hit_x, my), points[visible]
+    if _get_cross(m_point, hit_point, candidate) < 0.0:
+        triangle = m_point, candidate, hit_point
+    else:
+        triangle = m_point, hit_point, candidate
+    best = None
+    for k, point in enumerate(points):
+        if (k == visible or point == candidate or
+            _get_cross(points[k - 1], point,
+                       points[(k + 1) % len(points)]) >= 0.0 or
+            not _is_inside_convex(triangle, *point)):
+            continue
+        key = (abs(math.atan2(point[1] - my, point[0] - mx)),
+               math.hypot(point[0] - mx, point[1] - my))
+        if best is None or key < best[0]:
+            best = key, k
+    if best is not None:
+        visible = best[1]
+    # Vertices with earlier bridges have several copies, and the bridge
+    # must start from the copy whose interior angle contains it.
+    for k, point in enumerate(points):
+        if point == points[visible] and _is_in_wedge(
+                points[k - 1], point, points[(k + 1) % len(points)], m_point):
+            visible = k
+            break
+    return (points[:visible + 1] + hole[m:] + hole[:m + 1] +
+            points[visible:])
+
+def _is_in_wedge(previous, vertex, following, point):
+    """Is a point inside the interior angle of a counterclockwise polygon at
+    a vertex?"""
+    outgoing = _get_cross(vertex, following, point) >= 0.0
+    incoming = _get_cross(vertex, point, previous) >= 0.0
+    if _get_cross(previous, vertex, following) >= 0.0:
+        return outgoing and incoming
+    return outgoing or incoming
+
+def _clip_ears(points):
+    """Triangulate a weakly simple counterclockwise polygon by clipping
+    ears."""
+    count = len(points)
+    if count < 3:
+        return []
+    previous = [(i - 1) % count for i in xrange(count)]
+    following = [(i + 1) % count for i in xrange(count)]
+
+    def is_reflex(i):
+        return _get_cross(points[previous[i]], points[i],
+                          points[following[i]]) <= 0.0
+
+    reflex = set(i for i in xrange(count) if is_reflex(i))
+    triangles = []
+    i = 0
+    misses = 0
+    while count > 3:
+        a, b, c = previous[i], i, following[i]
+        triangle = points[a], points[b], points[c]
+        ear = i not in reflex or misses > count
+        if ear and misses <= count:
+            for k in reflex:
+                if (k not in (a, b, c) and points[k] not in triangle and
+                    _is_inside_convex(triangle, *points[k])):
+                    ear = False
+                    break
+        if not ear:
+            i = c
+            misses += 1
+            continue
+        if abs(_get_cross(*triangle)) > 0.0:
+            triangles.append(triangle)
+        following[a], previous[c] = c, a
+        reflex.discard(b)
+        count -= 1
+        for k in (a, c):
+            if is_reflex(k):
+                reflex.add(k)
+            else:
+                reflex.discard(k)
+        i = a
+        misses = 0
+    triangle = points[previous[i]], points[i], points[following[i]]
+    if abs(_get_cross(*triangle)) > 0.0:
+        triangles.append(triangle)
+    return triangles
+
+def _merge_triangles(triangles):
+    """Merge triangles into convex polygons by removing diagonals, with the
+    Hertel-Mehlhorn algorithm, and find the neighbors of each polygon."""
+    polygons = [list(t) for t in triangles]
+    edges = {}
+    for i, polygon in enumerate(polygons):
+        for k in xrange(3):
+            edges[polygon[k], polygon[(k + 1) % 3]] = i
+    alive = [True] * len(polygons)
+    for i in xrange(len(polygons)):
+        merged = alive[i]
+        while merged:
+            merged = False
+            polygon = polygons[i]
+            for k in xrange(len(polygon)):
+                p, q = polygon[k], polygon[(k + 1) % len(polygon)]
+                j = edges.get((q, p))
+                if j is None or j == i:
+                    continue
+                other = polygons[j]
+                start = other.index(p)
+                # The other polygon from p around to q.
+                arc = other[start:] + other[:start]
+                # This polygon from q around to p, then the other one.
+                candidate = polygon[k + 1:] + polygon[:k + 1] + arc[1:-1]
+                n = len(candidate)
+                pi = len(polygon) - 1
+                qi = 0
+                if (_get_cross(candidate[pi - 1], candidate[pi],
+                               candidate[(pi + 1) % n]) < 0.0 or
+                    _get_cross(candidate[qi - 1], candidate[qi],
+                               candidate[(qi + 1) % n]) < 0.0):
+                    continue
+                del edges[p, q], edges[q, p]
+                for l in xrange(len(other)):
+                    edge = other[l], other[(l + 1) % len(other)]
+                    if edge in edges:
+                        edges[edge] = i
+                polygons[i] = candidate
+                alive[j] = False
+                merged = True
+                break
+    indices = {}
+    for i in xrange(len(polygons)):
+        if alive[i]:
+            indices[i] = len(indices)
+    result = [polygons[i] for i in xrange(len(polygons)) if alive[i]]
+    neighbors = []
+    for polygon in result:
+        polygon_neighbors = []
+        for k in xrange(len(polygon)):
+            j = edges.get((polygon[(k + 1) % len(polygon)], polygon[k]))
+            if j is not None:
+                polygon_neighbors.append((indices[j], k))
+        neighbors.append(polygon_neighbors)
+    return result, neighbors
+
+class CollisionSet(object):
+    """Shapes for batched point containment and segment intersection
+    queries, such as for particles and bullets.
+
+    Circles are tested exactly. Other shapes are flattened within the
+    tolerance into edges, with open outlines closed as when filling them,
+    so that polygons and rects without rounded corners are also exact. The
+    queries take sequences of coordinates, and are vectorized with numpy if
+    it is available, in which case they return numpy arrays instead of
+    lists.
+    """
+
+    def __init__(self, shapes=(), tolerance=0.1):
+        """Initialize a set from shapes in world coordinates."""
+        self.tolerance = tolerance
+        self.shapes = []
+        self.keys = []
+        self.bounds = array('d')
+        self.circles = array('d')
+        self.circle_rows = array('l')
+        self.edges = array('d')
+        self.edge_offsets = array('l', [0])
+        self._edge_bands = None
+        for shape in shapes:
+            self.add(shape)
+
+    def __len__(self):
+        """Get the number of shapes."""
+        return len(self.shapes)
+
+    def __repr__(self):
+        return '<CollisionSet shapes=%i circles=%i edges=%i>' % (
+            len(self.shapes), len(self.circles) // 3, len(self.edges) // 4)
+
+    def add(self, shape, key=None):
+        """Add a shape with an optional key, and get its index."""
+        index = len(self.shapes)
+        self.shapes.append(shape)
+        self.keys.append(key)
+        if isinstance(shape, Circle):
+            bounding_box = shape.bounding_box
+            self.circle_rows.append(len(self.circles) // 3)
+            self.circles.extend((shape.cx, shape.cy, shape.r))
+        else:
+            # The bounding boxes of paths only cover their control points,
+            # and arcs can bulge out of them, so use the edges instead.
+            bounding_box = BoundingBox()
+            self.circle_rows.append(-1)
+            for basic_shape in shape.flatten(self.tolerance):
+                if isinstance(basic_shape, Line):
+                    points = [basic_shape.p1, basic_shape.p2]
+                else:
+                    points = list(basic_shape.points)
+                    if len(points) >= 2 and points[0] == points[-1]:
+                        points.pop()
+                for i in xrange(len(points)):
+                    x1, y1 = points[i - 1]
+                    x2, y2 = points[i]
+                    self.edges.extend((x1, y1, x2, y2))
+                    bounding_box.add_point(x2, y2)
+        self.bounds.extend((bounding_box.min_x, bounding_box.min_y,
+                            bounding_box.max_x, bounding_box.max_y))
+        self.edge_offsets.append(len(self.edges) // 4)
+        self._edge_bands = None
+        return index
+
+    def contains(self, xs, ys, fill_rule='nonzero'):
+        """Get the index of the first shape that contains each point, or -1
+        if no shape contains it.
+
+        The fill rule is C{'nonzero'} or C{'evenodd'}, and applies to each
+        shape separately.
+
+        See: U{http://www.w3.org/TR/SVG/painting.html#FillRuleProperty}
+        """
+        if fill_rule not in ('nonzero', 'evenodd'):
+            raise ValueError('invalid fill rule: %r' % fill_rule)
+        even_odd = fill_rule == 'evenodd'
+        if numpy is not None:
+            return self._contains_numpy(xs, ys, even_odd)
+        return [self._contains_point(x, y, even_odd)
+                for x, y in zip(xs, ys)]
+
+    def intersect_segments(self, x1s, y1s, x2s, y2s):
+        """Find the first intersection of each segment with the shapes.
+
+        Returns the shape indices, the x and y coordinates of the hit
+        points, and the x and y components of the unit normals at the hit
+        points, which face against the segments. The shape index is -1 and
+        the coordinates are NaN for segments that miss.
+        """
+        if numpy is not None:
+            x1s = numpy.asarray(x1s, dtype=float)
+            y1s = numpy.asarray(y1s, dtype=float)
+            return self._intersect_numpy(
+                x1s, y1s, numpy.asarray(x2s, dtype=float) - x1s,
+                numpy.asarray(y2s, dtype=float) - y1s, 1.0)
+        return self._intersect(x1s, y1s, [x2 - x1 for x1, x2 in zip(x1s, x2s)],
+                               [y2 - y1 for y1, y2 in zip(y1s, y2s)], 1.0)
+
+    def intersect_rays(self, xs, ys, dxs, dys):
+        """Find the first intersection of each ray with the shapes, given
+        the origins and directions of the rays.
+
+        Returns the same as L{intersect_segments}.
+        """
+        if numpy is not None:
+            return self._intersect_numpy(numpy.asarray(xs, dtype=float),
+                                         numpy.asarray(ys, dtype=float),
+                                         numpy.asarray(dxs, dtype=float),
+                                         numpy.asarray(dys, dtype=float),
+                                         float('inf'))
+        return self._intersect(xs, ys, dxs, dys, float('inf'))
+
+    def _contains_point(self, x, y, even_odd):
+        bounds = self.bounds
+        edges = self.edges
+        for index in xrange(len(self.shapes)):
+            if not (bounds[4 * index] <= x <= bounds[4 * index + 2] and
+                    bounds[4 * index + 1] <= y <= bounds[4 * index + 3]):
+                continue
+            row = self.circle_rows[index]
+            if row != -1:
+                cx, cy, r = self.circles[3 * row:3 * row + 3]
+                if (x - cx) ** 2 + (y - cy) ** 2 < r * r:
+                    return index
+                continue
+            winding = 0
+            for i in xrange(4 * self.edge_offsets[index],
+                            4 * self.edge_offsets[index + 1], 4):
+                x1, y1, x2, y2 = edges[i:i + 4]
+                if y1 <= y:
+                    if (y2 > y and
+                        (x2 - x1) * (y - y1) - (x - x1) * (y2 - y1) > 0.0):
+                        winding += 1
+                elif (y2 <= y and
+                      (x2 - x1) * (y - y1) - (x - x1) * (y2 - y1) < 0.0):
+                    winding -= 1
+            if winding % 2 if even_odd else winding:
+                return index
+        return -1
+
+    def _contains_numpy(self, xs, ys, even_odd):
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        count = len(self.shapes)
+        result = numpy.full(len(xs), count, dtype=numpy.intp)
+        if not count:
+            return result - 1
+        bounds = _get_columns(self.bounds, 4)
+        circles = _get_columns(self.circles, 3)
+        circle_rows = numpy.frombuffer(self.circle_rows, dtype='l')
+        edges = _get_columns(self.edges, 4)
+        band_offsets, band_edges = self._get_edge_bands()
+        # Pair the points with the shapes whose bounding boxes contain them,
+        # a block of points at a time, and then with the edges in the band
+        # of each shape that they are in, a block of pairs at a time, to
+        # bound the memory use.
+        block_size = max(1, (1 << 20) // count)
+        for start in xrange(0, len(xs), block_size):
+            bxs = xs[start:start + block_size, None]
+            bys = ys[start:start + block_size, None]
+            points, shapes = numpy.nonzero(
+                (bxs >= bounds[:, 0]) & (bxs <= bounds[:, 2]) &
+                (bys >= bounds[:, 1]) & (bys <= bounds[:, 3]))
+            pxs, pys = bxs[points, 0], bys[points, 0]
+            inside = numpy.zeros(len(points), dtype=bool)
+            rows = circle_rows[shapes]
+            is_circle = rows >= 0
+            cxs, cys, rs = circles[rows[is_circle]].T
+            inside[is_circle] = ((pxs[is_circle] - cxs) ** 2 +
+                                 (pys[is_circle] - cys) ** 2 < rs * rs)
+            others = numpy.nonzero(~is_circle)[0]
+            bands = self._get_band_indices(pys[others], shapes[others])
+            starts = band_offsets[bands]
+            counts = band_offsets[bands + 1] - starts
+            windings = numpy.zeros(len(others))
+            for first, last in _get_blocks(counts, 1 << 18):
+                pairs, indices = _get_range_items(starts[first:last],
+                                                  counts[first:last])
+                x1s, y1s, x2s, y2s = edges[band_edges[indices]].T
+                exs = pxs[others[first:last]][pairs]
+                eys = pys[others[first:last]][pairs]
+                sides = (x2s - x1s) * (eys - y1s) - (exs - x1s) * (y2s - y1s)
+                ups = (y1s <= eys) & (y2s > eys) & (sides > 0.0)
+                downs = (y1s > eys) & (y2s <= eys) & (sides < 0.0)
+                windings[first:last] += numpy.bincount(
+                    pairs, ups.astype(float) - downs.astype(float),
+                    last - first)
+            windings = windings.round().astype(int)
+            if even_odd:
+                inside[others] = windings % 2 == 1
+            else:
+                inside[others] = windings != 0
+            numpy.minimum.at(result, start + points[inside], shapes[inside])
+        result[result == count] = -1
+        return result
+
+    def _intersect(self, xs, ys, dxs, dys, t_max):
+        indices = []
+        hit_xs, hit_ys, normal_xs, normal_ys = [], [], [], []
+        nan = float('nan')
+        bounds = self.bounds
+        edges = self.edges
+        for x, y, dx, dy in zip(xs, ys, dxs, dys):
+            end_x = x if dx == 0.0 else x + dx * t_max
+            end_y = y if dy == 0.0 else y + dy * t_max
+            min_x, max_x = min(x, end_x), max(x, end_x)
+            min_y, max_y = min(y, end_y), max(y, end_y)
+            best_t, best_index, best_normal = t_max, -1, None
+            for index in xrange(len(self.shapes)):
+                if (bounds[4 * index] > max_x or bounds[4 * index + 2] < min_x or
+                    bounds[4 * index + 1] > max_y or
+                    bounds[4 * index + 3] < min_y):
+                    continue
+                row = self.circle_rows[index]
+                if row != -1:
+                    cx, cy, r = self.circles[3 * row:3 * row + 3]
+                    ox, oy = x - cx, y - cy
+                    a = dx * dx + dy * dy
+                    b = ox * dx + oy * dy
+                    discriminant = b * b - a * (ox * ox + oy * oy - r * r)
+                    if a == 0.0 or discriminant < 0.0:
+                        continue
+                    root = math.sqrt(discriminant)
+                    t = (-b - root) / a
+                    if t < 0.0:
+                        t = (-b + root) / a
+                    if 0.0 <= t <= best_t and (t < best_t or best_index == -1):
+                        best_t, best_index = t, index
+                        best_normal = ((ox + t * dx) / r, (oy + t * dy) / r)
+                    continue
+                for i in xrange(4 * self.edge_offsets[index],
+                                4 * self.edge_offsets[index + 1], 4):
+                    x1, y1, x2, y2 = edges[i:i + 4]
+                    ex, ey = x2 - x1, y2 - y1
+                    denominator = dx * ey - dy * ex
+                    if denominator == 0.0:
+                        continue
+                    wx, wy = x1 - x, y1 - y
+                    t = (wx * ey - wy * ex) / denominator
+                    u = (wx * dy - wy * dx) / denominator
+                    if (0.0 <= u <= 1.0 and 0.0 <= t <= best_t and
+                        (t < best_t or best_index == -1)):
+                        length = math.hypot(ex, ey)
+                        best_t, best_index = t, index
+                        best_normal = ey / length, -ex / length
+            indices.append(best_index)
+            if best_index == -1:
+                hit_xs.append(nan)
+                hit_ys.append(nan)
+                normal_xs.append(nan)
+                normal_ys.append(nan)
+                continue
+            nx, ny = best_normal
+            if nx * dx + ny * dy > 0.0:
+                nx, ny = -nx, -ny
+            hit_xs.append(x + best_t * dx)
+            hit_ys.append(y + best_t * dy)
+            normal_xs.append(nx)
+            normal_ys.append(ny)
+        return indices, hit_xs, hit_ys, normal_xs, normal_ys
+
+    def _intersect_numpy(self, xs, ys, dxs, dys, t_max):
+        count = len(self.shapes)
+        indices = numpy.full(len(xs), -1, dtype=numpy.intp)
+        ts = numpy.full(len(xs), numpy.nan)
+        normal_xs = numpy.full(len(xs), numpy.nan)
+        normal_ys = numpy.full(len(xs), numpy.nan)
+        if not count:
+            return indices, ts, ts.copy(), normal_xs, normal_ys
+        bounds = _get_columns(self.bounds, 4)
+        circles = _get_columns(self.circles, 3)
+        circle_rows = numpy.frombuffer(self.circle_rows, dtype='l')
+        edges = _get_columns(self.edges, 4)
+        band_offsets, band_edges = self._get_edge_bands()
+        with numpy.errstate(invalid='ignore'):
+            end_xs = numpy.where(dxs == 0.0, xs, xs + dxs * t_max)
+            end_ys = numpy.where(dys == 0.0, ys, ys + dys * t_max)
+        def keep_nearest(segments, shapes, hit_ts, hit_nxs, hit_nys):
+            order = numpy.lexsort((shapes, hit_ts, segments))
+            sorted_segments = segments[order]
+            first = order[numpy.concatenate([
+                [True], sorted_segments[1:] != sorted_segments[:-1]])[
+                    :len(order)]]
+            segments, shapes = segments[first], shapes[first]
+            hit_ts = hit_ts[first]
+            # Ties go to the lower shape index, as in the pure version.
+            current = ts[segments]
+            with numpy.errstate(invalid='ignore'):
+                nearer = (numpy.isnan(current) | (hit_ts < current) |
+                          ((hit_ts == current) &
+                           (shapes < indices[segments])))
+            segments = segments[nearer]
+            indices[segments] = shapes[nearer]
+            ts[segments] = hit_ts[nearer]
+            normal_xs[segments] = hit_nxs[first][nearer]
+            normal_ys[segments] = hit_nys[first][nearer]
+        # Pair the segments with the shapes whose bounding boxes they
+        # overlap, a block of segments at a time, and then with the edges in
+        # the bands of each shape that they span, a block of pairs at a time,
+        # to bound the memory use. Edges in several bands may be paired with
+        # a segment more than once, which does not change the nearest hit.
+        block_size = max(1, (1 << 20) // count)
+        for start in xrange(0, len(xs), block_size):
+            stop = start + block_size
+            bxs, bys = xs[start:stop, None], ys[start:stop, None]
+            bexs, beys = end_xs[start:stop, None], end_ys[start:stop, None]
+            segments, shapes = numpy.nonzero(
+                (numpy.minimum(bxs, bexs) <= bounds[:, 2]) &
+                (numpy.maximum(bxs, bexs) >= bounds[:, 0]) &
+                (numpy.minimum(bys, beys) <= bounds[:, 3]) &
+                (numpy.maximum(bys, beys) >= bounds[:, 1]))
+            segments += start
+            # Intersect with the circles.
+            rows = circle_rows[shapes]
+            is_circle = rows >= 0
+            circle_segments = segments[is_circle]
+            cxs, cys, rs = circles[rows[is_circle]].T
+            oxs = xs[circle_segments] - cxs
+            oys = ys[circle_segments] - cys
+            cdxs, cdys = dxs[circle_segments], dys[circle_segments]
+            a = cdxs * cdxs + cdys * cdys
+            b = oxs * cdxs + oys * cdys
+            discriminants = b * b - a * (oxs * oxs + oys * oys - rs * rs)
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                roots = numpy.sqrt(numpy.maximum(discriminants, 0.0))
+                circle_ts = (-b - roots) / a
+                circle_ts = numpy.where(circle_ts >= 0.0, circle_ts,
+                                        (-b + roots) / a)
+                circle_nxs = (oxs + circle_ts * cdxs) / rs
+                circle_nys = (oys + circle_ts * cdys) / rs
+            circle_hits = ((a > 0.0) & (discriminants >= 0.0) &
+                           (circle_ts >= 0.0) & (circle_ts <= t_max))
+            keep_nearest(circle_segments[circle_hits],
+                         shapes[is_circle][circle_hits],
+                         circle_ts[circle_hits], circle_nxs[circle_hits],
+                         circle_nys[circle_hits])
+            # Intersect with the edges.
+            segments = segments[~is_circle]
+            shapes = shapes[~is_circle]
+            firsts = self._get_band_indices(
+                numpy.minimum(ys[segments], end_ys[segments]), shapes)
+            lasts = self._get_band_indices(
+                numpy.maximum(ys[segments], end_ys[segments]), shapes)
+            starts = band_offsets[firsts]
+            counts = band_offsets[lasts + 1] - starts
+            for first, last in _get_blocks(counts, 1 << 18):
+                pairs, edge_indices = _get_range_items(starts[first:last],
+                                                       counts[first:last])
+                pairs += first
+                edge_segments = segments[pairs]
+                x1s, y1s, x2s, y2s = edges[band_edges[edge_indices]].T
+                exs, eys = x2s - x1s, y2s - y1s
+                edxs, edys = dxs[edge_segments], dys[edge_segments]
+                wxs = x1s - xs[edge_segments]
+                wys = y1s - ys[edge_segments]
+                denominators = edxs * eys - edys * exs
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    edge_ts = (wxs * eys - wys * exs) / denominators
+                    us = (wxs * edys - wys * edxs) / denominators
+                    lengths = numpy.hypot(exs, eys)
+                    edge_nxs, edge_nys = eys / lengths, -exs / lengths
+                edge_hits = ((denominators != 0.0) & (edge_ts >= 0.0) &
+                             (edge_ts <= t_max) & (us >= 0.0) & (us <= 1.0))
+                keep_nearest(edge_segments[edge_hits],
+                             shapes[pairs][edge_hits], edge_ts[edge_hits],
+                             edge_nxs[edge_hits], edge_nys[edge_hits])
+        with numpy.errstate(invalid='ignore'):
+            flip = normal_xs * dxs + normal_ys * dys > 0.0
+        normal_xs[flip] = -normal_xs[flip]
+        normal_ys[flip] = -normal_ys[flip]
+        return (indices, xs + ts * dxs, ys + ts * dys, normal_xs,
+                normal_ys)
+
+    def _get_edge_bands(self):
+        """Sort the edges of each shape into horizontal bands of its
+        bounding box, on first use after shapes are added.
+
+        Returns the offsets of the bands into the edge indices, with one
+        more offset at the end, and the edge indices. Each edge is in every
+        band that it spans.
+        """
+        if self._edge_bands is None:
+            bounds = _get_columns(self.bounds, 4)
+            edges = _get_columns(self.edges, 4)
+            edge_counts = numpy.diff(numpy.frombuffer(self.edge_offsets,
+                                                      dtype='l'))
+            # The square root of the edge count keeps the bands short for
+            # typical outlines, and the number of band entries below the
+            # edge count to the power of 1.5 when every edge spans the shape.
+            band_counts = numpy.sqrt(edge_counts).astype(numpy.intp)
+            band_counts = numpy.maximum(band_counts, 1)
+            heights = bounds[:, 3] - bounds[:, 1]
+            scales = band_counts / numpy.where(heights > 0.0, heights, 1.0)
+            self._edge_bands = (numpy.cumsum(band_counts) - band_counts,
+                                band_counts, scales)
+            shapes = numpy.repeat(numpy.arange(len(edge_counts)),
+                                  edge_counts)
+            min_ys = numpy.minimum(edges[:, 1], edges[:, 3])
+            max_ys = numpy.maximum(edges[:, 1], edges[:, 3])
+            firsts = self._get_band_indices(min_ys, shapes)
+            spans = self._get_band_indices(max_ys, shapes) - firsts + 1
+            owners, bands = _get_range_items(firsts, spans)
+            order = numpy.argsort(bands, kind='mergesort')
+            offsets = numpy.zeros(band_counts.sum() + 1, dtype=numpy.intp)
+            numpy.cumsum(numpy.bincount(bands, minlength=len(offsets) - 1),
+                         out=offsets[1:])
+            self._edge_bands += (offsets, owners[order])
+        return self._edge_bands[3:]
+
+    def _get_band_indices(self, ys, shapes):
+        """Get the indices of the bands of the shapes that the y coordinates
+        are in, clamped to the bounding boxes of the shapes."""
+        starts, band_counts, scales = self._edge_bands[:3]
+        bounds = _get_columns(self.bounds, 4)
+        ys = numpy.clip(ys, bounds[shapes, 1], bounds[shapes, 3])
+        bands = numpy.minimum((ys - bounds[shapes, 1]) * scales[shapes],
+                              band_counts[shapes] - 1)
+        return starts[shapes] + bands.astype(numpy.intp)
+
+    @classmethod
+    def from_shapes(cls, shapes, matrix=None, tolerance=0.1):
+        """Create a set from shapes with a common matrix."""
+        collision_set = cls(tolerance=tolerance)
+        for shape in shapes:
+            if matrix is not None:
+                shape = shape.transform(matrix)
+            collision_set.add(shape)
+        return collision_set
+
+    @classmethod
+    def from_document(cls, document, predicate=None, tolerance=0.1):
+        """Create a set from the shapes of a document in world coordinates,
+        with the elements as keys.
+
+        If a predicate is given, only the shapes of elements for which it
+        returns true are added.
+        """
+        collision_set = cls(tolerance=tolerance)
+        stack = [document.root]
+        while stack:
+            element = stack.pop()
+            if (element.shape is not None and
+                (predicate is None or predicate(element))):
+                collision_set.add(element.shape.transform(
+                    element.world_matrix), element)
+            stack.extend(reversed(element.children))
+        return collision_set
+
+def _get_columns(values, column_count):
+    """Get a flat typed array as a numpy array with the given number of
+    columns, without copying it."""
+    if not values:
+        return numpy.zeros((0, column_count), dtype=values.typecode)
+    return numpy.frombuffer(values, dtype=values.typecode).reshape(
+        -1, column_count)
+
+def _get_range_items(starts, counts):
+    """Expand ranges of indices, given their starts and lengths, into their
+    items. Returns the index of the range and the index for each item."""
+    ranges = numpy.repeat(numpy.arange(len(starts)), counts)
+    firsts = numpy.cumsum(counts) - counts
+    return ranges, starts[ranges] + numpy.arange(len(ranges)) - firsts[ranges]
+
+def _get_blocks(counts, size):
+    """Split a sequence of counts into consecutive blocks whose counts add
+    up to at most the size, except for single counts larger than it.
+    Returns the start and stop index of each block."""
+    totals = numpy.cumsum(counts)
+    blocks = []
+    start = 0
+    while start < len(counts):
+        total = totals[start - 1] if start else 0
+        stop = int(numpy.searchsorted(totals, total + size, 'right'))
+        blocks.append((start, max(stop, start + 1)))
+        start = blocks[-1][1]
+    return blocks
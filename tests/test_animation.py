@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+LAYERS_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg"
+    xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape">
+  <defs>
+    <linearGradient id="gradient"/>
+  </defs>
+  <g id="layer1" inkscape:groupmode="layer" inkscape:label="Start">
+    <rect id="rect1" inkscape:label="box" style="fill:orange"
+          x="0" y="0" width="2" height="2"/>
+    <circle id="circle1" style="fill:url(#gradient);stroke:black"
+            cx="0" cy="0" r="1"/>
+    <path id="path1" style="fill:currentColor;color:#ff0000"
+          d="M 0 0 L 1 0 L 1 1 Z"/>
+  </g>
+  <g id="layer2" inkscape:groupmode="layer" inkscape:label="End">
+    <circle id="circle2" style="fill:url(#gradient);stroke:white"
+            cx="10" cy="0" r="1"/>
+    <path id="path2" style="fill:currentColor;color:#0000ff"
+          transform="rotate(90)" d="M 0 0 L 1 0 L 1 1 Z"/>
+    <rect id="rect2" inkscape:label="box" style="fill:orange"
+          transform="translate(4, 0)" x="0" y="0" width="2" height="2"/>
+  </g>
+</svg>
+'''
+
+def get_document(data):
+    return pinky.Document(io.BytesIO(data))
+
+def keyframe_data(x, angle, fill):
+    return (u'''<svg xmlns="http://www.w3.org/2000/svg">
+  <rect id="box" style="fill:%s" transform="translate(%g, 0) rotate(%g)"
+        x="0" y="0" width="2" height="2"/>
+  <circle id="extra" r="1"/>
+</svg>
+''' % (fill, x, angle)).encode('utf-8')
+
+class AnimationTest(unittest.TestCase):
+    def assertSequenceAlmostEqual(self, values, expected):
+        values = list(values)
+        self.assertEqual(len(values), len(expected))
+        for value, expected_value in zip(values, expected):
+            self.assertAlmostEqual(value, expected_value)
+
+    def test_layers_of_one_document(self):
+        document = get_document(LAYERS_DATA)
+        animation = pinky.Animation.from_layers(document, ['Start', 'End'])
+        self.assertEqual(animation.ids, ['box', 0, 1])
+        matrices, colors, vertices = animation.evaluate(0.5)
+        self.assertSequenceAlmostEqual(matrices[0:6],
+                                       (1.0, 0.0, 0.0, 1.0, 2.0, 0.0))
+        self.assertSequenceAlmostEqual(matrices[6:12],
+                                       (1.0, 0.0, 0.0, 1.0, 0.0, 0.0))
+        cos_angle = sin_angle = 0.5 ** 0.5
+        self.assertSequenceAlmostEqual(
+            matrices[12:18], (cos_angle, sin_angle, -sin_angle, cos_angle,
+                              0.0, 0.0))
+        self.assertSequenceAlmostEqual(colors[0:8], (1.0, 165 / 255.0, 0.0,
+                                                     1.0, 0.0, 0.0, 0.0, 0.0))
+        self.assertSequenceAlmostEqual(colors[8:16], (0.0, 0.0, 0.0, 0.0,
+                                                      0.5, 0.5, 0.5, 1.0))
+        self.assertSequenceAlmostEqual(colors[16:20], (0.5, 0.0, 0.5, 1.0))
+        start, stop = animation.vertex_offsets[1], animation.vertex_offsets[2]
+        xs = list(vertices[2 * start:2 * stop:2])
+        # The circle moves in its own coordinates.
+        self.assertTrue(abs(min(xs) - 4.0) < 0.2)
+        self.assertTrue(abs(max(xs) - 6.0) < 0.2)
+
+    def test_documents(self):
+        documents = [get_document(keyframe_data(0.0, 170.0, 'red')),
+                     get_document(keyframe_data(10.0, -170.0, 'blue')),
+                     get_document(keyframe_data(20.0, -170.0, 'blue'))]
+        animation = pinky.Animation.from_documents(documents, [0.0, 1.0, 3.0])
+        self.assertEqual(animation.ids, ['box', 'extra'])
+        matrices, colors, vertices = animation.evaluate(0.5)
+        expected = pinky.Matrix.create_translate(5.0, 0.0) * \
+            pinky.Matrix.create_rotate(180.0)
+        self.assertSequenceAlmostEqual(matrices[0:6], expected.abcdef)
+        self.assertSequenceAlmostEqual(colors[0:4], (0.5, 0.0, 0.5, 1.0))
+        matrices, colors, vertices = animation.evaluate(2.0)
+        self.assertAlmostEqual(matrices[4], 15.0)
+        self.assertAlmostEqual(animation.evaluate(-1.0)[0][4], 0.0)
+        self.assertAlmostEqual(animation.evaluate(9.0)[0][4], 20.0)
+
+    def test_numpy_parity(self):
+        if pinky.numpy is None:
+            return
+        numpy = pinky.numpy
+        document = get_document(LAYERS_DATA)
+        results = []
+        for module in [numpy, None]:
+            pinky.numpy = module
+            try:
+                animation = pinky.Animation.from_layers(document,
+                                                        ['Start', 'End'])
+                results.append([list(values)
+                                for values in animation.evaluate(0.25)])
+            finally:
+                pinky.numpy = numpy
+        for values, pure_values in zip(*results):
+            self.assertSequenceAlmostEqual(values, pure_values)
+
+    def test_invalid_match(self):
+        document = get_document(LAYERS_DATA)
+        self.assertRaises(ValueError, pinky.Animation, document.layers,
+                          match='class')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+class PerimeterTest(unittest.TestCase):
+    def test_subpath(self):
+        subpath, = pinky.Path.from_string('M 0 0 L 3 0 L 3 4 Z').subpaths
+        self.assertAlmostEqual(subpath.perimeter, 12.0)
+        subpath, = pinky.Path.from_string(
+            'M 10 0 A 10 10 0 0 1 -10 0').subpaths
+        self.assertAlmostEqual(subpath.perimeter, 10.0 * math.pi, 4)
+
+    def test_subpath_bounding_box(self):
+        subpath, = pinky.Path.from_string('M 0 0 C 1 5 4 -5 5 1').subpaths
+        box = subpath.bounding_box
+        self.assertEqual((box.min_x, box.min_y, box.max_x, box.max_y),
+                         (0.0, -5.0, 5.0, 5.0))
+        matrix = pinky.Matrix.create_translate(1.0, 2.0)
+        box = subpath.get_bounding_box(matrix)
+        self.assertEqual((box.min_x, box.min_y, box.max_x, box.max_y),
+                         (1.0, -3.0, 6.0, 7.0))
+
+    def test_path(self):
+        path = pinky.Path.from_string(
+            'M 0 0 L 3 0 L 3 4 Z M 10 0 A 10 10 0 0 1 -10 0')
+        self.assertAlmostEqual(path.perimeter, 12.0 + 10.0 * math.pi, 4)
+
+class ArcLengthTableTest(unittest.TestCase):
+    def test_open(self):
+        table = pinky.ArcLengthTable(pinky.Polyline([(0.0, 0.0), (3.0, 0.0),
+                                                     (3.0, 4.0)]))
+        self.assertEqual(table.length, 7.0)
+        self.assertEqual(table.point_at(1.5), (1.5, 0.0))
+        self.assertEqual(table.point_at(5.0), (3.0, 2.0))
+        self.assertEqual(table.point_at(-1.0), (0.0, 0.0))
+        self.assertEqual(table.point_at(10.0), (3.0, 4.0))
+        self.assertEqual(table.tangent_at(5.0), (0.0, 1.0))
+
+    def test_closed_wraps(self):
+        table = pinky.ArcLengthTable(pinky.Rect(0.0, 0.0, 2.0, 1.0))
+        self.assertEqual(table.length, 6.0)
+        self.assertEqual(table.point_at(7.0), (1.0, 0.0))
+        self.assertEqual(table.point_at(-1.0), (0.0, 1.0))
+
+    def test_subpath(self):
+        subpath, = pinky.Path.from_string(
+            'M 10 0 A 10 10 0 0 1 -10 0').subpaths
+        table = pinky.ArcLengthTable(subpath, 0.001)
+        self.assertAlmostEqual(table.length, subpath.perimeter, 2)
+        x, y = table.point_at(0.5 * table.length)
+        self.assertAlmostEqual(x, 0.0, 3)
+        self.assertAlmostEqual(y, 10.0, 3)
+
+    def test_many(self):
+        table = pinky.ArcLengthTable(pinky.Circle(0.0, 0.0, 5.0), 0.01)
+        distances = [0.1 * i for i in range(-20, 400)]
+        self.assertEqual(table.points_at(distances),
+                         [table.point_at(d) for d in distances])
+        self.assertEqual(table.tangents_at(distances),
+                         [table.tangent_at(d) for d in distances])
+        distances.reverse()
+        self.assertEqual(table.points_at(distances),
+                         [table.point_at(d) for d in distances])
+
+    def test_empty(self):
+        table = pinky.ArcLengthTable(pinky.Path.from_string(''))
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.length, 0.0)
+        self.assertRaises(ValueError, table.point_at, 1.0)
+        self.assertRaises(ValueError, table.tangent_at, 1.0)
+        self.assertRaises(ValueError, table.points_at, [1.0])
+        self.assertRaises(ValueError, table.tangents_at, [1.0])
+
+if __name__ == '__main__':
+    unittest.main()
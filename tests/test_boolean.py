@@ -0,0 +1,107 @@
+import io
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <g id="world" transform="translate(100, 0)">
+    <g id="layer">
+      <rect style="fill:red" x="0" y="0" width="1" height="1"/>
+      <rect style="fill:red" x="1" y="0" width="1" height="1"/>
+      <rect style="fill:red" x="0" y="1" width="2" height="1"/>
+      <rect style="fill:blue" x="5" y="5" width="1" height="1"/>
+      <rect style="fill:none" x="0" y="0" width="9" height="9"/>
+    </g>
+  </g>
+  <g id="attributes">
+    <rect fill="red" x="0" y="0" width="1" height="1"/>
+    <rect fill="blue" x="1" y="0" width="1" height="1"/>
+    <rect style="fill: red" fill="blue" x="0" y="1" width="1" height="1"/>
+    <rect fill="red" fill-opacity="0.5" x="3" y="0" width="1" height="1"/>
+    <rect x="5" y="0" width="1" height="1"/>
+    <rect fill="none" x="0" y="0" width="9" height="9"/>
+  </g>
+</svg>
+'''
+
+def get_signed_area(points):
+    return 0.5 * sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2)
+                     in zip(points, points[1:] + points[:1]))
+
+def get_rings(path):
+    return [polygon.points for polygon in path.flatten(0.1)]
+
+class BooleanTest(unittest.TestCase):
+    def setUp(self):
+        self.a = pinky.Rect(0.0, 0.0, 2.0, 2.0)
+        self.b = pinky.Rect(1.0, 1.0, 2.0, 2.0)
+
+    def test_union(self):
+        rings = get_rings(self.a.union(self.b))
+        self.assertEqual(len(rings), 1)
+        self.assertAlmostEqual(get_signed_area(rings[0]), 7.0)
+
+    def test_intersection(self):
+        rings = get_rings(self.a.intersection(self.b))
+        self.assertEqual(len(rings), 1)
+        self.assertAlmostEqual(get_signed_area(rings[0]), 1.0)
+
+    def test_difference(self):
+        rings = get_rings(self.a.difference(self.b))
+        self.assertEqual(len(rings), 1)
+        self.assertAlmostEqual(get_signed_area(rings[0]), 3.0)
+        self.assertEqual(get_rings(self.a.difference(self.a)), [])
+
+    def test_hole(self):
+        outer = pinky.Rect(0.0, 0.0, 4.0, 4.0)
+        inner = pinky.Rect(1.0, 1.0, 2.0, 2.0)
+        areas = sorted(get_signed_area(r)
+                       for r in get_rings(outer.difference(inner)))
+        self.assertEqual(len(areas), 2)
+        self.assertAlmostEqual(areas[0], -4.0)
+        self.assertAlmostEqual(areas[1], 16.0)
+
+    def test_curves(self):
+        circle = pinky.Circle(0.0, 0.0, 1.0)
+        rings = get_rings(circle.intersection(pinky.Rect(0.0, -2.0, 2.0, 4.0),
+                                              0.001))
+        self.assertEqual(len(rings), 1)
+        self.assertAlmostEqual(get_signed_area(rings[0]), 0.5 * math.pi, 2)
+
+class DissolveTest(unittest.TestCase):
+    def setUp(self):
+        self.document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+
+    def test_dissolve(self):
+        regions = pinky.dissolve(self.document.get_element_by_id('layer'))
+        self.assertEqual([style for style, path in regions],
+                         ['fill:red', 'fill:blue'])
+        rings = get_rings(regions[0][1])
+        self.assertEqual(len(rings), 1)
+        self.assertAlmostEqual(get_signed_area(rings[0]), 4.0)
+        self.assertEqual(len(rings[0]), 4)
+
+    def test_ancestor_transforms(self):
+        for id in ['world', 'layer']:
+            regions = pinky.dissolve(self.document.get_element_by_id(id))
+            box = regions[1][1].bounding_box
+            self.assertEqual((box.min_x, box.min_y, box.max_x, box.max_y),
+                             (105.0, 5.0, 106.0, 6.0))
+
+    def test_presentation_attributes(self):
+        regions = pinky.dissolve(self.document.get_element_by_id(
+            'attributes'))
+        self.assertEqual([style for style, path in regions],
+                         ['fill:red', 'fill:blue', 'fill:red;fill-opacity:0.5',
+                          'fill:black'])
+        rings = get_rings(regions[0][1])
+        self.assertEqual(len(rings), 1)
+        self.assertAlmostEqual(get_signed_area(rings[0]), 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
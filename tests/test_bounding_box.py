@@ -0,0 +1,109 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <g transform="translate(100, 0) rotate(30)">
+    <circle cx="1" cy="2" r="3"/>
+    <g transform="scale(2, 1)">
+      <rect x="0" y="0" width="4" height="2" rx="1" ry="0.5"/>
+    </g>
+  </g>
+  <path d="M 0 0 L 10 0 L 10 10 Z M 20 20 L 30 30"/>
+  <g/>
+</svg>
+'''
+
+MATRICES = [
+    pinky.Matrix(),
+    pinky.Matrix.create_translate(3.0, -4.0),
+    pinky.Matrix.create_scale(-1.5, 0.5),
+    pinky.Matrix.create_rotate(30.0) * pinky.Matrix.create_scale(2.0, 3.0),
+    pinky.Matrix(1.0, 0.5, -0.75, 1.0, 2.0, 1.0),
+]
+
+SHAPES = [
+    pinky.Circle(1.0, 2.0, 3.0),
+    pinky.Rect(1.0, 2.0, 4.0, 3.0),
+    pinky.Rect(1.0, 2.0, 4.0, 3.0, 1.0, 0.5),
+    pinky.Ellipse(1.0, 2.0, 4.0, 1.0, 30.0),
+    pinky.BoundingBox(1.0, 2.0, 5.0, 4.0),
+    pinky.Polygon([(0.0, 0.0), (4.0, 0.0), (0.0, 3.0)]),
+    pinky.Polyline([(0.0, 0.0), (4.0, 0.0), (0.0, 3.0)]),
+    pinky.Line(1.0, 2.0, 3.0, 5.0),
+    pinky.Path.from_string('M 0 0 L 10 0 L 10 10 Z M 20 20 L 30 30'),
+]
+
+def get_box(bounding_box):
+    return (bounding_box.min_x, bounding_box.min_y, bounding_box.max_x,
+            bounding_box.max_y)
+
+class BoundingBoxTest(unittest.TestCase):
+    def assertSameBox(self, box, expected, places=7):
+        for value, expected_value in zip(get_box(box), get_box(expected)):
+            self.assertAlmostEqual(value, expected_value, places)
+
+    def test_closed_forms(self):
+        # The closed forms match the transformed outlines, flattened finely
+        # enough that their boxes are within 1e-6.
+        for matrix in MATRICES:
+            for shape in SHAPES[:4]:
+                expected = pinky.BoundingBox.from_points(
+                    matrix.transform_points(shape.flatten(1e-8)[0].points))
+                self.assertSameBox(shape.get_bounding_box(matrix), expected,
+                                   5)
+
+    def test_points(self):
+        for matrix in MATRICES:
+            for shape in SHAPES[5:]:
+                expected = shape.transform(matrix).bounding_box
+                self.assertSameBox(shape.get_bounding_box(matrix), expected)
+            expected = pinky.BoundingBox.from_points(matrix.transform_points(
+                [(1.0, 2.0), (5.0, 2.0), (5.0, 4.0), (1.0, 4.0)]))
+            self.assertSameBox(SHAPES[4].get_bounding_box(matrix), expected)
+
+    def test_empty(self):
+        box = pinky.BoundingBox().get_bounding_box(MATRICES[3])
+        self.assertFalse(box)
+
+    def test_add_shape(self):
+        box = pinky.BoundingBox()
+        box.add_shape((1.0, 2.0), MATRICES[1])
+        self.assertEqual(get_box(box), (4.0, -2.0, 4.0, -2.0))
+        box.add_shape((0.0, 0.0))
+        box.add_shape(SHAPES[0], MATRICES[1])
+        self.assertEqual(get_box(box), (0.0, -5.0, 7.0, 1.0))
+        box = pinky.BoundingBox.from_shapes(SHAPES, MATRICES[4])
+        expected = pinky.BoundingBox()
+        for shape in SHAPES:
+            expected.add_shape(shape.get_bounding_box(MATRICES[4]))
+        self.assertSameBox(box, expected)
+
+    def get_flat_bounding_box(self, element):
+        bounding_box = pinky.BoundingBox()
+        stack = [element]
+        while stack:
+            element = stack.pop()
+            if element.shape is not None:
+                for shape in element.shape.transform(
+                        element.world_matrix).flatten(1e-8):
+                    bounding_box.add_shape(shape)
+            stack.extend(element.children)
+        return bounding_box
+
+    def test_document(self):
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        self.assertSameBox(document.bounding_box,
+                           self.get_flat_bounding_box(document.root), 5)
+        group = document.root.children[0]
+        self.assertSameBox(group.bounding_box,
+                           self.get_flat_bounding_box(group), 5)
+        self.assertFalse(document.root.children[-1].bounding_box)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import math
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+def get_wavy_polygon(cx, cy, r, count):
+    return pinky.Polygon([
+        (cx + r * math.cos(a) * (1.0 + 0.2 * math.sin(7.0 * a)),
+         cy + r * math.sin(a))
+        for a in [2.0 * math.pi * i / count for i in range(count)]])
+
+def get_shapes():
+    return [
+        get_wavy_polygon(50.0, 50.0, 40.0, 500),
+        pinky.Circle(10.0, 10.0, 5.0),
+        pinky.Path.from_string('M 60 60 L 90 60 L 90 90 L 60 90 Z '
+                               'M 70 70 L 70 80 L 80 80 L 80 70 Z'),
+        pinky.Rect(20.0, 70.0, 10.0, 5.0),
+        pinky.Line(0.0, 95.0, 100.0, 95.0),
+        pinky.Polygon([(0.0, 0.0), (100.0, 100.0), (100.0, 0.0),
+                       (0.0, 100.0)]),
+    ]
+
+class CollisionSetTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.xs = [rng.uniform(-10.0, 110.0) for i in range(2000)]
+        self.ys = [rng.uniform(-10.0, 110.0) for i in range(2000)]
+        self.dxs = [rng.uniform(-30.0, 30.0) for i in range(2000)]
+        self.dys = [rng.uniform(-30.0, 30.0) for i in range(2000)]
+
+    def query(self):
+        collision_set = pinky.CollisionSet(get_shapes()[:-1])
+        collision_set.contains(self.xs[:10], self.ys[:10])
+        # Shapes added after a query are found too.
+        collision_set.add(get_shapes()[-1])
+        x2s = [x + dx for x, dx in zip(self.xs, self.dxs)]
+        y2s = [y + dy for y, dy in zip(self.ys, self.dys)]
+        return ([list(collision_set.contains(self.xs, self.ys, fill_rule))
+                 for fill_rule in ('nonzero', 'evenodd')],
+                [[list(values) for values in collision_set.intersect_segments(
+                    self.xs, self.ys, x2s, y2s)],
+                 [list(values) for values in collision_set.intersect_rays(
+                     self.xs, self.ys, self.dxs, self.dys)]])
+
+    def assertSameHits(self, hits, expected):
+        self.assertEqual([int(index) for index in hits[0]], expected[0])
+        for values, expected_values in zip(hits[1:], expected[1:]):
+            for value, expected_value in zip(values, expected_values):
+                if math.isnan(expected_value):
+                    self.assertTrue(math.isnan(value))
+                else:
+                    self.assertAlmostEqual(value, expected_value)
+
+    def test_numpy(self):
+        if pinky.numpy is None:
+            return
+        contains, hits = self.query()
+        numpy = pinky.numpy
+        try:
+            pinky.numpy = None
+            expected_contains, expected_hits = self.query()
+        finally:
+            pinky.numpy = numpy
+        self.assertEqual(contains, expected_contains)
+        for segment_hits, expected_segment_hits in zip(hits, expected_hits):
+            self.assertSameHits(segment_hits, expected_segment_hits)
+        # Every shape but the line is hit by both kinds of query.
+        self.assertEqual(set(contains[0]), set([-1, 0, 1, 2, 3, 5]))
+        self.assertEqual(set(hits[0][0]), set([-1, 0, 1, 2, 3, 4, 5]))
+
+    def test_contains(self):
+        collision_set = pinky.CollisionSet(get_shapes()[2:3])
+        self.assertEqual(list(collision_set.contains(
+            [65.0, 75.0, 95.0], [65.0, 75.0, 75.0])), [0, -1, -1])
+        self.assertEqual(list(collision_set.contains(
+            [65.0, 75.0], [65.0, 75.0], 'evenodd')), [0, -1])
+        self.assertRaises(ValueError, collision_set.contains, [0.0], [0.0],
+                          'winding')
+
+    def test_intersect(self):
+        collision_set = pinky.CollisionSet([pinky.Rect(10.0, 0.0, 5.0, 5.0),
+                                            pinky.Circle(30.0, 2.0, 2.0)])
+        indices, hit_xs, hit_ys, normal_xs, normal_ys = (
+            collision_set.intersect_rays([0.0, 40.0, 0.0], [2.0, 2.0, 10.0],
+                                         [1.0, -1.0, 1.0], [0.0, 0.0, 0.0]))
+        self.assertEqual(list(indices), [0, 1, -1])
+        self.assertAlmostEqual(hit_xs[0], 10.0)
+        self.assertAlmostEqual(hit_xs[1], 32.0)
+        self.assertEqual((normal_xs[0], normal_ys[0]), (-1.0, 0.0))
+        self.assertAlmostEqual(normal_xs[1], 1.0)
+        self.assertTrue(math.isnan(hit_xs[2]))
+
+    def test_arc_bounds(self):
+        # The control points of the arc are only its endpoints, so its
+        # bounding box would leave out the half disc below them.
+        path = pinky.Path.from_string('M 0 0 A 5 5 0 0 1 10 0 Z')
+        numpy = pinky.numpy
+        results = []
+        try:
+            for module in [numpy, None]:
+                pinky.numpy = module
+                collision_set = pinky.CollisionSet([path])
+                indices = collision_set.intersect_segments(
+                    [5.0], [-10.0], [5.0], [10.0])[0]
+                results.append((list(collision_set.contains([5.0, 5.0],
+                                                            [-2.0, 2.0])),
+                                list(indices)))
+        finally:
+            pinky.numpy = numpy
+        for result in results:
+            self.assertEqual(result, ([0, -1], [0]))
+
+    def test_blocks(self):
+        if pinky.numpy is None:
+            return
+        blocks = pinky._get_blocks(pinky.numpy.array([3, 4, 10, 1, 1, 2]), 7)
+        self.assertEqual(blocks, [(0, 2), (2, 3), (3, 6)])
+        self.assertEqual(pinky._get_blocks(pinky.numpy.array([], int), 7),
+                         [])
+
+if __name__ == '__main__':
+    unittest.main()
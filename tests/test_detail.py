@@ -0,0 +1,117 @@
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+def get_segment_distance(x, y, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    length_squared = dx * dx + dy * dy
+    t = 0.0
+    if length_squared:
+        t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) /
+                         length_squared))
+    return math.hypot(x - x1 - t * dx, y - y1 - t * dy)
+
+def get_polyline_distance(x, y, points):
+    return min(get_segment_distance(x, y, x1, y1, x2, y2)
+               for (x1, y1), (x2, y2) in zip(points, points[1:]))
+
+def get_cubic_point(p0, p1, p2, p3, t):
+    s = 1.0 - t
+    return tuple(s * s * s * a + 3.0 * s * s * t * b + 3.0 * s * t * t * c +
+                 t * t * t * d for a, b, c, d in zip(p0, p1, p2, p3))
+
+class FlattenTest(unittest.TestCase):
+    def test_circle(self):
+        circle = pinky.Circle(1.0, 2.0, 10.0)
+        polygon, = circle.flatten(0.01)
+        points = polygon.points
+        for x, y in points:
+            self.assertAlmostEqual(math.hypot(x - 1.0, y - 2.0), 10.0)
+        for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+            x, y = 0.5 * (x1 + x2), 0.5 * (y1 + y2)
+            self.assertTrue(10.0 - math.hypot(x - 1.0, y - 2.0) <= 0.01)
+        self.assertTrue(len(circle.flatten(1.0)[0].points) < len(points))
+
+    def test_cubic(self):
+        p0, p1, p2, p3 = (0.0, 0.0), (10.0, 30.0), (40.0, -20.0), (50.0, 5.0)
+        path = pinky.Path.from_string('M 0 0 C 10 30 40 -20 50 5')
+        polyline, = path.flatten(0.05)
+        points = polyline.points
+        self.assertEqual(points[0], p0)
+        self.assertEqual(points[-1], p3)
+        for i in range(101):
+            x, y = get_cubic_point(p0, p1, p2, p3, i / 100.0)
+            self.assertTrue(get_polyline_distance(x, y, points) <= 0.05)
+
+    def test_arc(self):
+        path = pinky.Path.from_string('M 10 0 A 10 10 0 0 1 0 10')
+        polyline, = path.flatten(0.01)
+        for x, y in polyline.points:
+            self.assertAlmostEqual(math.hypot(x, y), 10.0)
+            self.assertTrue(x >= -1e-9 and y >= -1e-9)
+        self.assertAlmostEqual(polyline.points[-1][0], 0.0)
+        self.assertAlmostEqual(polyline.points[-1][1], 10.0)
+
+    def test_line_and_closed_subpath(self):
+        line, polygon = pinky.Path.from_string(
+            'M 0 0 L 5 5 M 0 0 L 1 0 L 1 1 Z').flatten(0.1)
+        self.assertTrue(isinstance(line, pinky.Line))
+        self.assertTrue(isinstance(polygon, pinky.Polygon))
+        self.assertEqual(polygon.points, [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0)])
+
+class SimplifyTest(unittest.TestCase):
+    def test_polygon(self):
+        polygon = pinky.Circle(0.0, 0.0, 10.0).flatten(0.001)[0]
+        simple = polygon.simplify(0.5)
+        self.assertTrue(3 <= len(simple.points) < len(polygon.points))
+        ring = simple.points + simple.points[:1]
+        for x, y in polygon.points:
+            self.assertTrue(get_polyline_distance(x, y, ring) <= 0.5)
+
+    def test_collinear_polyline(self):
+        polyline = pinky.Polyline([(0.0, 0.0), (1.0, 0.01), (2.0, 0.0),
+                                   (3.0, 5.0)])
+        self.assertEqual(polyline.simplify(0.1).points,
+                         [(0.0, 0.0), (2.0, 0.0), (3.0, 5.0)])
+
+class LevelOfDetailTest(unittest.TestCase):
+    def setUp(self):
+        self.shape = pinky.Path.from_string(
+            'M 0 0 C 100 300 400 -200 500 50 A 200 100 0 0 1 0 0 Z')
+        self.levels = pinky.LevelOfDetail(self.shape, 0.1, 6)
+
+    def test_vertex_counts(self):
+        counts = [level.vertex_count for level in self.levels]
+        self.assertEqual(len(counts), 6)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertTrue(counts[-1] < counts[0])
+
+    def test_tolerance(self):
+        fine = self.shape.flatten(0.001)[0].points
+        for level in self.levels:
+            points, closed = list(level)[0]
+            self.assertTrue(closed)
+            ring = points + points[:1]
+            for x, y in fine[::10]:
+                self.assertTrue(get_polyline_distance(x, y, ring) <=
+                                level.tolerance + 1e-9)
+
+    def test_select(self):
+        self.assertEqual(self.levels.get_level_index(10.0), 0)
+        self.assertEqual(self.levels.get_level_index(1.0), 2)
+        self.assertEqual(self.levels.get_level_index(0.001), 5)
+        matrix = pinky.Matrix.create_scale(0.25)
+        self.assertTrue(self.levels.select(matrix) is self.levels[4])
+
+    def test_small_outlines_are_dropped(self):
+        level = pinky.DetailLevel.from_shape(pinky.Circle(0.0, 0.0, 0.01),
+                                             0.1)
+        self.assertEqual(len(level), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg"
+    xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape">
+  <g id="walls" inkscape:groupmode="layer" inkscape:label="Walls"
+     transform="translate(10, 0)">
+    <rect id="wall1" class="solid wall" x="0" y="0" width="1" height="5"/>
+    <rect id="wall2" class="solid" x="5" y="0" width="1" height="5"
+          transform="scale(2)"/>
+    <g id="group" transform="translate(0, 100)">
+      <circle id="pillar" class="solid" inkscape:label="Pillar" r="1"/>
+    </g>
+  </g>
+  <g id="items" inkscape:groupmode="layer" inkscape:label="Items">
+    <circle id="coin" class="pickup" inkscape:label="Pillar" cx="3" r="1"/>
+  </g>
+</svg>
+'''
+
+def get_ids(result):
+    return sorted(element.attributes['id'] for element, matrix, shape
+                  in result)
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+
+    def test_index(self):
+        self.assertEqual(self.document.get_element_by_id('coin').attributes[
+            'cx'], '3')
+        self.assertEqual(self.document.get_element_by_id('missing'), None)
+        self.assertEqual([e.attributes['id'] for e in self.document.layers],
+                         ['walls', 'items'])
+
+    def test_query(self):
+        document = self.document
+        self.assertEqual(get_ids(document.query(class_name='solid')),
+                         ['pillar', 'wall1', 'wall2'])
+        self.assertEqual(get_ids(document.query(layer='Walls', type='rect')),
+                         ['wall1', 'wall2'])
+        self.assertEqual(get_ids(document.query(label='Pillar')),
+                         ['coin', 'pillar'])
+        self.assertEqual(get_ids(document.query(label='Pillar',
+                                                layer='Items')), ['coin'])
+        self.assertEqual(get_ids(document.query(id='wall1',
+                                                class_name='wall')), ['wall1'])
+        self.assertEqual(document.query(id='wall1', class_name='pickup'), [])
+        self.assertEqual(len(document.query()), 8)
+
+    def test_world_matrix(self):
+        (element, matrix, shape), = self.document.query(id='pillar')
+        self.assertEqual(matrix.abcdef, (1.0, 0.0, 0.0, 1.0, 10.0, 100.0))
+        self.assertTrue(shape is element.shape)
+        (element, matrix, shape), = self.document.query(id='wall2')
+        self.assertEqual(matrix.abcdef, (2.0, 0.0, 0.0, 2.0, 10.0, 0.0))
+
+class EditTest(unittest.TestCase):
+    def setUp(self):
+        self.document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+
+    def test_set_transform_invalidates_descendants(self):
+        document = self.document
+        pillar = document.get_element_by_id('pillar')
+        self.assertEqual(pillar.world_matrix.abcdef[4:], (10.0, 100.0))
+        document.set_attribute(document.get_element_by_id('walls'),
+                               'transform', 'translate(20, 0)')
+        self.assertEqual(pillar.world_matrix.abcdef[4:], (20.0, 100.0))
+        document.set_attribute(document.get_element_by_id('walls'),
+                               'transform', None)
+        self.assertEqual(pillar.world_matrix.abcdef[4:], (0.0, 100.0))
+
+    def test_set_indexed_attribute(self):
+        document = self.document
+        coin = document.get_element_by_id('coin')
+        document.set_attribute(coin, 'class', 'solid')
+        document.set_attribute(coin, 'id', 'gem')
+        self.assertEqual(get_ids(document.query(class_name='solid')),
+                         ['gem', 'pillar', 'wall1', 'wall2'])
+        self.assertEqual(document.get_element_by_id('coin'), None)
+        self.assertTrue(document.get_element_by_id('gem') is coin)
+        self.assertEqual(coin.node.getAttribute('class'), 'solid')
+
+    def test_set_shape_attribute(self):
+        document = self.document
+        coin = document.get_element_by_id('coin')
+        document.set_attribute(coin, 'r', '2')
+        self.assertEqual(coin.shape.r, 2.0)
+        shape = coin.shape
+        document.set_attribute(coin, 'fill', 'red')
+        self.assertTrue(coin.shape is shape)
+
+    def test_layer_order(self):
+        document = self.document
+        walls = document.get_element_by_id('walls')
+        document.set_attribute(walls, 'inkscape:label', 'Stone')
+        self.assertEqual([e.attributes['id'] for e in document.layers],
+                         ['walls', 'items'])
+        self.assertEqual(get_ids(document.query(layer='Stone', type='rect')),
+                         ['wall1', 'wall2'])
+        self.assertEqual(document.query(layer='Walls'), [])
+        layer = document.create_element(
+            document.root, 'g', {'id': 'floor', 'inkscape:groupmode': 'layer',
+                                 'inkscape:label': 'Floor'}, 0)
+        self.assertEqual([e.attributes['id'] for e in document.layers],
+                         ['floor', 'walls', 'items'])
+        document.set_attribute(layer, 'inkscape:groupmode', None)
+        self.assertEqual([e.attributes['id'] for e in document.layers],
+                         ['walls', 'items'])
+
+    def test_create_and_remove(self):
+        document = self.document
+        walls = document.get_element_by_id('walls')
+        element = document.create_element(
+            walls, 'rect', {'id': 'wall3', 'class': 'solid', 'x': '1',
+                            'y': '2', 'width': '3', 'height': '4'}, 0)
+        self.assertTrue(walls.children[0] is element)
+        self.assertTrue(element.layer is walls)
+        self.assertEqual(element.world_matrix.abcdef[4:], (10.0, 0.0))
+        self.assertEqual(get_ids(document.query(layer='Walls', type='rect')),
+                         ['wall1', 'wall2', 'wall3'])
+        self.assertEqual(walls.node.firstChild.nextSibling, element.node)
+        document.remove_element(document.get_element_by_id('group'))
+        self.assertEqual(document.get_element_by_id('pillar'), None)
+        self.assertEqual(get_ids(document.query(class_name='solid')),
+                         ['wall1', 'wall2', 'wall3'])
+        self.assertEqual(get_ids(document.query(layer='Walls')),
+                         ['wall1', 'wall2', 'wall3'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import math
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+BOUNDING_BOX = pinky.BoundingBox(0.0, 0.0, 40.0, 30.0)
+
+SHAPES = [
+    pinky.Rect(5.0, 5.0, 10.0, 8.0),
+    pinky.Circle(28.0, 18.0, 6.0),
+    pinky.Polygon([(2.0, 25.0), (12.0, 20.0), (6.0, 29.0)]),
+]
+
+def to_list(grid):
+    return [float(grid.get(col, row)) for row in range(grid.height)
+            for col in range(grid.width)]
+
+class GridTest(unittest.TestCase):
+    def build(self, use_numpy):
+        numpy = pinky.numpy
+        if not use_numpy:
+            pinky.numpy = None
+        try:
+            occupancy = pinky.OccupancyGrid.from_shapes(SHAPES, BOUNDING_BOX,
+                                                        0.5)
+            field = pinky.DistanceField.from_occupancy(occupancy)
+            rng = random.Random(1)
+            xs = [rng.uniform(-5.0, 45.0) for i in range(200)]
+            ys = [rng.uniform(-5.0, 35.0) for i in range(200)]
+            return (occupancy, field, to_list(occupancy), to_list(field),
+                    list(occupancy.sample_many(xs, ys)),
+                    list(field.sample_bilinear_many(xs, ys)))
+        finally:
+            pinky.numpy = numpy
+
+    def test_occupancy(self):
+        occupancy = self.build(pinky.numpy is not None)[0]
+        self.assertEqual((occupancy.width, occupancy.height), (80, 60))
+        self.assertTrue(occupancy.is_solid(10.0, 10.0))
+        self.assertTrue(occupancy.is_solid(28.0, 18.0))
+        self.assertFalse(occupancy.is_solid(20.0, 10.0))
+        self.assertFalse(occupancy.is_solid(-1.0, 10.0))
+        solid = sum(to_list(occupancy)) * 0.25
+        self.assertTrue(abs(solid - sum(s.area for s in SHAPES)) < 5.0)
+
+    def test_distances(self):
+        field = self.build(pinky.numpy is not None)[1]
+        for x, y in [(20.25, 9.25), (36.25, 18.25), (28.25, 4.25)]:
+            distance = min(math.hypot(max(5.0 - x, 0.0, x - 15.0),
+                                      max(5.0 - y, 0.0, y - 13.0)),
+                           math.hypot(x - 28.0, y - 18.0) - 6.0)
+            self.assertTrue(abs(field.sample_bilinear(x, y) - distance) <=
+                            0.5)
+        self.assertTrue(field.sample_bilinear(10.25, 9.25) < -3.5)
+        self.assertTrue(field.is_solid(28.0, 18.0))
+
+    def test_numpy_parity(self):
+        if pinky.numpy is None:
+            return
+        result = self.build(True)[2:]
+        pure_result = self.build(False)[2:]
+        self.assertEqual(result[0], pure_result[0])
+        self.assertEqual(result[1], pure_result[1])
+        self.assertEqual(result[2], pure_result[2])
+        for value, pure_value in zip(result[3], pure_result[3]):
+            self.assertAlmostEqual(value, pure_value)
+
+    def test_squared_distances_parity(self):
+        if pinky.numpy is None:
+            return
+        numpy = pinky.numpy
+        rng = numpy.random.RandomState(2)
+        for height, width, density in [(1, 1, 1.0), (1, 9, 0.3),
+                                       (9, 1, 0.3), (20, 30, 0.05),
+                                       (33, 17, 0.5), (40, 40, 0.001)]:
+            features = rng.rand(height, width) < density
+            features[rng.randint(height), rng.randint(width)] = True
+            data = [int(f) for f in features.ravel()]
+            expected = pinky._get_squared_distances(data, width, height, 1)
+            result = pinky._get_squared_distances_numpy(features)
+            self.assertEqual(list(result.ravel()), list(expected))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <path id="a" d="M 0 0 L 4 0 L 4 2 Z"/>
+  <path id="b" d="M 10 10 L 14 10 L 14 12 Z"/>
+  <g transform="scale(2)">
+    <path id="c" d="M 0 5 L 4 5 L 4 7 Z"/>
+  </g>
+  <circle id="d" cx="3" cy="4" r="1"/>
+</svg>
+'''
+
+TRIANGLE = pinky.Polygon([(0.0, 0.0), (4.0, 0.0), (4.0, 2.0)])
+
+def get_points(shape):
+    return [(round(x, 9), round(y, 9)) for x, y in shape.points]
+
+class GeometryLibraryTest(unittest.TestCase):
+    def assertSameShape(self, shape, other):
+        self.assertEqual(type(shape), type(other))
+        if isinstance(shape, pinky.Polygon):
+            self.assertEqual(get_points(shape), get_points(other))
+        else:
+            self.assertEqual(repr(shape).replace('-0.0', '0.0'),
+                             repr(other).replace('-0.0', '0.0'))
+
+    def test_translation(self):
+        library = pinky.GeometryLibrary()
+        shapes = [TRIANGLE.transform(pinky.Matrix.create_translate(x, y))
+                  for x, y in [(0.0, 0.0), (10.0, 5.0), (-3.0, 0.5)]]
+        shapes.append(TRIANGLE.transform(pinky.Matrix.create_scale(2.0)))
+        instances = [library.add(shape) for shape in shapes]
+        self.assertEqual(len(library.prototypes), 2)
+        self.assertEqual(library.prototypes[0].instance_count, 3)
+        for shape, instance in zip(shapes, instances):
+            self.assertSameShape(instance.prototype.shape.transform(
+                instance.matrix), shape)
+
+    def test_scale_and_rotation(self):
+        library = pinky.GeometryLibrary(scale=True, rotation=True)
+        shapes = [TRIANGLE.transform(pinky.Matrix.create_rotate(angle) *
+                                     pinky.Matrix.create_scale(scale))
+                  for angle, scale in [(0.0, 1.0), (30.0, 2.0), (-90.0, 0.5)]]
+        instances = [library.add(shape) for shape in shapes]
+        self.assertEqual(len(library.prototypes), 1)
+        for shape, instance in zip(shapes, instances):
+            self.assertSameShape(instance.prototype.shape.transform(
+                instance.matrix), shape)
+
+    def test_analytic_shapes(self):
+        library = pinky.GeometryLibrary(scale=True, rotation=True)
+        rect = library.add(pinky.Rect(1.0, 2.0, 4.0, 2.0))
+        self.assertEqual(repr(rect.prototype.shape),
+                         repr(pinky.Rect(0.0, 0.0, 1.0, 0.5)))
+        self.assertEqual(rect.matrix.type, pinky.Matrix.SCALE)
+        circle = library.add(pinky.Circle(1.0, 2.0, 3.0))
+        self.assertEqual(repr(circle.prototype.shape),
+                         repr(pinky.Circle(0.0, 0.0, 1.0)))
+        ellipses = [pinky.Ellipse(5.0, 6.0, 4.0, 2.0, angle)
+                    for angle in [0.0, 30.0, 170.0, -100.0]]
+        instances = [library.add(ellipse) for ellipse in ellipses]
+        self.assertEqual(len(set(i.prototype for i in instances)), 1)
+        prototype = instances[0].prototype.shape
+        self.assertTrue(isinstance(prototype, pinky.Ellipse))
+        self.assertEqual(prototype.rotation, 0.0)
+        for ellipse, instance in zip(ellipses, instances):
+            shape = prototype.transform(instance.matrix)
+            self.assertAlmostEqual(shape.rx, ellipse.rx)
+            self.assertAlmostEqual(shape.ry, ellipse.ry)
+            difference = (shape.rotation - ellipse.rotation) % 180.0
+            self.assertAlmostEqual(min(difference, 180.0 - difference), 0.0)
+
+    def test_from_document(self):
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        library = pinky.GeometryLibrary.from_document(document)
+        self.assertEqual([i.element.attributes['id']
+                          for i in library.instances], ['a', 'b', 'c', 'd'])
+        self.assertEqual(len(library.prototypes), 2)
+        self.assertTrue(library.instances[2].prototype is
+                        library.instances[0].prototype)
+        self.assertTrue(library.memory_saved > 0)
+
+if __name__ == '__main__':
+    unittest.main()
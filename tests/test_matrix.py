@@ -0,0 +1,116 @@
+import math
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+def get_random_matrix(rng):
+    return pinky.Matrix(*[rng.uniform(-5.0, 5.0) for i in range(6)])
+
+def transform_point(matrix, x, y):
+    a, b, c, d, e, f = matrix.abcdef
+    return a * x + c * y + e, b * x + d * y + f
+
+class MatrixTest(unittest.TestCase):
+    def assertSameMatrix(self, matrix, other, places=9):
+        for value, other_value in zip(matrix.abcdef, other.abcdef):
+            self.assertAlmostEqual(value, other_value, places)
+
+    def test_type(self):
+        self.assertEqual(pinky.Matrix().type, pinky.Matrix.IDENTITY)
+        self.assertEqual(pinky.Matrix.create_translate(1.0, 0.0).type,
+                         pinky.Matrix.TRANSLATE)
+        self.assertEqual(pinky.Matrix.create_scale(2.0).type,
+                         pinky.Matrix.SCALE)
+        self.assertEqual(pinky.Matrix.create_flip_y().type,
+                         pinky.Matrix.SCALE)
+        self.assertEqual(pinky.Matrix.create_rotate(30.0).type,
+                         pinky.Matrix.GENERAL)
+        self.assertEqual(pinky.Matrix.from_string(
+            'translate(3 4) scale(2)').type, pinky.Matrix.SCALE)
+
+    def test_multiply(self):
+        rng = random.Random(1)
+        matrices = [pinky.Matrix(), pinky.Matrix.create_translate(3.0, -4.0),
+                    pinky.Matrix.create_scale(2.0, -0.5),
+                    get_random_matrix(rng)]
+        for first in matrices:
+            for second in matrices:
+                product = first * second
+                for x, y in [(0.0, 0.0), (1.5, -2.0), (-3.0, 7.0)]:
+                    expected = transform_point(
+                        first, *transform_point(second, x, y))
+                    actual = transform_point(product, x, y)
+                    self.assertAlmostEqual(actual[0], expected[0])
+                    self.assertAlmostEqual(actual[1], expected[1])
+
+    def test_transform_points(self):
+        rng = random.Random(2)
+        points = [(rng.uniform(-9.0, 9.0), rng.uniform(-9.0, 9.0))
+                  for i in range(10)]
+        for matrix in [pinky.Matrix(), pinky.Matrix.create_translate(1.0, 2.0),
+                       pinky.Matrix.create_scale(3.0, -1.0),
+                       get_random_matrix(rng)]:
+            expected = [transform_point(matrix, x, y) for x, y in points]
+            self.assertEqual(matrix.transform_points(points), expected)
+            self.assertEqual([matrix.transform_point(x, y)
+                              for x, y in points], expected)
+
+    def test_inverse(self):
+        rng = random.Random(3)
+        for matrix in [pinky.Matrix(), pinky.Matrix.create_translate(1.0, 2.0),
+                       pinky.Matrix.create_scale(3.0, -0.25)] + \
+                      [get_random_matrix(rng) for i in range(20)]:
+            self.assertSameMatrix(matrix * matrix.inverse(), pinky.Matrix())
+            self.assertSameMatrix(matrix.inverse() * matrix, pinky.Matrix())
+        self.assertRaises(ValueError, pinky.Matrix.create_scale(0.0).inverse)
+        self.assertRaises(ValueError,
+                          pinky.Matrix(1.0, 2.0, 2.0, 4.0).inverse)
+
+    def test_decompose(self):
+        rng = random.Random(4)
+        for i in range(50):
+            matrix = get_random_matrix(rng)
+            components = matrix.decompose()
+            self.assertTrue(-180.0 <= components[2] <= 180.0)
+            self.assertTrue(-90.0 < components[5] < 90.0)
+            self.assertSameMatrix(
+                pinky.Matrix.create_from_decomposition(*components), matrix)
+
+    def test_compose_decomposition(self):
+        matrix = pinky.Matrix.create_from_decomposition(
+            3.0, -4.0, 30.0, 2.0, 0.5, 10.0)
+        expected = (pinky.Matrix.create_translate(3.0, -4.0) *
+                    pinky.Matrix.create_rotate(30.0) *
+                    pinky.Matrix.create_skew_x(10.0) *
+                    pinky.Matrix.create_scale(2.0, 0.5))
+        self.assertSameMatrix(matrix, expected)
+        components = matrix.decompose()
+        for value, expected_value in zip(components,
+                                         (3.0, -4.0, 30.0, 2.0, 0.5, 10.0)):
+            self.assertAlmostEqual(value, expected_value)
+        tx, ty, angle, sx, sy, skew = pinky.Matrix.create_flip_y().decompose()
+        self.assertEqual((angle, sx, sy, skew), (0.0, 1.0, -1.0, 0.0))
+
+    def test_compose_all(self):
+        first = pinky.Matrix.create_rotate(45.0)
+        matrices = [pinky.Matrix.create_translate(1.0, 2.0),
+                    pinky.Matrix.create_scale(3.0)]
+        for product, matrix in zip(first.compose_all(matrices), matrices):
+            self.assertSameMatrix(product, first * matrix)
+        self.assertEqual(pinky.Matrix().compose_all(matrices), matrices)
+
+    def test_rotate_around_center(self):
+        matrix = pinky.Matrix.create_rotate(90.0, 1.0, 1.0)
+        x, y = matrix.transform_point(2.0, 1.0)
+        self.assertAlmostEqual(x, 1.0)
+        self.assertAlmostEqual(y, 2.0)
+        self.assertSameMatrix(matrix, pinky.Matrix.from_string(
+            'translate(1 1) rotate(90) translate(-1 -1)'))
+
+if __name__ == '__main__':
+    unittest.main()
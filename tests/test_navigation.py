@@ -0,0 +1,108 @@
+import math
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <rect class="floor" x="0" y="0" width="10" height="10"/>
+  <rect class="wall" x="4" y="0" width="2" height="8"/>
+</svg>
+'''
+
+def get_signed_area(points):
+    return 0.5 * sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2)
+                     in zip(points, points[1:] + points[:1]))
+
+def get_length(points):
+    return sum(math.hypot(x2 - x1, y2 - y1)
+               for (x1, y1), (x2, y2) in zip(points, points[1:]))
+
+def is_convex(points):
+    count = len(points)
+    for i in range(count):
+        (x1, y1), (x2, y2), (x3, y3) = [points[(i + j) % count]
+                                        for j in range(3)]
+        if (x2 - x1) * (y3 - y2) - (y2 - y1) * (x3 - x2) < -1e-9:
+            return False
+    return True
+
+def has_class(name):
+    return lambda element: element.attributes.get('class') == name
+
+class NavigationMeshTest(unittest.TestCase):
+    def setUp(self):
+        self.mesh = pinky.NavigationMesh.from_shapes(
+            [pinky.Rect(0.0, 0.0, 10.0, 10.0)],
+            [pinky.Rect(4.0, 0.0, 2.0, 8.0)])
+
+    def test_polygons(self):
+        mesh = self.mesh
+        self.assertAlmostEqual(sum(get_signed_area(p) for p in mesh.polygons),
+                               84.0)
+        for polygon in mesh.polygons:
+            self.assertTrue(is_convex(polygon))
+        for i, polygon_neighbors in enumerate(mesh.neighbors):
+            for neighbor, edge in polygon_neighbors:
+                self.assertTrue(i in [n for n, e in mesh.neighbors[neighbor]])
+
+    def test_find_polygon(self):
+        mesh = self.mesh
+        self.assertTrue(mesh.find_polygon(1.0, 1.0) is not None)
+        self.assertEqual(mesh.find_polygon(5.0, 4.0), None)
+        self.assertEqual(mesh.find_polygon(-1.0, 4.0), None)
+
+    def test_find_path(self):
+        path = self.mesh.find_path((1.0, 1.0), (9.0, 1.0))
+        self.assertEqual(path[0], (1.0, 1.0))
+        self.assertEqual(path[-1], (9.0, 1.0))
+        # The shortest path goes around the corners of the wall.
+        expected = [(1.0, 1.0), (4.0, 8.0), (6.0, 8.0), (9.0, 1.0)]
+        self.assertAlmostEqual(get_length(path), get_length(expected))
+        direct = self.mesh.find_path((1.0, 9.0), (9.0, 9.0))
+        self.assertEqual(direct, [(1.0, 9.0), (9.0, 9.0)])
+        self.assertEqual(self.mesh.find_path((1.0, 1.0), (5.0, 4.0)), None)
+
+    def test_disconnected(self):
+        mesh = pinky.NavigationMesh.from_shapes(
+            [pinky.Rect(0.0, 0.0, 10.0, 10.0)],
+            [pinky.Rect(4.0, -1.0, 2.0, 12.0)])
+        self.assertEqual(mesh.find_path((1.0, 1.0), (9.0, 1.0)), None)
+        self.assertEqual(mesh.find_path((1.0, 1.0), (2.0, 9.0)),
+                         [(1.0, 1.0), (2.0, 9.0)])
+
+class NavigationMeshFileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'level.svg')
+        with open(self.file_name, 'wb') as file_obj:
+            file_obj.write(DOCUMENT_DATA)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load(self):
+        mesh = pinky.NavigationMesh.from_file(
+            self.file_name, has_class('floor'), has_class('wall'))
+        self.assertAlmostEqual(sum(get_signed_area(p) for p in mesh.polygons),
+                               84.0)
+        cache_file_name = self.file_name + '.navmesh.json'
+        self.assertTrue(os.path.exists(cache_file_name))
+        cached = pinky.NavigationMesh.from_file(
+            self.file_name, has_class('floor'), has_class('wall'))
+        self.assertEqual(cached.polygons, mesh.polygons)
+        self.assertEqual(cached.neighbors, mesh.neighbors)
+        self.assertEqual(pinky.NavigationMesh.load(cache_file_name, 'other'),
+                         None)
+        rebuilt = pinky.NavigationMesh.from_file(
+            self.file_name, has_class('floor'), cache_key='no walls')
+        self.assertAlmostEqual(sum(get_signed_area(p)
+                                   for p in rebuilt.polygons), 100.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import unittest
+import xml.dom.minidom
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+try:
+    import concurrent.futures
+except ImportError:
+    concurrent = None
+
+def get_document_data(count):
+    parts = [b'<svg xmlns="http://www.w3.org/2000/svg">\n']
+    for i in range(count):
+        parts.append((u'<path id="p%i" style="fill:red" '
+                      u'transform="translate(%i, 0)" '
+                      u'd="M 0 0 L %i 0 L 1 1 Z"/>\n' % (
+                          i, i % 3, i % 5 + 1)).encode('utf-8'))
+    parts.append(b'</svg>\n')
+    return b''.join(parts)
+
+@unittest.skipIf(concurrent is None, 'requires concurrent.futures')
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        data = get_document_data(100)
+        self.serial = pinky.Document(io.BytesIO(data))
+        self.threaded = pinky.Document(io.BytesIO(data), thread_count=4)
+
+    def test_same_as_serial(self):
+        writer = pinky.Writer()
+        self.assertEqual(writer.format_document(self.threaded),
+                         writer.format_document(self.serial))
+        for element in self.threaded.root.children:
+            other = self.serial.get_element_by_id(element.attributes['id'])
+            self.assertEqual(element.style, other.style)
+            self.assertEqual(element.matrix.abcdef, other.matrix.abcdef)
+            self.assertEqual(element.matrix.type, other.matrix.type)
+
+    def test_no_shared_values(self):
+        elements = [self.threaded.get_element_by_id(id)
+                    for id in ('p0', 'p15')]
+        self.assertEqual(str(elements[0].shape), str(elements[1].shape))
+        self.assertFalse(elements[0].shape is elements[1].shape)
+        self.assertFalse(elements[0].shape.subpaths[0].commands[0] is
+                         elements[1].shape.subpaths[0].commands[0])
+        # Matrices are immutable, so they are shared.
+        self.assertTrue(elements[0].matrix is elements[1].matrix)
+        elements[0].style['fill'] = 'blue'
+        self.assertEqual(elements[1].style['fill'], 'red')
+        elements[0].shape.subpaths[0].commands[1].x = 9.0
+        self.assertEqual(elements[1].shape.subpaths[0].commands[1].x, 1.0)
+
+    def test_parse_all_does_not_copy(self):
+        class CountingCache(pinky.ParseCache):
+            copy_count = 0
+
+            def get_path(self, d):
+                self.copy_count += 1
+                return pinky.ParseCache.get_path(self, d)
+
+        dom = xml.dom.minidom.parseString(get_document_data(10))
+        cache = CountingCache()
+        cache.parse_all(dom, 4)
+        self.assertEqual(cache.copy_count, 0)
+        self.assertEqual(len(cache.paths), 5)
+        self.assertEqual(len(cache.matrices), 3)
+        path = cache.get_path('M 0 0 L 1 0 L 1 1 Z')
+        self.assertFalse(path is cache.paths['M 0 0 L 1 0 L 1 1 Z'])
+        self.assertEqual(cache.copy_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+def get_outlines(rng, count, spread):
+    outlines = []
+    for i in range(count):
+        x, y = rng.uniform(-spread, spread), rng.uniform(-spread, spread)
+        outlines.append([(x + rng.uniform(-50.0, 50.0),
+                          y + rng.uniform(-50.0, 50.0)) for j in range(20)])
+    return outlines
+
+class QuantizedBufferTest(unittest.TestCase):
+    def assertWithinError(self, buffer, outlines):
+        self.assertEqual(len(buffer), len(outlines))
+        for (points, closed), expected in zip(buffer, outlines):
+            self.assertEqual(len(points), len(expected))
+            for (x, y), (expected_x, expected_y) in zip(points, expected):
+                self.assertTrue(abs(x - expected_x) <= buffer.error * 1.0001)
+                self.assertTrue(abs(y - expected_y) <= buffer.error * 1.0001)
+
+    def test_error_bound(self):
+        rng = random.Random(1)
+        outlines = get_outlines(rng, 10, 1e4)
+        for type_code in ['f', 'h', 'i']:
+            for error in [0.001, 0.01, 0.5]:
+                buffer = pinky.QuantizedBuffer(error, type_code)
+                for points in outlines:
+                    buffer.add_points(points, True)
+                self.assertWithinError(buffer, outlines)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, pinky.QuantizedBuffer, 0.0)
+        self.assertRaises(ValueError, pinky.QuantizedBuffer, 0.1, 'd')
+
+    def test_scattered_points_widen(self):
+        rng = random.Random(2)
+        points = [(rng.uniform(0.0, 1e5), rng.uniform(0.0, 1e5))
+                  for i in range(500)]
+        buffer = pinky.QuantizedBuffer(0.01)
+        buffer.add_points(points, False)
+        self.assertEqual(buffer.type_code, 'i')
+        self.assertEqual(len(buffer.chunk_offsets), 1)
+        self.assertTrue(buffer.nbytes < 16 * len(points))
+        self.assertWithinError(buffer, [points])
+
+    def test_widen_keeps_earlier_outlines(self):
+        rng = random.Random(3)
+        outlines = get_outlines(rng, 5, 100.0)
+        buffer = pinky.QuantizedBuffer(0.01)
+        for points in outlines:
+            buffer.add_points(points, True)
+        self.assertEqual(buffer.type_code, 'h')
+        before = [points for points, closed in buffer]
+        scattered = [(0.0, 0.0), (1e5, 0.0), (0.0, 1e5), (1e5, 1e5)]
+        buffer.add_points(scattered, False)
+        self.assertEqual(buffer.type_code, 'i')
+        self.assertEqual([points for points, closed in buffer][:5], before)
+        self.assertWithinError(buffer, outlines + [scattered])
+        self.assertEqual(list(buffer.closed), [1] * 5 + [0])
+
+    def test_compact(self):
+        rng = random.Random(4)
+        outlines = get_outlines(rng, 50, 1e3)
+        buffer = pinky.QuantizedBuffer(0.01)
+        for points in outlines:
+            buffer.add_points(points, True)
+        self.assertEqual(buffer.type_code, 'h')
+        self.assertEqual(len(buffer.chunk_offsets), 50)
+        self.assertTrue(buffer.nbytes < 0.5 * 16 * 50 * 20)
+
+    def test_bounding_box(self):
+        rng = random.Random(5)
+        outlines = get_outlines(rng, 10, 1e3)
+        buffer = pinky.QuantizedBuffer(0.01)
+        for points in outlines:
+            buffer.add_points(points, True)
+        decoded = [p for points, closed in buffer for p in points]
+        expected = pinky.BoundingBox.from_points(decoded)
+        box = buffer.bounding_box
+        self.assertEqual((box.min_x, box.min_y, box.max_x, box.max_y),
+                         (expected.min_x, expected.min_y, expected.max_x,
+                          expected.max_y))
+        matrix = pinky.Matrix.create_rotate(30.0)
+        expected = pinky.BoundingBox.from_points(
+            matrix.transform_points(decoded))
+        box = buffer.get_bounding_box(matrix)
+        for value, expected_value in zip(
+                (box.min_x, box.min_y, box.max_x, box.max_y),
+                (expected.min_x, expected.min_y, expected.max_x,
+                 expected.max_y)):
+            self.assertAlmostEqual(value, expected_value)
+
+    def test_shape(self):
+        buffer = pinky.QuantizedBuffer.from_shapes(
+            [pinky.Rect(0.0, 0.0, 4.0, 2.0), pinky.Line(0.0, 0.0, 3.0, 4.0)],
+            0.01)
+        polygon, line = buffer.flatten(0.1)
+        self.assertAlmostEqual(polygon.area, 8.0, 1)
+        self.assertTrue(isinstance(line, pinky.Line))
+        transformed = buffer.transform(pinky.Matrix.create_translate(1e4))
+        self.assertAlmostEqual(transformed.get_points(0)[0][0], 1e4, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import io
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <path id="circle" d="M 15 10 A 5 5 0 0 1 5 10 A 5 5 0 0 1 15 10 Z"/>
+  <path id="box" d="M 0 0 L 4 0 L 4 2 L 0 2 Z"/>
+  <path id="line" d="M 0 0 L 3 4"/>
+  <path id="blob" d="M 0 0 C 10 20 20 -20 30 0 L 0 10 Z"/>
+</svg>
+'''
+
+def get_ellipse_path(cx, cy, rx, ry, angle):
+    matrix = (pinky.Matrix.create_translate(cx, cy) *
+              pinky.Matrix.create_rotate(angle))
+    return pinky.Path.from_string(
+        'M %r 0 A %r %r 0 0 1 %r 0 A %r %r 0 0 1 %r 0 Z' %
+        (rx, rx, ry, -rx, rx, ry, rx)).transform(matrix)
+
+class RecognizeShapeTest(unittest.TestCase):
+    def test_line(self):
+        shape, matrix = pinky.recognize_shape(
+            pinky.Path.from_string('M 1 2 L 2 3.02 L 4 5'), 0.1)
+        self.assertTrue(isinstance(shape, pinky.Line))
+        self.assertEqual((shape.x1, shape.y1, shape.x2, shape.y2),
+                         (1.0, 2.0, 4.0, 5.0))
+        self.assertEqual(matrix.type, pinky.Matrix.IDENTITY)
+        self.assertEqual(pinky.recognize_shape(
+            pinky.Path.from_string('M 1 2 L 2 3.5 L 4 5'), 0.1), None)
+
+    def test_rect(self):
+        shape, matrix = pinky.recognize_shape(
+            pinky.Path.from_string('M 1 2 L 5 2 L 5 5 L 1 5 Z'))
+        self.assertTrue(isinstance(shape, pinky.Rect))
+        for value, expected in zip(
+                (shape.x, shape.y, shape.width, shape.height),
+                (1.0, 2.0, 4.0, 3.0)):
+            self.assertAlmostEqual(value, expected)
+        self.assertEqual(matrix.type, pinky.Matrix.IDENTITY)
+
+    def test_rotated_rect(self):
+        rotation = pinky.Matrix.create_rotate(30.0)
+        path = pinky.Path.from_string('M 1 2 L 5 2 L 5 5 L 1 5 Z')
+        shape, matrix = pinky.recognize_shape(path.transform(rotation))
+        self.assertTrue(isinstance(shape, pinky.Rect))
+        self.assertAlmostEqual(shape.area, 12.0)
+        expected = sorted(rotation.transform_points(
+            [(1.0, 2.0), (5.0, 2.0), (5.0, 5.0), (1.0, 5.0)]))
+        points = sorted(matrix.transform_points(
+            shape.flatten(0.1)[0].points))
+        for point, expected_point in zip(points, expected):
+            self.assertAlmostEqual(point[0], expected_point[0])
+            self.assertAlmostEqual(point[1], expected_point[1])
+
+    def test_circle(self):
+        for tolerance in [0.1, 0.01]:
+            shape, matrix = pinky.recognize_shape(
+                get_ellipse_path(10.0, 10.0, 5.0, 5.0, 0.0), tolerance)
+            self.assertTrue(isinstance(shape, pinky.Circle))
+            self.assertTrue(abs(shape.cx - 10.0) <= tolerance)
+            self.assertTrue(abs(shape.cy - 10.0) <= tolerance)
+            self.assertTrue(abs(shape.r - 5.0) <= tolerance)
+
+    def test_ellipse(self):
+        shape, matrix = pinky.recognize_shape(
+            get_ellipse_path(3.0, 4.0, 8.0, 3.0, 40.0), 0.05)
+        self.assertTrue(isinstance(shape, pinky.Ellipse))
+        self.assertTrue(abs(shape.cx - 3.0) <= 0.05)
+        self.assertTrue(abs(shape.cy - 4.0) <= 0.05)
+        self.assertTrue(abs(shape.rx - 8.0) <= 0.05)
+        self.assertTrue(abs(shape.ry - 3.0) <= 0.05)
+        self.assertAlmostEqual((shape.rotation - 40.0 + 90.0) % 180.0, 90.0,
+                               1)
+
+    def test_convex_polygon(self):
+        path = pinky.Path.from_string('M 0 0 L 4 0 L 5 2 L 2 4 L -1 2 Z')
+        shape, matrix = pinky.recognize_shape(path)
+        self.assertTrue(isinstance(shape, pinky.Polygon))
+        self.assertEqual(len(shape.points), 5)
+        self.assertAlmostEqual(shape.area, path.flatten(0.1)[0].area)
+
+    def test_not_recognized(self):
+        for data in ['M 0 0 L 4 0 L 2 1 L 2 4 L 0 4 Z',
+                     'M 0 0 L 1 0 L 1 1 Z M 2 2 L 3 2 L 3 3 Z',
+                     'M 0 0 L 1 1 L 2 0']:
+            self.assertEqual(
+                pinky.recognize_shape(pinky.Path.from_string(data)), None)
+        self.assertEqual(pinky.recognize_shape(pinky.Circle(0.0, 0.0, 1.0)),
+                         None)
+
+    def test_tolerance(self):
+        # A square with a corner cut off by 0.05 is a rect only when the
+        # tolerance allows it.
+        path = pinky.Path.from_string('M 0 0 L 10 0 L 10 9.95 L 9.95 10 '
+                                      'L 0 10 Z')
+        shape, matrix = pinky.recognize_shape(path, 0.1)
+        self.assertTrue(isinstance(shape, pinky.Rect))
+        shape, matrix = pinky.recognize_shape(path, 0.01)
+        self.assertTrue(isinstance(shape, pinky.Polygon))
+
+class RecognizeShapesTest(unittest.TestCase):
+    def test_document(self):
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        counts = pinky.recognize_shapes(document, 0.01)
+        self.assertEqual(counts, {'Circle': 1, 'Rect': 1, 'Line': 1})
+        shapes = dict((e.attributes['id'], e.shape)
+                      for e in document.root.children)
+        self.assertTrue(isinstance(shapes['circle'], pinky.Circle))
+        self.assertTrue(isinstance(shapes['box'], pinky.Rect))
+        self.assertTrue(isinstance(shapes['line'], pinky.Line))
+        self.assertTrue(isinstance(shapes['blob'], pinky.Path))
+        self.assertAlmostEqual(shapes['circle'].area, 25.0 * math.pi, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import io
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg"
+    xmlns:sodipodi="http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd">
+  <rect id="plain" x="1" y="2" width="10" height="4"/>
+  <rect id="rounded" width="10" height="4" rx="3"/>
+  <rect id="clamped" width="10" height="4" rx="8" ry="8"/>
+  <ellipse id="ellipse" cx="1" cy="2" rx="5" ry="2"/>
+  <path id="arc" sodipodi:type="arc" sodipodi:cx="1" sodipodi:cy="2"
+        sodipodi:rx="5" sodipodi:ry="2" d="M 0 0"/>
+</svg>
+'''
+
+def get_ellipse_perimeter(rx, ry, count=100000):
+    perimeter = 0.0
+    x1, y1 = rx, 0.0
+    for i in range(1, count + 1):
+        angle = 2.0 * math.pi * i / count
+        x2, y2 = rx * math.cos(angle), ry * math.sin(angle)
+        perimeter += math.hypot(x2 - x1, y2 - y1)
+        x1, y1 = x2, y2
+    return perimeter
+
+class RectTest(unittest.TestCase):
+    def test_area_and_perimeter(self):
+        rect = pinky.Rect(1.0, 2.0, 10.0, 4.0)
+        self.assertEqual(rect.area, 40.0)
+        self.assertEqual(rect.perimeter, 28.0)
+        rect = pinky.Rect(1.0, 2.0, 10.0, 4.0, 2.0, 2.0)
+        self.assertAlmostEqual(rect.area, 40.0 - (4.0 - math.pi) * 4.0)
+        self.assertAlmostEqual(rect.perimeter,
+                               28.0 - 16.0 + 2.0 * math.pi * 2.0)
+
+    def test_rounded_area_matches_flattened(self):
+        rect = pinky.Rect(1.0, 2.0, 10.0, 4.0, 3.0, 1.5)
+        polygon, = rect.flatten(1e-5)
+        self.assertAlmostEqual(polygon.area, rect.area, 3)
+        self.assertAlmostEqual(polygon.perimeter, rect.perimeter, 3)
+
+    def test_transform(self):
+        rect = pinky.Rect(1.0, 2.0, 10.0, 4.0, 1.0, 0.5)
+        scaled = rect.transform(pinky.Matrix(-2.0, 0.0, 0.0, 3.0, 1.0, 1.0))
+        self.assertTrue(isinstance(scaled, pinky.Rect))
+        self.assertEqual((scaled.x, scaled.y, scaled.width, scaled.height,
+                          scaled.rx, scaled.ry),
+                         (-21.0, 7.0, 20.0, 12.0, 2.0, 1.5))
+        self.assertAlmostEqual(scaled.area, rect.area * 6.0)
+        rotated = rect.transform(pinky.Matrix.create_rotate(30.0))
+        self.assertTrue(isinstance(rotated, pinky.Path))
+        rotated = pinky.Rect(1.0, 2.0, 10.0, 4.0).transform(
+            pinky.Matrix.create_rotate(30.0))
+        self.assertTrue(isinstance(rotated, pinky.Polygon))
+        self.assertAlmostEqual(rotated.area, 40.0)
+
+class EllipseTest(unittest.TestCase):
+    def test_area_and_perimeter(self):
+        for rx, ry in [(5.0, 5.0), (5.0, 2.0), (1.0, 10.0), (3.0, 0.0)]:
+            ellipse = pinky.Ellipse(1.0, 2.0, rx, ry, 30.0)
+            self.assertAlmostEqual(ellipse.area, math.pi * rx * ry)
+            expected = get_ellipse_perimeter(rx, ry)
+            self.assertTrue(abs(ellipse.perimeter - expected) <=
+                            1e-3 * expected)
+
+    def test_bounding_box(self):
+        ellipse = pinky.Ellipse(1.0, 2.0, 5.0, 2.0, 90.0)
+        box = ellipse.bounding_box
+        for value, expected in zip((box.min_x, box.min_y, box.max_x,
+                                    box.max_y), (-1.0, -3.0, 3.0, 7.0)):
+            self.assertAlmostEqual(value, expected)
+
+    def test_transform(self):
+        ellipse = pinky.Ellipse(1.0, 2.0, 5.0, 2.0, 30.0)
+        matrix = pinky.Matrix(1.0, 0.5, -0.25, 2.0, 3.0, 4.0)
+        transformed = ellipse.transform(matrix)
+        self.assertAlmostEqual(transformed.area,
+                               ellipse.area * abs(matrix.determinant))
+        expected, = ellipse.flatten(1e-6)
+        expected = expected.transform(matrix).points
+        actual, = transformed.flatten(1e-6)
+        self.assertAlmostEqual(actual.area, pinky.Polygon(expected).area, 3)
+        box = transformed.bounding_box
+        expected_box = pinky.Polygon(expected).bounding_box
+        self.assertAlmostEqual(box.min_x, expected_box.min_x, 3)
+        self.assertAlmostEqual(box.max_y, expected_box.max_y, 3)
+
+    def test_circle_under_non_uniform_scale(self):
+        circle = pinky.Circle(1.0, 2.0, 3.0)
+        transformed = circle.transform(pinky.Matrix.create_scale(2.0, 1.0))
+        self.assertTrue(isinstance(transformed, pinky.Ellipse))
+        self.assertAlmostEqual(transformed.area, 18.0 * math.pi)
+        transformed = circle.transform(pinky.Matrix.create_rotate(30.0))
+        self.assertTrue(isinstance(transformed, pinky.Circle))
+        self.assertAlmostEqual(transformed.r, 3.0)
+
+class ParseTest(unittest.TestCase):
+    def test_parse(self):
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        shapes = dict((element.attributes['id'], element.shape)
+                      for element in document.root.children)
+        self.assertEqual(repr(shapes['plain']), repr(
+            pinky.Rect(1.0, 2.0, 10.0, 4.0)))
+        self.assertEqual(repr(shapes['rounded']), repr(
+            pinky.Rect(0.0, 0.0, 10.0, 4.0, 3.0, 2.0)))
+        self.assertEqual(repr(shapes['clamped']), repr(
+            pinky.Rect(0.0, 0.0, 10.0, 4.0, 5.0, 2.0)))
+        self.assertEqual(repr(shapes['ellipse']), repr(
+            pinky.Ellipse(1.0, 2.0, 5.0, 2.0)))
+        self.assertEqual(repr(shapes['arc']), repr(shapes['ellipse']))
+
+if __name__ == '__main__':
+    unittest.main()
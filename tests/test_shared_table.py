@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import unittest
+
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                        'lib')
+
+sys.path.insert(0, LIB_PATH)
+
+import pinky
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+SHAPES = [
+    pinky.Circle(1.0, 2.0, 3.0),
+    pinky.Rect(1.0, 2.0, 4.0, 3.0),
+    pinky.Polygon([(0.0, 0.0), (4.0, 0.0), (0.0, 3.0)]),
+]
+
+ATTACH_SCRIPT = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+import pinky
+with pinky.SharedShapeTable.attach(sys.argv[2]) as table:
+    print(table.ids)
+    print(table.get_style(2))
+    print([repr(view) for view in table])
+    print(repr(table.area))
+'''
+
+@unittest.skipIf(shared_memory is None, 'requires multiprocessing.shared_memory')
+class SharedShapeTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = pinky.ShapeTable()
+        for shape, id in zip(SHAPES, ['ball', 'box', 'ramp']):
+            self.table.add(shape, id=id, style='fill:red')
+        self.shared = pinky.SharedShapeTable.publish(self.table)
+
+    def tearDown(self):
+        self.shared.close()
+        self.shared.unlink()
+
+    def attach(self):
+        output = subprocess.check_output([sys.executable, '-c', ATTACH_SCRIPT,
+                                          LIB_PATH, self.shared.name])
+        return output.decode('utf-8').splitlines()
+
+    def test_publish(self):
+        self.assertEqual(len(self.shared), 3)
+        self.assertEqual(self.shared.ids, ['ball', 'box', 'ramp'])
+        self.assertAlmostEqual(self.shared.area, self.table.area)
+        self.assertRaises(TypeError, self.shared.add, SHAPES[0])
+
+    def test_attach_from_other_processes(self):
+        expected = [repr(['ball', 'box', 'ramp']), 'fill:red',
+                    repr([repr(view) for view in self.table]),
+                    repr(self.table.area)]
+        self.assertEqual(self.attach(), expected)
+        # The segment outlives the processes that attached to it.
+        self.assertEqual(self.attach(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import io
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <g transform="translate(10, 0)">
+    <path id="rope" stroke="black" stroke-width="4px"
+          style="stroke-width:2;stroke-linecap:square" d="M 0 0 L 10 0"/>
+  </g>
+  <rect id="box" style="fill:red" width="5" height="5"/>
+  <rect id="hidden" style="stroke:none" width="5" height="5"/>
+</svg>
+'''
+
+CORNER = pinky.Polyline([(0.0, 0.0), (10.0, 0.0), (10.0, 10.0)])
+
+def get_triangle_area(buffer, stroke_range=None):
+    vertices, indices = buffer.vertices, buffer.indices
+    if stroke_range is None:
+        start, stop = 0, len(indices)
+    else:
+        start = stroke_range[3]
+        stop = start + stroke_range[4]
+    area = 0.0
+    for i in range(start, stop, 3):
+        (x1, y1), (x2, y2), (x3, y3) = [
+            (vertices[2 * j], vertices[2 * j + 1]) for j in indices[i:i + 3]]
+        area += abs((x2 - x1) * (y3 - y1) - (x3 - x1) * (y2 - y1)) * 0.5
+    return area
+
+def get_stroke_area(shape, tolerance=0.001, **kwargs):
+    buffer = pinky.StrokeBuffer(tolerance)
+    buffer.add(shape, **kwargs)
+    return get_triangle_area(buffer)
+
+class StrokeAreaTest(unittest.TestCase):
+    def test_caps(self):
+        line = pinky.Line(0.0, 0.0, 10.0, 0.0)
+        self.assertAlmostEqual(get_stroke_area(line, width=2.0), 20.0)
+        self.assertAlmostEqual(get_stroke_area(line, width=2.0, cap='square'),
+                               24.0)
+        self.assertAlmostEqual(get_stroke_area(line, width=2.0, cap='round'),
+                               20.0 + math.pi, 2)
+
+    def test_joins(self):
+        self.assertAlmostEqual(get_stroke_area(CORNER, width=2.0), 41.0)
+        self.assertAlmostEqual(get_stroke_area(CORNER, width=2.0,
+                                               join='bevel'), 40.5)
+        self.assertAlmostEqual(get_stroke_area(CORNER, width=2.0,
+                                               join='round'),
+                               40.0 + 0.25 * math.pi, 2)
+        # A right angle needs a miter limit of at least sqrt(2).
+        self.assertAlmostEqual(get_stroke_area(CORNER, width=2.0,
+                                               miter_limit=1.4), 40.5)
+
+    def test_closed(self):
+        square = pinky.Rect(0.0, 0.0, 10.0, 10.0)
+        self.assertAlmostEqual(get_stroke_area(square, width=2.0),
+                               4 * 20.0 + 4 * 1.0)
+
+    def test_matrix(self):
+        matrix = pinky.Matrix.create_scale(3.0, 0.5)
+        self.assertAlmostEqual(get_stroke_area(CORNER, width=2.0,
+                                               matrix=matrix),
+                               41.0 * abs(matrix.determinant))
+
+    def test_ranges(self):
+        buffer = pinky.StrokeBuffer()
+        buffer.add(pinky.Line(0.0, 0.0, 10.0, 0.0), key='a')
+        buffer.add(CORNER, width=2.0, key='b')
+        self.assertEqual([r[0] for r in buffer.ranges], ['a', 'b'])
+        self.assertEqual(buffer.ranges[0][1:], (0, 4, 0, 6))
+        self.assertEqual(buffer.ranges[1][1], 4)
+        self.assertAlmostEqual(get_triangle_area(buffer, buffer.ranges[1]),
+                               41.0)
+
+class StrokeStyleTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(pinky.parse_stroke_style({}), None)
+        self.assertEqual(pinky.parse_stroke_style({'stroke': 'red',
+                                                   'stroke-width': '0'}), None)
+        self.assertEqual(pinky.parse_stroke_style(
+            {'stroke': 'red', 'style': 'stroke-width:3px;'
+             'stroke-linejoin:round;stroke-miterlimit:2'}),
+            dict(width=3.0, join='round', cap='butt', miter_limit=2.0))
+
+    def test_from_document(self):
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        buffer = pinky.StrokeBuffer.from_document(document)
+        self.assertEqual(len(buffer.ranges), 1)
+        key = buffer.ranges[0][0]
+        self.assertTrue(key is document.get_element_by_id('rope'))
+        xs = buffer.vertices[::2]
+        self.assertEqual((min(xs), max(xs)), (9.0, 21.0))
+        self.assertAlmostEqual(get_triangle_area(buffer), 24.0)
+
+if __name__ == '__main__':
+    unittest.main()
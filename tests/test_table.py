@@ -0,0 +1,99 @@
+import io
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <g transform="translate(100, 0)">
+    <circle id="ball" style="fill:red" cx="1" cy="2" r="3"/>
+    <rect id="box" style="fill:red" x="0" y="0" width="4" height="2"/>
+  </g>
+  <path id="ground" d="M 0 0 L 10 0 L 10 10 Z M 20 20 L 30 30"/>
+</svg>
+'''
+
+MATRICES = [
+    pinky.Matrix(),
+    pinky.Matrix.create_translate(3.0, -4.0),
+    pinky.Matrix.create_scale(2.0, 1.0),
+    pinky.Matrix.create_scale(-1.5, 0.5),
+    pinky.Matrix.create_rotate(30.0) * pinky.Matrix.create_scale(2.0, 3.0),
+]
+
+SHAPES = [
+    pinky.Circle(1.0, 2.0, 3.0),
+    pinky.Rect(1.0, 2.0, 4.0, 3.0),
+    pinky.Rect(1.0, 2.0, 4.0, 3.0, 1.0, 0.5),
+    pinky.Ellipse(1.0, 2.0, 4.0, 1.0, 30.0),
+    pinky.Polygon([(0.0, 0.0), (4.0, 0.0), (0.0, 3.0)]),
+    pinky.Polyline([(0.0, 0.0), (4.0, 0.0), (0.0, 3.0)]),
+    pinky.Line(1.0, 2.0, 3.0, 5.0),
+]
+
+class ShapeTableTest(unittest.TestCase):
+    def test_views(self):
+        table = pinky.ShapeTable.from_shapes(SHAPES)
+        self.assertEqual(len(table), len(SHAPES))
+        for shape, view in zip(SHAPES, table):
+            self.assertTrue(isinstance(view, type(shape)))
+            self.assertEqual(repr(view), repr(shape))
+
+    def test_areas(self):
+        for matrix in MATRICES:
+            table = pinky.ShapeTable.from_shapes(SHAPES, matrix)
+            areas = table.get_areas()
+            for shape, area in zip(SHAPES, areas):
+                if isinstance(shape, (pinky.Polyline, pinky.Line)):
+                    self.assertEqual(area, 0.0)
+                    continue
+                if isinstance(shape, pinky.Polygon):
+                    expected = shape.transform(matrix).area
+                else:
+                    expected = shape.area * abs(matrix.determinant)
+                self.assertAlmostEqual(area, expected, 9, (shape, matrix))
+
+    def test_bounding_boxes(self):
+        for matrix in MATRICES:
+            table = pinky.ShapeTable.from_shapes(SHAPES[:2] + SHAPES[3:],
+                                                 matrix)
+            min_xs, min_ys, max_xs, max_ys = table.get_bounding_boxes()
+            for i, shape in enumerate(SHAPES[:2] + SHAPES[3:]):
+                if isinstance(shape, (pinky.Circle, pinky.Ellipse)):
+                    shape = shape.flatten(1e-6)[0]
+                expected = shape.transform(matrix).bounding_box
+                self.assertAlmostEqual(min_xs[i], expected.min_x, 4)
+                self.assertAlmostEqual(min_ys[i], expected.min_y, 4)
+                self.assertAlmostEqual(max_xs[i], expected.max_x, 4)
+                self.assertAlmostEqual(max_ys[i], expected.max_y, 4)
+
+    def test_transform(self):
+        table = pinky.ShapeTable.from_shapes(SHAPES, MATRICES[4])
+        transformed = table.transform(MATRICES[1])
+        expected = MATRICES[1] * MATRICES[4]
+        for row in range(len(table)):
+            for value, expected_value in zip(
+                transformed.get_matrix(row).abcdef, expected.abcdef):
+                self.assertAlmostEqual(value, expected_value)
+            self.assertEqual(table.get_matrix(row).abcdef,
+                             MATRICES[4].abcdef)
+
+    def test_from_document(self):
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        table = pinky.ShapeTable.from_document(document)
+        self.assertEqual(table.ids, ['ball', 'box', 'ground', 'ground'])
+        self.assertEqual(table.styles, ['fill:red'])
+        self.assertEqual([table.get_style(row) for row in range(4)],
+                         ['fill:red', 'fill:red', None, None])
+        self.assertEqual(table.get_matrix(0).abcdef,
+                         (1.0, 0.0, 0.0, 1.0, 100.0, 0.0))
+        self.assertTrue(isinstance(table[2], pinky.Polygon))
+        self.assertTrue(isinstance(table[3], pinky.Line))
+        self.assertAlmostEqual(table.area, 9 * math.pi + 8 + 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <g transform="translate(0, 10)">
+    <circle id="ball" style="fill:red" cx="5" cy="5" r="2"/>
+  </g>
+  <rect id="wall" class="solid" x="5" y="2" width="10" height="4"/>
+  <path id="rope" style="stroke:black" d="M 2 2 L 28 2"/>
+</svg>
+'''
+
+def get_area(document):
+    return sum(polygon.area for element in document.root.children
+               if element.shape is not None
+               for polygon in element.shape.flatten(0.1)
+               if isinstance(polygon, pinky.Polygon))
+
+class WriteTilesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        self.manifest = pinky.write_tiles(document, self.directory, 10.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_manifest(self):
+        manifest = self.manifest
+        self.assertEqual(manifest['tile_size'], 10.0)
+        self.assertEqual(sorted(manifest['tiles']), ['0,0', '0,1', '1,0',
+                                                     '2,0'])
+        self.assertEqual(manifest['tiles']['0,0']['shape_count'], 2)
+        self.assertEqual(manifest['tiles']['1,0']['bounding_box'],
+                         [10.0, 0.0, 20.0, 10.0])
+        for entry in manifest['tiles'].values():
+            path = os.path.join(self.directory, entry['file'])
+            self.assertEqual(os.path.getsize(path), entry['size'])
+
+    def test_tiles(self):
+        tiles = {}
+        for key, entry in self.manifest['tiles'].items():
+            tiles[key] = pinky.Document(os.path.join(self.directory,
+                                                     entry['file']))
+        ball = tiles['0,1'].get_element_by_id('ball')
+        self.assertTrue(isinstance(ball.shape, pinky.Circle))
+        self.assertEqual((ball.shape.cx, ball.shape.cy), (5.0, 15.0))
+        self.assertEqual(ball.attributes['style'], 'fill:red')
+        wall = tiles['0,0'].get_element_by_id('wall')
+        self.assertEqual(wall.attributes['class'], 'solid')
+        self.assertAlmostEqual(get_area(tiles['0,0']), 20.0)
+        self.assertAlmostEqual(get_area(tiles['1,0']), 20.0)
+        rope = tiles['2,0'].get_element_by_id('rope')
+        self.assertEqual([c.endpoint for c in rope.shape.commands],
+                         [(20.0, 2.0), (28.0, 2.0)])
+
+BORDER_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <rect id="box" x="0" y="0" width="10" height="10"/>
+  <path id="square" d="M 10 0 L 20 0 L 20 10 L 10 10 Z"/>
+  <rect id="floor" x="0" y="15" width="20" height="10"/>
+  <path id="slope" d="M 0 20 L 20 20 L 30 30 Z"/>
+</svg>
+'''
+
+class TileBorderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        document = pinky.Document(io.BytesIO(BORDER_DATA))
+        manifest = pinky.write_tiles(document, self.directory, 10.0)
+        self.tiles = {}
+        for key, entry in manifest['tiles'].items():
+            self.tiles[key] = pinky.Document(os.path.join(self.directory,
+                                                          entry['file']))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_ids(self, key):
+        return sorted(element.attributes['id']
+                      for element in self.tiles[key].root.children)
+
+    def test_borders(self):
+        self.assertEqual(sorted(self.tiles), ['0,0', '0,1', '0,2', '1,0',
+                                              '1,1', '1,2', '2,2'])
+        self.assertEqual(self.get_ids('0,0'), ['box'])
+        self.assertEqual(self.get_ids('1,0'), ['square'])
+        self.assertEqual(self.get_ids('1,2'), ['floor', 'slope'])
+        self.assertEqual(self.get_ids('2,2'), ['slope'])
+        box = self.tiles['0,0'].get_element_by_id('box')
+        self.assertEqual(box.node.localName, 'rect')
+        square = self.tiles['1,0'].get_element_by_id('square')
+        self.assertTrue(isinstance(square.shape, pinky.Path))
+        self.assertAlmostEqual(get_area(self.tiles['1,0']), 100.0)
+
+    def test_rects_stay_rects(self):
+        areas = 0.0
+        for key in ['0,1', '1,1', '0,2', '1,2']:
+            floor = self.tiles[key].get_element_by_id('floor')
+            self.assertEqual(floor.node.localName, 'rect')
+            areas += floor.shape.area
+        self.assertAlmostEqual(areas, 200.0)
+
+class ClipTest(unittest.TestCase):
+    def test_polygon(self):
+        points = pinky._clip_polygon([(-5.0, -5.0), (5.0, -5.0), (5.0, 5.0)],
+                                     0.0, 0.0, 10.0, 10.0)
+        self.assertAlmostEqual(pinky.Polygon(points).area, 12.5)
+
+    def test_polyline(self):
+        parts = pinky._clip_polyline([(-1.0, 1.0), (2.0, 1.0), (2.0, 5.0),
+                                      (5.0, 5.0), (5.0, 1.0)],
+                                     0.0, 0.0, 3.0, 3.0)
+        self.assertEqual(parts, [[(0.0, 1.0), (2.0, 1.0), (2.0, 3.0)]])
+        self.assertEqual(pinky._clip_polyline([(3.0, 1.0), (5.0, 1.0)],
+                                              0.0, 0.0, 3.0, 3.0), [])
+
+    def test_degenerate_polygon(self):
+        self.assertEqual(pinky._clip_basic_shape(
+            pinky.Polygon([(0.0, 0.0), (10.0, 0.0), (10.0, 10.0),
+                           (0.0, 10.0)]), 10.0, 0.0, 20.0, 10.0), [])
+
+class TileLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        manifest = pinky.write_tiles(document, self.directory, 10.0)
+        self.sizes = dict((key, entry['size'])
+                          for key, entry in manifest['tiles'].items())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_update(self):
+        loader = pinky.TileLoader(self.directory, self.sizes['0,0'] +
+                                  self.sizes['1,0'])
+        visible = loader.update(pinky.BoundingBox(1.0, 1.0, 15.0, 5.0))
+        self.assertEqual([tile.key for tile in visible], [(0, 0), (1, 0)])
+        self.assertEqual(loader.memory_used, loader.memory_budget)
+        visible = loader.update(pinky.BoundingBox(1.0, 11.0, 2.0, 12.0))
+        self.assertEqual([tile.key for tile in visible], [(0, 1)])
+        # The least recently used tile is unloaded first.
+        self.assertEqual(list(loader.tiles), [(1, 0), (0, 1)])
+        self.assertTrue(loader.memory_used <= loader.memory_budget)
+        visible = loader.update(pinky.BoundingBox(-50.0, -50.0, -40.0, -40.0))
+        self.assertEqual(visible, [])
+
+    def test_visible_tiles_stay_loaded(self):
+        loader = pinky.TileLoader(self.directory, 0)
+        visible = loader.update(pinky.BoundingBox(0.0, 0.0, 25.0, 15.0))
+        self.assertEqual(len(visible), 4)
+        self.assertEqual(len(loader.tiles), 4)
+        loader.update(pinky.BoundingBox(21.0, 1.0, 22.0, 2.0))
+        self.assertEqual(list(loader.tiles), [(2, 0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<svg xmlns="http://www.w3.org/2000/svg">
+  <rect id="a" x="0" y="0" width="1" height="1"/>
+  <g transform="translate(1, 0)">
+    <rect id="b" x="0" y="0" width="1" height="1"/>
+  </g>
+  <path id="c" d="M 0 1 L 2 1 L 2 2 L 0 2 Z"/>
+  <path id="rope" d="M 5 5 L 6 6"/>
+</svg>
+'''
+
+def get_points(topology, loop):
+    return [topology.get_vertex(v) for v in loop]
+
+def get_signed_area(points):
+    return 0.5 * sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2)
+                     in zip(points, points[1:] + points[:1]))
+
+class TopologyTest(unittest.TestCase):
+    def test_weld(self):
+        topology = pinky.Topology(0.01)
+        self.assertEqual(topology.add_vertex(1.0, 1.0), 0)
+        self.assertEqual(topology.add_vertex(1.005, 0.995), 0)
+        self.assertEqual(topology.add_vertex(1.02, 1.0), 1)
+        self.assertEqual(topology.weld_count, 1)
+
+    def test_shared_edge(self):
+        topology = pinky.Topology.from_shapes(
+            [pinky.Rect(0.0, 0.0, 1.0, 1.0), pinky.Rect(1.0, 0.0, 1.0, 1.0),
+             pinky.Rect(5.0, 5.0, 1.0, 1.0)])
+        self.assertEqual(topology.vertex_count, 10)
+        self.assertEqual([topology.get_face_neighbors(f) for f in range(3)],
+                         [[1], [0], []])
+        self.assertEqual(len(topology.boundary_edges), 10)
+        areas = sorted(get_signed_area(get_points(topology, loop))
+                       for loop in topology.boundary_loops)
+        self.assertEqual(areas, [1.0, 2.0])
+
+    def test_t_junction(self):
+        small = pinky.Rect(0.0, 0.0, 1.0, 1.0)
+        tall = pinky.Rect(1.0, 0.0, 1.0, 2.0)
+        for shapes in [[small, tall], [tall, small]]:
+            topology = pinky.Topology.from_shapes(shapes)
+            self.assertEqual(topology.vertex_count, 7)
+            self.assertEqual([topology.get_face_neighbors(f)
+                              for f in range(2)], [[1], [0]])
+            loop, = topology.boundary_loops
+            self.assertEqual(len(loop), 7)
+            self.assertEqual(len(set(loop)), 7)
+            self.assertAlmostEqual(
+                get_signed_area(get_points(topology, loop)), 3.0)
+            self.assertEqual(len(topology.get_face_vertices(
+                shapes.index(tall))), 5)
+
+    def test_t_junctions_on_both_sides(self):
+        shapes = [pinky.Rect(0.0, 0.0, 2.0, 1.0),
+                  pinky.Rect(0.0, 1.0, 1.0, 1.0),
+                  pinky.Rect(1.0, 1.0, 1.0, 1.0),
+                  pinky.Rect(0.0, -1.0, 0.5, 1.0),
+                  pinky.Rect(0.5, -1.0, 1.5, 1.0)]
+        topology = pinky.Topology.from_shapes(shapes)
+        self.assertEqual(sorted(topology.get_face_neighbors(0)), [1, 2, 3, 4])
+        self.assertEqual(sorted(topology.get_face_neighbors(1)), [0, 2])
+        loop, = topology.boundary_loops
+        self.assertAlmostEqual(get_signed_area(get_points(topology, loop)),
+                               6.0)
+        for edge in range(len(topology.origins)):
+            twin = topology.twins[edge]
+            if twin != -1:
+                self.assertEqual(topology.twins[twin], edge)
+                self.assertEqual(topology.origins[twin],
+                                 topology.get_destination(edge))
+
+    def test_mixed_sizes(self):
+        # A tiny tile next to a diagonal edge many times its size, and a
+        # large tile with a T-junction from the tiny one, after the grid is
+        # resized for them.
+        shapes = [pinky.Rect(0.0, 0.0, 0.01, 0.01),
+                  pinky.Polygon([(0.0, 0.0), (0.0, -20.0), (20.0, -20.0)]),
+                  pinky.Rect(0.01, 0.0, 1000.0, 1000.0)]
+        topology = pinky.Topology.from_shapes(shapes)
+        self.assertEqual(sorted(topology.get_face_neighbors(0)), [2])
+        self.assertEqual(len(topology.get_face_vertices(2)), 5)
+        cell_count = (len(topology._vertex_grid) +
+                      sum(len(edges) for edges in
+                          topology._edge_grid.values()))
+        self.assertTrue(cell_count < 100)
+
+    def test_hole(self):
+        ring = [pinky.Rect(0.0, 0.0, 3.0, 1.0), pinky.Rect(0.0, 2.0, 3.0, 1.0),
+                pinky.Rect(0.0, 1.0, 1.0, 1.0), pinky.Rect(2.0, 1.0, 1.0, 1.0)]
+        topology = pinky.Topology.from_shapes(ring)
+        areas = sorted(get_signed_area(get_points(topology, loop))
+                       for loop in topology.boundary_loops)
+        self.assertEqual(areas, [-1.0, 9.0])
+
+    def test_from_document(self):
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        topology = pinky.Topology.from_document(document)
+        ids = [element.attributes['id'] for element in topology.face_keys]
+        self.assertEqual(ids, ['a', 'b', 'c'])
+        self.assertEqual(sorted(topology.get_face_neighbors(2)), [0, 1])
+        (key, polyline), = topology.polylines
+        self.assertEqual(key.attributes['id'], 'rope')
+        self.assertEqual(get_points(topology, polyline),
+                         [(5.0, 5.0), (6.0, 6.0)])
+
+if __name__ == '__main__':
+    unittest.main()
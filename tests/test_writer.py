@@ -0,0 +1,72 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lib'))
+
+import pinky
+
+DOCUMENT_DATA = b'''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg xmlns="http://www.w3.org/2000/svg">
+  <!-- level -->
+  <g transform="translate(10, 20)">
+    <path id="box" style="fill:#808080" d="M 0,0 L 10,0 L 10,10 L 0,10 Z"/>
+    <path id="curve" d="M 0 0 C 1 2 3 4 5 6 S 9 10 11 12 Q 1 1 2 0 T 4 0"/>
+    <circle cx="1.5" cy="2.25" r="3"/>
+    <text>Hello, <tspan>world</tspan></text>
+  </g>
+</svg>
+'''
+
+class WriterTest(unittest.TestCase):
+    def assertSamePoints(self, path, other):
+        points = [c.endpoint for c in path.commands]
+        other_points = [c.endpoint for c in other.commands]
+        self.assertEqual(len(points), len(other_points))
+        for point, other_point in zip(points, other_points):
+            if point is None or other_point is None:
+                self.assertEqual(point, other_point)
+            else:
+                self.assertAlmostEqual(point[0], other_point[0], 3)
+                self.assertAlmostEqual(point[1], other_point[1], 3)
+
+    def test_parse_horizontal_and_vertical_lines(self):
+        path = pinky.Path.from_string('M0 0H10V10H0z')
+        self.assertEqual([c.endpoint for c in path.commands],
+                         [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0),
+                          (0.0, 10.0), None])
+        path = pinky.Path.from_string('m1 1h5 5v-2')
+        self.assertEqual([c.endpoint for c in path.commands],
+                         [(1.0, 1.0), (6.0, 1.0), (11.0, 1.0), (11.0, -1.0)])
+
+    def test_path_round_trip(self):
+        writer = pinky.Writer()
+        for data in ['M 0,0 L 10,0 L 10,10 L 0,10 Z',
+                     'M 1 2 L 3 4 C 5 6 7 8 9 10 Q 1 2 3 4 Z M 7 7 L 8 9',
+                     'M 0.125 -3 A 5 5 0 0 1 10 10 L 10 -2.5 L -4 -2.5']:
+            path = pinky.Path.from_string(data)
+            written = writer.format_path(path)
+            parsed = pinky.Path.from_string(written)
+            self.assertSamePoints(path, parsed)
+            self.assertEqual(writer.format_path(parsed), written)
+
+    def test_document_round_trip(self):
+        writer = pinky.Writer()
+        document = pinky.Document(io.BytesIO(DOCUMENT_DATA))
+        written = writer.format_document(document)
+        self.assertTrue('H' in written or 'h' in written)
+        parsed = pinky.Document(io.BytesIO(written.encode('utf-8')))
+        self.assertEqual(writer.format_document(parsed), written)
+        self.assertTrue(u'Hello, <tspan>world</tspan>' in written)
+        self.assertTrue(u'<!-- level -->' in written)
+
+    def test_sorted_attributes(self):
+        document = pinky.Document(io.BytesIO(
+            b'<svg xmlns="http://www.w3.org/2000/svg">'
+            b'<rect y="2" x="1" width="3" height="4"/></svg>'))
+        written = pinky.Writer().format_document(document)
+        self.assertTrue(u'<rect height="4" width="3" x="1" y="2"/>' in written)
+
+if __name__ == '__main__':
+    unittest.main()